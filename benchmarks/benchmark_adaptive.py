@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark chunking of downloads from a local mock of the NCEI data service with a
+dense, a sparse and a station whose density is underestimated (e.g. planned from a
+sparse history): fixed windows of 1000 / len(datatypes) days (previous planner), the
+planned windows without adaptation (truncated responses are not noticed) and the
+AdaptiveChunker (windows grow on sparse responses, truncated responses are paginated).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+from mock_ncei import MockNCEI, station_rows  # noqa: E402
+
+from noaaplotter.utils.noaa_client import NOAAClient  # noqa: E402
+from noaaplotter.utils.request_plan import RequestPlan, to_days  # noqa: E402
+
+DATATYPES = ["TMIN", "TMAX", "PRCP", "SNOW"]
+# station -> (density of the mock, density the plan starts from)
+STATIONS = {
+    "USW00000001": (1.0, None),
+    "USW00000002": (0.05, None),
+    "USW00000003": (1.0, 0.1),
+}
+
+
+def fixed_chunks(start, end):
+    split_size = 1000 // len(DATATYPES)
+    return [
+        (
+            s,
+            DATATYPES,
+            d.strftime("%Y-%m-%d"),
+            min(d + pd.Timedelta(days=split_size - 1), pd.Timestamp(end)).strftime(
+                "%Y-%m-%d"
+            ),
+        )
+        for s in STATIONS
+        for d in pd.date_range(start, end, freq=f"{split_size}D")
+    ]
+
+
+def rows(results):
+    return sum(len(r) for r in results if r is not None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark adaptive chunking.")
+    parser.add_argument("-years", dest="years", type=int, default=100)
+    parser.add_argument("-n_jobs", dest="n_jobs", type=int, default=8)
+    parser.add_argument("-latency", dest="latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    start, end = f"{2021 - args.years}-01-01", "2020-12-31"
+    expected = {
+        s: len(station_rows(s, DATATYPES, start, end, density))
+        for s, (density, _) in STATIONS.items()
+    }
+    days = to_days([start, end])
+
+    def plan():
+        request_plan = RequestPlan()
+        for station_id, (_, planned) in STATIONS.items():
+            request_plan.add(station_id, DATATYPES, days[:1], days[1:], planned)
+        return request_plan
+
+    with MockNCEI(
+        latency=args.latency, density={s: d for s, (d, _) in STATIONS.items()}
+    ) as mock:
+        client = NOAAClient(base_url=mock.url, concurrency=args.n_jobs, rate_limit=None)
+        for name in ["fixed", "planned", "adaptive"]:
+            requests_before = mock.requests
+            t0 = time.perf_counter()
+            if name in ["fixed", "planned"]:
+                chunks = (
+                    fixed_chunks(start, end) if name == "fixed" else plan().chunks()
+                )
+                results = client.download(chunks, progress=False)
+                by_station = {
+                    s: [r for c, r in zip(chunks, results) if c[0] == s]
+                    for s in STATIONS
+                }
+            else:
+                by_station = client.download_plan(plan(), progress=False)
+            seconds = time.perf_counter() - t0
+            print(
+                f"{name:9s} {seconds:6.2f}s  requests {mock.requests - requests_before:5d}  "
+                + "  ".join(
+                    f"{s[-1]}: {rows(by_station[s])}/{expected[s]}" for s in STATIONS
+                )
+            )
+        print(f"client {client.stats()}")
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark backfilling many stations from a local mock of the NCEI data service:
+one download_from_noaa per station (like one download_data run per station) vs. a
+BulkBackfill sharing one worker pool. Then a backfill is interrupted by a request
+budget and resumed from its manifest.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+from mock_ncei import MockNCEI  # noqa: E402
+
+from noaaplotter.utils.backfill import BulkBackfill, station_file  # noqa: E402
+from noaaplotter.utils.download_utils import download_from_noaa  # noqa: E402
+from noaaplotter.utils.noaa_client import NOAAClient  # noqa: E402
+
+DATATYPES = ["TMIN", "TMAX", "PRCP", "SNOW"]
+
+
+def quiet(func, *args, **kwargs):
+    with open(os.devnull, "w") as devnull:
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = devnull
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+
+def rows(output_dir, stations):
+    return sum(
+        pd.read_parquet(station_file(output_dir, s))["STATION"].notna().sum()
+        for s, _ in stations
+        if os.path.exists(station_file(output_dir, s))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-station backfills.")
+    parser.add_argument("-stations", dest="n_stations", type=int, default=100)
+    parser.add_argument("-years", dest="years", type=int, default=2)
+    parser.add_argument("-n_jobs", dest="n_jobs", type=int, default=8)
+    parser.add_argument("-latency", dest="latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    stations = [(f"USW{i:08d}", f"Station {i}") for i in range(args.n_stations)]
+    start, end = f"{2020 - args.years + 1}-01-01", "2020-12-31"
+
+    with MockNCEI(latency=args.latency) as mock:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            t0 = time.perf_counter()
+            for station_id, name in stations:
+                client = NOAAClient(
+                    base_url=mock.url, concurrency=args.n_jobs, rate_limit=None
+                )
+                quiet(
+                    download_from_noaa,
+                    station_file(tmp_dir, station_id),
+                    start,
+                    end,
+                    DATATYPES,
+                    name,
+                    station_id,
+                    "",
+                    client=client,
+                )
+                client.close()
+            seconds = time.perf_counter() - t0
+            print(
+                f"per station  {seconds:6.2f}s  rows {rows(tmp_dir, stations)}  "
+                f"requests {mock.requests}"
+            )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            requests_before = mock.requests
+            client = NOAAClient(
+                base_url=mock.url, concurrency=args.n_jobs, rate_limit=None
+            )
+            t0 = time.perf_counter()
+            quiet(
+                BulkBackfill(stations, tmp_dir, start, end, DATATYPES, client).run,
+                progress=False,
+            )
+            seconds = time.perf_counter() - t0
+            print(
+                f"bulk         {seconds:6.2f}s  rows {rows(tmp_dir, stations)}  "
+                f"requests {mock.requests - requests_before}"
+            )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # first run stops at the request budget, the second resumes
+            requests_before = mock.requests
+            n_requests = len(
+                BulkBackfill(
+                    stations, tmp_dir, start, end, DATATYPES, client
+                ).request_plan()
+            )
+            for max_requests in [n_requests // 2, None]:
+                backfill = BulkBackfill(
+                    stations,
+                    tmp_dir,
+                    start,
+                    end,
+                    DATATYPES,
+                    client,
+                    max_requests=max_requests,
+                )
+                done = quiet(backfill.run, progress=False)
+                print(
+                    f"resume       {len(done)} stations, requests "
+                    f"{mock.requests - requests_before}, rows {rows(tmp_dir, stations)}"
+                )
+                requests_before = mock.requests
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
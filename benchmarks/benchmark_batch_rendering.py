@@ -0,0 +1,145 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark per-call plot_weather_series vs. the batch renderer which reuses one figure
+and its artists, rendering one plot per year of a synthetic 50-year record and one
+period of several synthetic stations. Both paths draw the same plot, the batch renderer
+saves creating the figure and its artists, the legends and, if the tick labels do not
+change (e.g. the same period of many stations), the layout.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+
+from noaaplotter.batch import DailySeriesBatchRenderer
+from noaaplotter.noaaplotter import NOAAPlotter
+
+
+def make_record(output_file, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("1970-01-01", "2020-12-31")
+    doy = dates.dayofyear.values
+    t = -5 + 15 * np.sin((doy - 110) / 365 * 2 * np.pi) + rng.normal(0, 4, len(dates))
+    df = pd.DataFrame(
+        {
+            "STATION": "SYNTH",
+            "NAME": "SYNTHETIC STATION",
+            "DATE": dates.strftime("%Y-%m-%d"),
+            "PRCP": np.round(rng.exponential(2, len(dates)) * (rng.random(len(dates)) < 0.3), 1),
+            "SNOW": np.round(np.where(t < 0, rng.exponential(5, len(dates)), 0), 1),
+            "TMAX": np.round(t + 5, 1),
+            "TMIN": np.round(t - 5, 1),
+        }
+    )
+    df.to_parquet(output_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch rendering.")
+    parser.add_argument("-years", dest="years", type=int, default=20)
+    parser.add_argument("-dpi", dest="dpi", type=int, default=100)
+    parser.add_argument("-stations", dest="stations", type=int, default=5)
+    args = parser.parse_args()
+    years = range(2020 - args.years, 2020)
+    options = dict(plot_tmin=-45, plot_tmax=25, plot_pmax=20, plot_snowmax=300, dpi=args.dpi)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        plotters = []
+        for seed in range(args.stations):
+            path = os.path.join(tmpdir, f"synthetic_{seed}.parquet")
+            make_record(path, seed)
+            plotters.append(NOAAPlotter(path))
+            # build climatology and records before timing
+            plotters[-1].plot_weather_series(
+                "2019-07-01", "2020-06-30", show_plot=False, dpi=args.dpi
+            )
+        n = plotters[0]
+
+        t0 = time.perf_counter()
+        for year in years:
+            n.plot_weather_series(
+                f"{year}-07-01",
+                f"{year + 1}-06-30",
+                show_plot=False,
+                save_path=os.path.join(tmpdir, f"single_{year}.png"),
+                **options,
+            )
+        t_single = (time.perf_counter() - t0) / len(years)
+
+        renderer = DailySeriesBatchRenderer(**options)
+        t0 = time.perf_counter()
+        n.plot_weather_series_batch(
+            [
+                (
+                    f"{year}-07-01",
+                    f"{year + 1}-06-30",
+                    os.path.join(tmpdir, f"batch_{year}.png"),
+                )
+                for year in years
+            ],
+            renderer=renderer,
+        )
+        t_batch = (time.perf_counter() - t0) / len(years)
+
+        # where the time of a batch plot goes
+        t_data = t_render = t_save = 0.0
+        for year in years:
+            t0 = time.perf_counter()
+            n.prepare_daily_series(f"{year}-07-01", f"{year + 1}-06-30", True, True)
+            t1 = time.perf_counter()
+            renderer.render(n, f"{year}-07-01", f"{year + 1}-06-30")
+            t2 = time.perf_counter()
+            renderer.fig.savefig(os.path.join(tmpdir, f"batch_{year}.png"))
+            t_data += t1 - t0
+            t_render += t2 - t1
+            t_save += time.perf_counter() - t2
+
+        t0 = time.perf_counter()
+        for i, plotter in enumerate(plotters):
+            plotter.plot_weather_series(
+                "2018-07-01",
+                "2019-06-30",
+                show_plot=False,
+                save_path=os.path.join(tmpdir, f"single_station_{i}.png"),
+                **options,
+            )
+        t_single_stations = (time.perf_counter() - t0) / len(plotters)
+
+        renderer = DailySeriesBatchRenderer(**options)
+        t0 = time.perf_counter()
+        for i, plotter in enumerate(plotters):
+            renderer.render(
+                plotter,
+                "2018-07-01",
+                "2019-06-30",
+                os.path.join(tmpdir, f"batch_station_{i}.png"),
+            )
+        t_batch_stations = (time.perf_counter() - t0) / len(plotters)
+
+    print(f"{len(years)} years of one station")
+    print(f"per call: {t_single:.3f} s/plot")
+    print(f"   batch: {t_batch:.3f} s/plot ({t_single / t_batch:.1f}x)")
+    n_plots = len(years)
+    print(
+        f"          data {t_data / n_plots:.3f} s, "
+        f"artists and layout {max(t_render - t_data, 0) / n_plots:.3f} s, "
+        f"drawing and png {t_save / n_plots:.3f} s"
+    )
+    print(f"one period of {len(plotters)} stations")
+    print(f"per call: {t_single_stations:.3f} s/plot")
+    print(
+        f"   batch: {t_batch_stations:.3f} s/plot "
+        f"({t_single_stations / t_batch_stations:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
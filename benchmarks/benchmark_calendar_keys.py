@@ -0,0 +1,60 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark strftime string calendar columns vs. integer calendar keys
+on a synthetic 100-year daily record of several stations.
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from noaaplotter.utils.climatology import doy_key, month_key, ym_key
+
+
+def string_keys(dates):
+    return {
+        "DATE_MD": dates.dt.strftime("%m-%d"),
+        "DATE_YM": dates.dt.strftime("%Y-%m"),
+        "DATE_M": dates.dt.strftime("%m"),
+    }
+
+
+def integer_keys(dates):
+    return {
+        "DATE_DOY": pd.Series(doy_key(dates)),
+        "DATE_YM": pd.Series(ym_key(dates)),
+        "DATE_M": pd.Series(month_key(dates)),
+    }
+
+
+def run(func, dates):
+    t0 = time.perf_counter()
+    keys = func(dates)
+    elapsed = time.perf_counter() - t0
+    memory = sum(k.memory_usage(index=False, deep=True) for k in keys.values())
+    t0 = time.perf_counter()
+    for k in keys.values():
+        k.groupby(k).size()
+    grouping = time.perf_counter() - t0
+    return elapsed, grouping, memory / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark calendar keys.")
+    parser.add_argument("-years", dest="years", type=int, default=100)
+    parser.add_argument("-n", dest="n_stations", type=int, default=10)
+    args = parser.parse_args()
+
+    one = pd.Series(pd.date_range("1920-01-01", periods=int(args.years * 365.25)))
+    dates = pd.concat([one] * args.n_stations, ignore_index=True)
+    print(f"{len(dates)} daily rows")
+    for name, func in [("strings", string_keys), ("integers", integer_keys)]:
+        elapsed, grouping, memory = run(func, dates)
+        print(
+            f"{name:>8}: create {elapsed:.3f} s, group {grouping:.3f} s, memory {memory:.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark downloads from a local mock of the NCEI data service with latency, a server
+side rate limit and random failures: one requests.get per chunk on a joblib pool
+(previous implementation) vs. the asyncio NOAAClient with pooled connections, a token
+bucket and retries.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+import pandas as pd
+import requests
+from joblib import Parallel, delayed
+
+sys.path.insert(0, os.path.dirname(__file__))
+from mock_ncei import MockNCEI  # noqa: E402
+
+from noaaplotter.utils.download_utils import download_from_noaa  # noqa: E402
+from noaaplotter.utils.noaa_client import NOAAClient  # noqa: E402
+
+DATATYPES = ["TMIN", "TMAX", "PRCP", "SNOW"]
+
+
+def chunks(start, end, split_size):
+    days = pd.date_range(start, end, freq=f"{split_size}D")
+    return [
+        (
+            d.strftime("%Y-%m-%d"),
+            min(d + timedelta(days=split_size - 1), pd.Timestamp(end)).strftime(
+                "%Y-%m-%d"
+            ),
+        )
+        for d in days
+    ]
+
+
+def previous_chunk(url, station, start, end):
+    # previous implementation of dl_noaa_api: no session, no retries
+    r = requests.get(
+        url,
+        params=NOAAClient.request_params(station, DATATYPES, start, end),
+        headers={"token": ""},
+    )
+    try:
+        return pd.DataFrame(json.loads(r.text))
+    except json.JSONDecodeError:
+        return None
+
+
+def previous(url, station, start, end, n_jobs):
+    datasets = Parallel(n_jobs=n_jobs, backend="threading")(
+        delayed(previous_chunk)(url, station, s, e)
+        for s, e in chunks(start, end, 1000 // len(DATATYPES))
+    )
+    return sum(len(d) for d in datasets if d is not None)
+
+
+def current(url, station, start, end, n_jobs, rate):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_file = os.path.join(tmp_dir, "station.parquet")
+        client = NOAAClient(
+            base_url=url, concurrency=n_jobs, rate_limit=rate, backoff=0.2
+        )
+        download_from_noaa(
+            output_file, start, end, DATATYPES, "Station", station, "", client=client
+        )
+        client.close()
+        print(f"    client {client.stats()}")
+        return pd.read_parquet(output_file)["STATION"].notna().sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark downloads from a mock.")
+    parser.add_argument("-years", dest="years", type=int, default=40)
+    parser.add_argument("-n_jobs", dest="n_jobs", type=int, default=8)
+    parser.add_argument("-latency", dest="latency", type=float, default=0.05)
+    parser.add_argument("-server_rate", dest="server_rate", type=float, default=20)
+    parser.add_argument("-failure_rate", dest="failure_rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    start = f"{2020 - args.years + 1}-01-01"
+    end = "2020-12-31"
+    expected = len(pd.date_range(start, end))
+    for name in ["previous", "current"]:
+        with MockNCEI(
+            latency=args.latency, rate=args.server_rate, failure_rate=args.failure_rate
+        ) as mock:
+            t0 = time.perf_counter()
+            if name == "previous":
+                rows = previous(mock.url, "USW00026616", start, end, args.n_jobs)
+            else:
+                # stay a bit below the server limit
+                rows = current(
+                    mock.url,
+                    "USW00026616",
+                    start,
+                    end,
+                    args.n_jobs,
+                    args.server_rate * 0.9,
+                )
+            seconds = time.perf_counter() - t0
+        print(
+            f"{name:9s} {seconds:6.2f}s  rows {rows}/{expected}  server {mock.stats()}"
+        )
+
+
+if __name__ == "__main__":
+    main()
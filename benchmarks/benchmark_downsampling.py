@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark plot_weather_series of a 50-year window with and without downsampling,
+render time and file size of png, svg and pdf output.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+
+from noaaplotter.noaaplotter import NOAAPlotter
+
+
+def make_record(output_file):
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("1970-01-01", "2020-12-31")
+    doy = dates.dayofyear.values
+    t = -5 + 15 * np.sin((doy - 110) / 365 * 2 * np.pi) + rng.normal(0, 4, len(dates))
+    df = pd.DataFrame(
+        {
+            "STATION": "SYNTH",
+            "NAME": "SYNTHETIC STATION",
+            "DATE": dates.strftime("%Y-%m-%d"),
+            "PRCP": np.round(
+                rng.exponential(2, len(dates)) * (rng.random(len(dates)) < 0.3), 1
+            ),
+            "SNOW": np.round(np.where(t < 0, rng.exponential(5, len(dates)), 0), 1),
+            "TMAX": np.round(t + 5, 1),
+            "TMIN": np.round(t - 5, 1),
+        }
+    )
+    df.to_parquet(output_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark downsampling.")
+    parser.add_argument("-years", dest="years", type=int, default=50)
+    parser.add_argument("-dpi", dest="dpi", type=int, default=100)
+    args = parser.parse_args()
+    start, end = f"{2021 - args.years}-01-01", "2020-12-31"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "synthetic.parquet")
+        make_record(path)
+        n = NOAAPlotter(path)
+        # build climatology and records before timing
+        n.plot_weather_series("2019-07-01", "2020-06-30", show_plot=False)
+        for downsample in [False, True]:
+            for ext in ["png", "svg", "pdf"]:
+                out = os.path.join(tmpdir, f"plot.{ext}")
+                t0 = time.perf_counter()
+                n.plot_weather_series(
+                    start,
+                    end,
+                    show_plot=False,
+                    save_path=out,
+                    dpi=args.dpi,
+                    downsample=downsample,
+                )
+                elapsed = time.perf_counter() - t0
+                print(
+                    f"downsample={str(downsample):>5} {ext}: {elapsed:.2f} s, "
+                    f"{os.path.getsize(out) / 1e3:.0f} kB"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark import times of the command line scripts and main modules with
+python -X importtime, each in a fresh interpreter. With -check the script fails if a
+module exceeds its time budget or loads a dependency it must not load at import, e.g.
+Earth Engine outside of the ERA5 download or matplotlib before a plot is rendered.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+HEAVY = ["matplotlib", "pandas", "polars", "numpy", "pyarrow", "joblib", "tqdm"]
+EARTH_ENGINE = ["ee", "geemap"]
+
+# module, budget in ms, top level packages which must not be imported
+TARGETS = [
+    ("noaaplotter.scripts.plot_daily", 50, HEAVY + EARTH_ENGINE),
+    ("noaaplotter.scripts.plot_monthly", 50, HEAVY + EARTH_ENGINE),
+    ("noaaplotter.scripts.plot_batch", 50, HEAVY + EARTH_ENGINE),
+    ("noaaplotter.scripts.serve", 50, HEAVY + EARTH_ENGINE),
+    ("noaaplotter.scripts.download_data", 50, HEAVY + EARTH_ENGINE),
+    ("noaaplotter.scripts.download_data_ERA5", 50, HEAVY + EARTH_ENGINE),
+    (
+        "noaaplotter.utils.download_utils",
+        1000,
+        ["matplotlib", "polars", "joblib", "tqdm", "requests"] + EARTH_ENGINE,
+    ),
+    (
+        "noaaplotter.utils.batch_utils",
+        50,
+        ["matplotlib", "pandas", "joblib", "tqdm"] + EARTH_ENGINE,
+    ),
+    (
+        "noaaplotter.noaaplotter",
+        1000,
+        ["matplotlib", "joblib", "tqdm", "requests"] + EARTH_ENGINE,
+    ),
+    (
+        "noaaplotter.server",
+        1000,
+        ["matplotlib", "joblib", "tqdm", "requests"] + EARTH_ENGINE,
+    ),
+]
+
+
+def import_time(module):
+    """
+    cumulative import time of a module in a fresh interpreter
+    :return: time in ms, top level packages loaded by the import
+    """
+    code = (
+        "import sys; before = set(sys.modules); import {0}; "
+        "print(' '.join(sorted({{m.split('.')[0] for m in sys.modules}} - "
+        "{{m.split('.')[0] for m in before}})))".format(module)
+    )
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    us = 0
+    package = module.split(".")[0]
+    for line in p.stderr.splitlines():
+        # "import time: self | cumulative | name", dependencies are indented below the
+        # module, interpreter startup (site, encodings) is not counted
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip().split(".")[0] == package:
+            if not parts[2].startswith("  "):
+                us += int(parts[1])
+    return us / 1000, set(p.stdout.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import times.")
+    parser.add_argument("-repeat", dest="repeat", type=int, default=5)
+    parser.add_argument(
+        "-check",
+        dest="check",
+        action="store_true",
+        help="exit with an error if a budget is exceeded or a forbidden module is loaded",
+    )
+    parser.add_argument(
+        "-budget_scale",
+        dest="budget_scale",
+        type=float,
+        default=1.0,
+        help="scale all budgets, e.g. for slow machines",
+    )
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':42s} {'median':>9s} {'budget':>9s}  loaded")
+    for module, budget, forbidden in TARGETS:
+        runs = [import_time(module) for _ in range(args.repeat)]
+        ms = statistics.median(t for t, _ in runs)
+        loaded = runs[0][1]
+        budget *= args.budget_scale
+        bad = sorted(loaded & set(forbidden))
+        print(
+            f"{module:42s} {ms:7.1f}ms {budget:7.0f}ms  "
+            f"{' '.join(sorted(loaded & set(HEAVY + EARTH_ENGINE + ['requests'])))}"
+        )
+        if ms > budget:
+            failures.append(f"{module}: {ms:.1f} ms > {budget:.0f} ms")
+        if bad:
+            failures.append(f"{module}: imports {', '.join(bad)}")
+
+    if failures:
+        print("\n" + "\n".join(failures))
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
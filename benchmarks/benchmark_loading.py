@@ -0,0 +1,93 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark eager vs. lazy (predicate/projection pushdown) loading of daily summaries.
+A multi-station archive is synthesised from the bundled Orlando record.
+Each loading path runs in a fresh process to measure load time and peak memory.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import tempfile
+import time
+
+import polars as pl
+
+
+def make_archive(csv_path, output_file, n_stations):
+    df = pl.read_csv(csv_path, infer_schema_length=None)
+    frames = [
+        df.with_columns(
+            pl.lit(f"STATION{i:04d}").alias("STATION"),
+            pl.lit(f"STATION {i:04d}, XX US").alias("NAME"),
+        )
+        for i in range(n_stations)
+    ]
+    frames[0] = df
+    pl.concat(frames).write_parquet(output_file)
+
+
+def _maxrss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _load_eager(path, location, start, end):
+    # previous implementation: read everything, then filter in pandas
+    import pandas as pd
+
+    data = pl.read_parquet(path).to_pandas()
+    data = data[data["NAME"].str.lower().str.contains(location.lower())]
+    data["DATE"] = pd.to_datetime(data["DATE"])
+    data = data[(data["DATE"] >= start) & (data["DATE"] <= end)]
+    return len(data)
+
+
+def _load_lazy(path, location, start, end):
+    from noaaplotter.utils.dataset import PLOT_COLUMNS
+    from noaaplotter.utils.dataset import NOAAPlotterDailySummariesDataset as Dataset
+
+    ds = Dataset(
+        path, location=location, start_date=start, end_date=end, columns=PLOT_COLUMNS
+    )
+    return len(ds.data)
+
+
+def _worker(mode, path, location, start, end, queue):
+    import pandas  # noqa: F401  imports are excluded from the measurement
+
+    import noaaplotter.utils.dataset  # noqa: F401
+
+    rss_before = _maxrss_mb()
+    t0 = time.perf_counter()
+    loader = _load_eager if mode == "eager" else _load_lazy
+    n_rows = loader(path, location, start, end)
+    queue.put((mode, n_rows, time.perf_counter() - t0, _maxrss_mb() - rss_before))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dataset loading.")
+    parser.add_argument("-csv", dest="csv", type=str, default="data/weather_station_orlando.csv")
+    parser.add_argument("-n", dest="n_stations", type=int, default=200)
+    parser.add_argument("-start", dest="start", type=str, default="1999-01-01")
+    parser.add_argument("-end", dest="end", type=str, default="2018-12-31")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "archive.parquet")
+        make_archive(args.csv, path, args.n_stations)
+        print(f"archive: {args.n_stations} stations, {os.path.getsize(path) / 1e6:.1f} MB")
+        for mode in ["eager", "lazy"]:
+            queue = ctx.Queue()
+            p = ctx.Process(
+                target=_worker, args=(mode, path, "orlando", args.start, args.end, queue)
+            )
+            p.start()
+            mode, n_rows, elapsed, peak = queue.get()
+            p.join()
+            print(f"{mode:>6}: {n_rows} rows, {elapsed:.3f} s, peak memory +{peak:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Regression benchmark of plot_monthly_barchart end to end (data preparation and rendering)
+on the bundled Orlando record. The previous row-wise 'DATE_YM' parsing is timed separately
+on the same monthly aggregate to show the removed cost.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import polars as pl
+
+from noaaplotter.noaaplotter import NOAAPlotter
+from noaaplotter.utils.utils import parse_dates_YM
+
+
+def legacy_date_parsing(data):
+    # previous implementation, three row-wise passes over the monthly aggregate
+    data = data.reset_index(drop=False)
+    data["DATE"] = data.apply(lambda x: parse_dates_YM(x["DATE_YM"]), axis=1)
+    data["Month"] = data.apply(lambda x: parse_dates_YM(x["DATE_YM"]).month, axis=1)
+    data["Year"] = data.apply(lambda x: parse_dates_YM(x["DATE_YM"]).year, axis=1)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark plot_monthly_barchart.")
+    parser.add_argument("-csv", dest="csv", type=str, default="data/weather_station_orlando.csv")
+    parser.add_argument("-n", dest="repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "orlando.parquet")
+        pl.read_csv(args.csv, infer_schema_length=None).write_parquet(path)
+
+        timings = []
+        for _ in range(args.repeat):
+            # new instance per run, memoised aggregates would hide the preprocessing
+            n = NOAAPlotter(path)
+            t0 = time.perf_counter()
+            n.plot_monthly_barchart(
+                "1950-01-01",
+                "2019-03-31",
+                anomaly=True,
+                trailing_mean=12,
+                show_plot=False,
+                save_path=os.path.join(tmpdir, "monthly.png"),
+            )
+            timings.append(time.perf_counter() - t0)
+
+        aggregate = n.get_monthly_aggregate(n.dataset.data["DATE"].max()).monthly_aggregate
+        t0 = time.perf_counter()
+        legacy_date_parsing(aggregate.drop(columns=["DATE", "Month", "Year"]))
+        t_legacy = time.perf_counter() - t0
+
+    print(f"plot_monthly_barchart: {min(timings):.3f} s (best of {args.repeat})")
+    print(f"removed row-wise DATE_YM parsing: {t_legacy:.3f} s per plot")
+
+
+if __name__ == "__main__":
+    main()
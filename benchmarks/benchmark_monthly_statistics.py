@@ -0,0 +1,93 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark monthly aggregation with per-group lambdas (previous implementation)
+vs. the vectorised NOAAPlotterMonthlyClimateDataset.calculate_monthly_statistics
+on the bundled Orlando record and on a synthetic set of stations.
+"""
+import argparse
+import copy
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from noaaplotter.utils.dataset import NOAAPlotterDailySummariesDataset as Dataset
+from noaaplotter.utils.dataset import NOAAPlotterMonthlyClimateDataset as DS_monthly
+
+
+def lambda_statistics(data):
+    # previous implementation, one Python call per group and statistic
+    df_out = pd.DataFrame()
+    spec = [
+        ("tmean_doy_mean", "TMEAN", lambda x: x.mean() if x.notna().any() else np.nan),
+        ("tmean_doy_std", "TMEAN", lambda x: x.std() if x.notna().any() else np.nan),
+        ("tmax_doy_max", "TMAX", lambda x: x.max() if x.notna().any() else np.nan),
+        ("tmax_doy_std", "TMAX", lambda x: x.std() if x.notna().any() else np.nan),
+        ("tmin_doy_min", "TMIN", lambda x: x.min() if x.notna().any() else np.nan),
+        ("tmin_doy_std", "TMIN", lambda x: x.std() if x.notna().any() else np.nan),
+        ("snow_doy_mean", "SNOW", lambda x: x.mean() if x.notna().any() else np.nan),
+        ("prcp_sum", "PRCP", lambda x: x.sum() if x.notna().any() else np.nan),
+    ]
+    for name, variable, func in spec:
+        df_out[name] = data[[variable]].groupby(data["DATE_YM"]).agg(func)[variable]
+    return df_out
+
+
+def synthetic_stations(dataset, n_stations):
+    rng = np.random.default_rng(0)
+    stations = []
+    for _ in range(n_stations):
+        ds = copy.copy(dataset)
+        data = dataset.data.copy()
+        for col in ["TMAX", "TMIN", "PRCP"]:
+            data[col] = data[col] + rng.normal(0, 1, len(data))
+        data["TMEAN"] = data[["TMIN", "TMAX"]].mean(axis=1)
+        ds.data = data
+        stations.append(ds)
+    return stations
+
+
+def run(stations):
+    monthly = [
+        DS_monthly(ds, start=ds.data["DATE"].min(), end=ds.data["DATE"].max())
+        for ds in stations
+    ]
+    t0 = time.perf_counter()
+    for ds in monthly:
+        lambda_statistics(ds.filter_to_date())
+    t_lambda = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for ds in monthly:
+        ds.calculate_monthly_statistics()
+    t_vectorised = time.perf_counter() - t0
+    return t_lambda, t_vectorised
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark monthly statistics.")
+    parser.add_argument("-csv", dest="csv", type=str, default="data/weather_station_orlando.csv")
+    parser.add_argument("-n", dest="n_stations", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "orlando.parquet")
+        pl.read_csv(args.csv, infer_schema_length=None).write_parquet(path)
+        dataset = Dataset(path)
+
+    for label, stations in [
+        ("orlando", [dataset]),
+        (f"{args.n_stations} synthetic stations", synthetic_stations(dataset, args.n_stations)),
+    ]:
+        t_lambda, t_vectorised = run(stations)
+        print(
+            f"{label}: lambdas {t_lambda:.3f} s, vectorised {t_vectorised:.3f} s "
+            f"({t_lambda / t_vectorised:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark request planning of century-long station files with gaps: the former
+planner (sets of date strings, strptime loop, 1000 / len(datatypes) days per request)
+vs. RequestPlan (day numbers, run length encoding, windows sized by station density).
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from noaaplotter.utils.download_utils import plan_station
+from noaaplotter.utils.request_plan import RequestPlan
+
+DATATYPES = ["TMIN", "TMAX", "PRCP", "SNOW"]
+
+
+def legacy_plan(output_file, station_id, datatypes, start_date, end_date):
+    existing_df = pl.read_parquet(output_file, columns=["DATE", "STATION"])
+    existing_dates = set(existing_df.drop_nulls(subset="STATION")["DATE"].to_list())
+    dt_start = datetime.strptime(start_date, "%Y-%m-%d")
+    dt_end = datetime.strptime(end_date, "%Y-%m-%d")
+    all_dates = set(pd.date_range(start=dt_start, end=dt_end).strftime("%Y-%m-%d"))
+    missing_dates = sorted(list(all_dates - existing_dates))
+    date_ranges = []
+    if missing_dates:
+        range_start = missing_dates[0]
+        prev_date = datetime.strptime(missing_dates[0], "%Y-%m-%d")
+        for date_str in missing_dates[1:] + [None]:
+            if date_str is None or datetime.strptime(
+                date_str, "%Y-%m-%d"
+            ) - prev_date > timedelta(days=1):
+                date_ranges.append((range_start, prev_date.strftime("%Y-%m-%d")))
+                if date_str is not None:
+                    range_start = date_str
+            prev_date = datetime.strptime(date_str, "%Y-%m-%d") if date_str else None
+    chunks = []
+    split_size = int(np.floor(1000 / len(datatypes)))
+    for start, end in date_ranges:
+        for chunk_start in pd.date_range(start, end, freq=f"{split_size}D"):
+            chunk_end = min(
+                chunk_start + timedelta(days=split_size - 1),
+                datetime.strptime(end, "%Y-%m-%d"),
+            )
+            chunks.append(
+                (
+                    station_id,
+                    datatypes,
+                    chunk_start.strftime("%Y-%m-%d"),
+                    chunk_end.strftime("%Y-%m-%d"),
+                )
+            )
+    return chunks
+
+
+def days(chunks):
+    """
+    requested station days of chunks
+    """
+    return {
+        (station_id, day)
+        for station_id, _, start, end in chunks
+        for day in range(
+            int(np.datetime64(start, "D").astype(int)),
+            int(np.datetime64(end, "D").astype(int)) + 1,
+        )
+    }
+
+
+def station_file(tmp_dir, i, start, end, rng):
+    """
+    station record with random gaps, every third station reports on few days only
+    """
+    dates = pd.date_range(start, end)
+    keep = rng.random(len(dates)) < (0.15 if i % 3 == 0 else 0.98)
+    # a few long outages
+    for gap_start in rng.integers(0, len(dates), 5):
+        keep[gap_start : gap_start + rng.integers(30, 400)] = False
+    path = os.path.join(tmp_dir, f"station_{i}.parquet")
+    pd.DataFrame(
+        dict(
+            STATION=f"USW{i:08d}",
+            NAME=f"Station {i}",
+            DATE=dates[keep].strftime("%Y-%m-%d"),
+            TMAX=1.0,
+        )
+    ).to_parquet(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request planning.")
+    parser.add_argument("-stations", dest="n_stations", type=int, default=50)
+    parser.add_argument("-years", dest="years", type=int, default=100)
+    args = parser.parse_args()
+
+    start, end = f"{2021 - args.years}-01-01", "2020-12-31"
+    update_end = "2024-12-31"
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = [
+            station_file(tmp_dir, i, start, end, rng) for i in range(args.n_stations)
+        ]
+        t0 = time.perf_counter()
+        legacy = [
+            legacy_plan(f, f"USW{i:08d}", DATATYPES, start, update_end)
+            for i, f in enumerate(files)
+        ]
+        legacy_seconds = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        plan = RequestPlan()
+        for i, f in enumerate(files):
+            plan_station(plan, f, f"USW{i:08d}", DATATYPES, start, update_end)
+        seconds = time.perf_counter() - t0
+
+    print(
+        f"legacy      {legacy_seconds:6.2f}s  "
+        f"requests {sum(len(c) for c in legacy)}"
+    )
+    print(f"RequestPlan {seconds:6.2f}s  requests {len(plan)}")
+    missing = days(c for chunks in legacy for c in chunks)
+    print(f"all missing days requested: {missing <= days(plan.chunks())}")
+    print(plan.summary().head(6).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark the precipitation panel: one bar patch per day vs. a single binned collection,
+rendered for windows of 1, 5 and 30 years.
+"""
+
+import argparse
+import io
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+from matplotlib import dates
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+
+from noaaplotter.utils.plot_utils import precipitation_bins, precipitation_verts
+
+
+def daily_bars(ax, x_dates, prcp):
+    # previous implementation
+    ax.bar(x=x_dates, height=prcp, fc="#4393c3", alpha=1)
+
+
+def collection(ax, x_dates, prcp):
+    start, end, totals, _ = precipitation_bins(x_dates, prcp, ax.bbox.width)
+    ax.add_collection(
+        PolyCollection(
+            precipitation_verts(start, end, totals),
+            facecolor="#4393c3",
+            edgecolor="none",
+        )
+    )
+    ax.autoscale_view()
+
+
+def render(func, x_dates, prcp, dpi):
+    t0 = time.perf_counter()
+    fig = Figure(figsize=(9, 3), dpi=dpi)
+    ax = fig.add_subplot(111)
+    func(ax, x_dates, prcp)
+    ax.xaxis.set_major_locator(dates.AutoDateLocator())
+    fig.savefig(io.BytesIO(), format="png")
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark precipitation rendering.")
+    parser.add_argument("-dpi", dest="dpi", type=int, default=300)
+    parser.add_argument("-repeat", dest="repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for years in [1, 5, 30]:
+        x_dates = pd.date_range("2020-12-31", periods=int(years * 365.25), freq="-1D")
+        x_dates = x_dates[::-1].values
+        prcp = np.round(rng.exponential(4, len(x_dates)), 1)
+        prcp[rng.random(len(x_dates)) < 0.6] = 0
+        timings = {}
+        for name, func in [("bars", daily_bars), ("collection", collection)]:
+            timings[name] = min(
+                render(func, x_dates, prcp, args.dpi) for _ in range(args.repeat)
+            )
+        print(
+            f"{years:>2} years: bars {timings['bars']:.3f} s, "
+            f"collection {timings['collection']:.3f} s "
+            f"({timings['bars'] / timings['collection']:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
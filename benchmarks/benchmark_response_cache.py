@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark re-runs of a backfill with a ResponseCache against a local mock of the NCEI
+data service: a cold run fills the cache, re-runs into new output directories (like
+re-running a backfill which failed part-way) are answered from the cache, also with a
+different number of workers (differently sized adaptive windows) and offline.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+from mock_ncei import MockNCEI  # noqa: E402
+
+from noaaplotter.utils.backfill import BulkBackfill, station_file  # noqa: E402
+from noaaplotter.utils.noaa_client import NOAAClient  # noqa: E402
+from noaaplotter.utils.response_cache import ResponseCache  # noqa: E402
+
+DATATYPES = ["TMIN", "TMAX", "PRCP", "SNOW"]
+
+
+def quiet(func, *args, **kwargs):
+    with open(os.devnull, "w") as devnull:
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = devnull
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+
+def rows(output_dir, stations):
+    return sum(
+        pd.read_parquet(station_file(output_dir, s))["STATION"].notna().sum()
+        for s, _ in stations
+        if os.path.exists(station_file(output_dir, s))
+    )
+
+
+def cache_size(cache_dir):
+    return sum(
+        os.path.getsize(os.path.join(root, f))
+        for root, _, files in os.walk(cache_dir)
+        for f in files
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cached backfill re-runs.")
+    parser.add_argument("-stations", dest="n_stations", type=int, default=20)
+    parser.add_argument("-years", dest="years", type=int, default=50)
+    parser.add_argument("-latency", dest="latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    stations = [(f"USW{i:08d}", f"Station {i}") for i in range(args.n_stations)]
+    start, end = f"{2021 - args.years}-01-01", "2020-12-31"
+    # every third station is sparse, its windows grow while downloading
+    density = {s: 0.1 for s, _ in stations[::3]}
+
+    with MockNCEI(latency=args.latency, density=density) as mock:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for name, n_jobs, offline in [
+                ("cold", 8, False),
+                ("re-run", 8, False),
+                ("re-run 3 workers", 3, False),
+                ("offline", 8, True),
+            ]:
+                cache = ResponseCache(cache_dir)
+                client = NOAAClient(
+                    base_url=mock.url,
+                    concurrency=n_jobs,
+                    rate_limit=None,
+                    cache=cache,
+                    offline=offline,
+                )
+                requests_before = mock.requests
+                with tempfile.TemporaryDirectory() as output_dir:
+                    t0 = time.perf_counter()
+                    quiet(
+                        BulkBackfill(
+                            stations, output_dir, start, end, DATATYPES, client
+                        ).run,
+                        progress=False,
+                    )
+                    seconds = time.perf_counter() - t0
+                    n_rows = rows(output_dir, stations)
+                client.close()
+                print(
+                    f"{name:17s} {seconds:6.2f}s  network requests "
+                    f"{mock.requests - requests_before:4d}  rows {n_rows}  "
+                    f"cache {cache.summary()}"
+                )
+            print(f"cache size {cache_size(cache_dir) / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
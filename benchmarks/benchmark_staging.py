@@ -0,0 +1,191 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark download_from_noaa against a local mock of the NCEI data service: peak memory
+of keeping every response until the end of the download (previous pipeline) and of
+staging the responses as they arrive, each in a fresh process, and an interrupted
+download (a request fails without retries) which is resumed from its staged chunks.
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+from mock_ncei import MockNCEI  # noqa: E402
+
+from noaaplotter.utils.download_utils import (  # noqa: E402
+    download_from_noaa,
+    plan_station,
+    save_station_data,
+)
+from noaaplotter.utils.noaa_client import NOAAClient  # noqa: E402
+from noaaplotter.utils.request_plan import RequestPlan  # noqa: E402
+
+DATATYPES = ["TMIN", "TMAX", "PRCP", "SNOW", "SNWD", "TAVG"]
+STATION = "USW00000001"
+
+
+def quiet(func, *args, **kwargs):
+    with open(os.devnull, "w") as devnull:
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = devnull
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+
+def download(mode, url, output_file, start, end, n_jobs):
+    """
+    download one station in this process
+    """
+    client = NOAAClient(base_url=url, concurrency=n_jobs, rate_limit=None)
+    if mode == "in-memory":
+        plan = plan_station(RequestPlan(), output_file, STATION, DATATYPES, start, end)
+        results = client.download_plan(plan, progress=False)[STATION]
+        save_station_data(output_file, results, start, end, "Station")
+    else:
+        download_from_noaa(
+            output_file, start, end, DATATYPES, "Station", STATION, "", client=client
+        )
+    client.close()
+
+
+def peak_memory(mode, url, start, end, n_jobs):
+    """
+    peak resident memory of a download in a fresh process
+    :return: MB
+    """
+    with tempfile.TemporaryDirectory() as output_dir:
+        output = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "-child",
+                mode,
+                "-url",
+                url,
+                "-output_file",
+                os.path.join(output_dir, "station.parquet"),
+                "-start",
+                start,
+                "-end",
+                end,
+                "-n_jobs",
+                str(n_jobs),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    return float(output.split()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark staged downloads.")
+    parser.add_argument("-years", dest="years", type=int, default=150)
+    parser.add_argument("-n_jobs", dest="n_jobs", type=int, default=8)
+    parser.add_argument("-latency", dest="latency", type=float, default=0.01)
+    parser.add_argument("-child", dest="child", default=None)
+    parser.add_argument("-url", dest="url", default=None)
+    parser.add_argument("-output_file", dest="output_file", default=None)
+    parser.add_argument("-start", dest="start", default=None)
+    parser.add_argument("-end", dest="end", default=None)
+    args = parser.parse_args()
+
+    if args.child:
+        quiet(
+            download,
+            args.child,
+            args.url,
+            args.output_file,
+            args.start,
+            args.end,
+            args.n_jobs,
+        )
+        # kilobytes on linux
+        print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+        return
+
+    start, end = f"{2021 - args.years}-01-01", "2020-12-31"
+    with MockNCEI(latency=args.latency) as mock:
+        for mode in ["in-memory", "staged"]:
+            t0 = time.perf_counter()
+            mb = peak_memory(mode, mock.url, start, end, args.n_jobs)
+            seconds = time.perf_counter() - t0
+            print(f"{mode:10s} {seconds:6.2f}s  peak memory {mb:6.1f} MB")
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            reference = os.path.join(output_dir, "reference.parquet")
+            quiet(
+                download_from_noaa,
+                reference,
+                start,
+                end,
+                DATATYPES,
+                "Station",
+                STATION,
+                "",
+                client=NOAAClient(
+                    base_url=mock.url, concurrency=args.n_jobs, rate_limit=None
+                ),
+            )
+
+            output_file = os.path.join(output_dir, "station.parquet")
+            mock.failure_rate = 0.02
+            requests_before = mock.requests
+            try:
+                quiet(
+                    download_from_noaa,
+                    output_file,
+                    start,
+                    end,
+                    DATATYPES,
+                    "Station",
+                    STATION,
+                    "",
+                    client=NOAAClient(
+                        base_url=mock.url,
+                        concurrency=args.n_jobs,
+                        rate_limit=None,
+                        max_retries=0,
+                    ),
+                )
+                print("download was not interrupted")
+            except Exception as e:
+                print(
+                    f"interrupted ({type(e).__name__}) after "
+                    f"{mock.requests - requests_before} requests"
+                )
+            mock.failure_rate = 0.0
+            requests_before = mock.requests
+            quiet(
+                download_from_noaa,
+                output_file,
+                start,
+                end,
+                DATATYPES,
+                "Station",
+                STATION,
+                "",
+                client=NOAAClient(
+                    base_url=mock.url, concurrency=args.n_jobs, rate_limit=None
+                ),
+            )
+            same = pd.read_parquet(output_file).equals(pd.read_parquet(reference))
+            print(
+                f"resumed with {mock.requests - requests_before} requests, "
+                f"same rows as an uninterrupted download: {same}, "
+                f"staging removed: {not os.path.exists(output_file + '.staging')}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Benchmark nightly one-day updates of a long station record from a local mock of the
+NCEI data service: a single parquet file (read and rewritten by every update) vs. a
+PartitionedStore (every update writes a new partition file). The store is compacted
+afterwards and both are read back through NOAAPlotterDailySummariesDataset.
+"""
+
+import argparse
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+from mock_ncei import MockNCEI  # noqa: E402
+
+from noaaplotter.utils.dataset import NOAAPlotterDailySummariesDataset  # noqa: E402
+from noaaplotter.utils.download_utils import download_from_noaa  # noqa: E402
+from noaaplotter.utils.noaa_client import NOAAClient  # noqa: E402
+from noaaplotter.utils.store import PartitionedStore  # noqa: E402
+
+DATATYPES = ["TMIN", "TMAX", "PRCP", "SNOW"]
+STATION = "USW00026616"
+NAME = "KOTZEBUE"
+
+
+def quiet(func, *args, **kwargs):
+    with open(os.devnull, "w") as devnull:
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = devnull
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+
+def update(client, output, start, end, store):
+    return quiet(
+        download_from_noaa,
+        output,
+        start,
+        end,
+        DATATYPES,
+        NAME,
+        STATION,
+        "",
+        client=client,
+        store=store,
+    )
+
+
+def read(path):
+    t0 = time.perf_counter()
+    data = NOAAPlotterDailySummariesDataset(path, location=NAME).data
+    return time.perf_counter() - t0, len(data), data["TMAX"].notna().sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nightly updates.")
+    parser.add_argument("-years", dest="years", type=int, default=80)
+    parser.add_argument("-nights", dest="nights", type=int, default=30)
+    args = parser.parse_args()
+
+    today = dt.date.today()
+    start = (today - dt.timedelta(days=365 * args.years)).isoformat()
+    nights = [
+        (today - dt.timedelta(days=args.nights - i)).isoformat()
+        for i in range(args.nights + 1)
+    ]
+
+    with MockNCEI() as mock, tempfile.TemporaryDirectory() as tmp_dir:
+        client = NOAAClient(base_url=mock.url, concurrency=8, rate_limit=None)
+        for label, output, store in [
+            ("file ", os.path.join(tmp_dir, "station.parquet"), False),
+            ("store", os.path.join(tmp_dir, "store"), True),
+        ]:
+            t0 = time.perf_counter()
+            update(client, output, start, nights[0], store)
+            initial = time.perf_counter() - t0
+            requests_before = mock.requests
+            t0 = time.perf_counter()
+            for end in nights[1:]:
+                update(client, output, start, end, store)
+            seconds = (time.perf_counter() - t0) / args.nights
+            requests = (mock.requests - requests_before) / args.nights
+            read_seconds, n_rows, n_data = read(output)
+            print(
+                f"{label}  initial {initial:6.2f}s  update {seconds * 1000:7.1f}ms "
+                f"({requests:.1f} requests)  read {read_seconds * 1000:6.1f}ms  "
+                f"rows {n_rows} ({n_data} with data)"
+            )
+
+        store = PartitionedStore(os.path.join(tmp_dir, "store"))
+        n_files = len(store.files())
+        t0 = time.perf_counter()
+        result = store.compact()
+        seconds = time.perf_counter() - t0
+        read_seconds, n_rows, n_data = read(store.root)
+        print(
+            f"compact {n_files} -> {len(store.files())} files {seconds:6.2f}s  "
+            f"read {read_seconds * 1000:6.1f}ms  rows {n_rows} ({n_data} with data)  "
+            f"{result}"
+        )
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Local mock of the NCEI data service (daily-summaries, json) to test and benchmark
+downloads without network access. Values are deterministic per station and day.
+The mock can add latency, rate limit (429 with Retry-After) and fail randomly (503).
+Stations report on every day by default, sparse stations on a share of days only.
+Responses are truncated at the requested limit like those of the data service.
+
+    python benchmarks/mock_ncei.py -port 8060 -latency 0.05 -rate 20 -failure_rate 0.05 -density 0.2
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+DATATYPES = ["TMIN", "TMAX", "PRCP", "SNOW", "SNWD", "TAVG"]
+
+
+def station_rows(station, datatypes, start_date, end_date, density=1.0):
+    """
+    deterministic daily rows of a station, like the rows of the data service
+    :param density: share of days with a row
+    """
+    days = pd.date_range(start_date, end_date)
+    rng = np.random.default_rng(zlib.crc32(station.encode()))
+    # values depend on the day only, not on the requested period
+    doy = days.dayofyear.values
+    noise = np.sin(days.values.astype("datetime64[D]").astype(int) * 12.9898) * 3
+    offset = rng.uniform(-10, 10)
+    values = dict(
+        TMAX=offset + 5 - 15 * np.cos(2 * np.pi * doy / 365.25) + noise,
+        TMIN=offset - 5 - 15 * np.cos(2 * np.pi * doy / 365.25) + noise,
+        PRCP=np.clip(noise, 0, None),
+        SNOW=np.clip(-noise * 3, 0, None),
+        SNWD=np.clip(-noise * 10, 0, None),
+    )
+    values["TAVG"] = (values["TMAX"] + values["TMIN"]) / 2
+    dates = days.strftime("%Y-%m-%d")
+    # days without observations are the same for every requested period
+    day_numbers = days.values.astype("datetime64[D]").astype(np.int64)
+    observed = (np.sin(day_numbers * 78.233 + offset) * 43758.5453) % 1 < density
+    return [
+        dict(
+            DATE=dates[i],
+            STATION=station,
+            **{d: f"{values[d][i]:.1f}" for d in datatypes if d in values},
+        )
+        for i in np.flatnonzero(observed)
+    ]
+
+
+class MockNCEI(object):
+    """
+    mock data service running in a background thread
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        rate=None,
+        failure_rate=0.0,
+        density=1.0,
+    ):
+        """
+        :param port: port, 0 for any free port
+        :param latency: seconds per response
+        :param rate: requests per second before responding with 429, None for no limit
+        :param failure_rate: fraction of requests failing with 503
+        :param density: share of days with data, a float for all stations or a dict of
+            station -> share (1 for stations which are not in the dict)
+        """
+        self.latency = latency
+        self.density = density
+        self.rate = rate
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.rate_limited = 0
+        self.failed = 0
+        self._recent = []
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+        handler = type("Handler", (MockHandler,), dict(mock=self))
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.url = (
+            f"http://{host}:{self.server.server_address[1]}/access/services/data/v1"
+        )
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def admit(self):
+        """
+        :return: http status of the next request
+        """
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            if self.rate:
+                self._recent = [t for t in self._recent if now - t < 1]
+                if len(self._recent) >= self.rate:
+                    self.rate_limited += 1
+                    return 429
+                self._recent.append(now)
+            if self._random.random() < self.failure_rate:
+                self.failed += 1
+                return 503
+        return 200
+
+    def station_density(self, station):
+        if isinstance(self.density, dict):
+            return self.density.get(station, 1.0)
+        return self.density
+
+    def stats(self):
+        return dict(
+            requests=self.requests,
+            rate_limited=self.rate_limited,
+            failed=self.failed,
+        )
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    mock = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        time.sleep(self.mock.latency)
+        status = self.mock.admit()
+        if status != 200:
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        datatypes = ",".join(query.get("dataTypes", [])).split(",")
+        rows = station_rows(
+            query["stations"][0],
+            [d for d in datatypes if d],
+            query["startDate"][0],
+            query["endDate"][0],
+            self.mock.station_density(query["stations"][0]),
+        )
+        rows = rows[: int(query.get("limit", [1000])[0])]
+        body = json.dumps(rows).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock of the NCEI data service.")
+    parser.add_argument("-port", dest="port", type=int, default=8060)
+    parser.add_argument("-latency", dest="latency", type=float, default=0.0)
+    parser.add_argument("-rate", dest="rate", type=float, default=None)
+    parser.add_argument("-failure_rate", dest="failure_rate", type=float, default=0.0)
+    parser.add_argument("-density", dest="density", type=float, default=1.0)
+    args = parser.parse_args()
+
+    mock = MockNCEI(
+        port=args.port,
+        latency=args.latency,
+        rate=args.rate,
+        failure_rate=args.failure_rate,
+        density=args.density,
+    )
+    print(f"Mock data service on {mock.url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Stress test of concurrent rendering: daily and monthly plots of one shared NOAAPlotter
+are rendered in a thread pool and compared byte by byte to serially rendered plots.
+Exits with an error if any output differs.
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from noaaplotter.noaaplotter import NOAAPlotter
+
+
+def make_record(output_file):
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("1970-01-01", "2020-12-31")
+    doy = dates.dayofyear.values
+    t = -5 + 15 * np.sin((doy - 110) / 365 * 2 * np.pi) + rng.normal(0, 4, len(dates))
+    tmax = np.round(t + 5, 1)
+    tmax[rng.random(len(dates)) < 0.01] = np.nan
+    df = pd.DataFrame(
+        {
+            "STATION": "SYNTH",
+            "NAME": "SYNTHETIC STATION",
+            "DATE": dates.strftime("%Y-%m-%d"),
+            "PRCP": np.round(
+                rng.exponential(2, len(dates)) * (rng.random(len(dates)) < 0.3), 1
+            ),
+            "SNOW": np.round(np.where(t < 0, rng.exponential(5, len(dates)), 0), 1),
+            "TMAX": tmax,
+            "TMIN": np.round(t - 5, 1),
+        }
+    )
+    df.to_parquet(output_file)
+
+
+def render(plotter, job):
+    """
+    render one plot job to png bytes and return its hash
+    """
+    kind, start, end = job
+    buffer = io.BytesIO()
+    if kind == "daily":
+        fig = plotter.plot_weather_series(
+            start, end, show_plot=False, return_plot=True, dpi=100
+        )
+    else:
+        fig = plotter.plot_monthly_barchart(
+            start,
+            end,
+            information=kind,
+            anomaly=True,
+            show_plot=False,
+            return_plot=True,
+        )
+    fig.savefig(buffer, format="png")
+    return hashlib.sha1(buffer.getvalue()).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test parallel rendering.")
+    parser.add_argument("-threads", dest="threads", type=int, default=8)
+    parser.add_argument("-rounds", dest="rounds", type=int, default=4)
+    args = parser.parse_args()
+
+    jobs = [
+        ("daily", f"{year}-07-01", f"{year + 1}-06-30") for year in range(2010, 2020)
+    ]
+    jobs += [
+        (information, "1990-01-01", "2020-12-31")
+        for information in ["Temperature", "Precipitation"]
+    ]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "synthetic.parquet")
+        make_record(path)
+
+        reference = NOAAPlotter(path)
+        t0 = time.perf_counter()
+        expected = [render(reference, job) for job in jobs]
+        t_serial = time.perf_counter() - t0
+
+        # a fresh plotter, climatologies are built concurrently by the first jobs
+        plotter = NOAAPlotter(path)
+        all_jobs = jobs * args.rounds
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            results = list(pool.map(lambda job: render(plotter, job), all_jobs))
+        t_parallel = time.perf_counter() - t0
+
+    mismatches = [
+        job
+        for job, result, exp in zip(all_jobs, results, expected * args.rounds)
+        if result != exp
+    ]
+    print(f"serial: {len(jobs) / t_serial:.1f} plots/s (incl. climatology)")
+    print(
+        f"{args.threads} threads: {len(all_jobs) / t_parallel:.1f} plots/s, "
+        f"{len(all_jobs) - len(mismatches)}/{len(all_jobs)} identical"
+    )
+    if mismatches:
+        for job in sorted(set(mismatches)):
+            print(f"output differs: {job}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
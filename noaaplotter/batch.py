@@ -0,0 +1,365 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from matplotlib import dates
+from matplotlib.collections import PolyCollection
+
+from noaaplotter.utils.downsample import downsample_plot_series, lttb_indices
+from noaaplotter.utils.plot_utils import (
+    fill_verts,
+    new_figure,
+    precipitation_bins,
+    precipitation_verts,
+    span_verts,
+)
+from noaaplotter.utils.utils import parse_dates
+
+
+def _auto_limits(values, lower, upper, margin=0.05):
+    """
+    data limits with the default margins of matplotlib, fixed limits given as numbers
+    take precedence
+    """
+    values = np.concatenate([np.asarray(v, dtype=float).ravel() for v in values])
+    values = values[np.isfinite(values)]
+    lo, hi = (values.min(), values.max()) if len(values) else (0.0, 1.0)
+    if hi == lo:
+        # expanded like the limits of constant data in matplotlib
+        lo, hi = (-0.05, 0.05) if hi == 0 else (lo - abs(lo) / 20, hi + abs(hi) / 20)
+    pad = (hi - lo) * margin
+    lo = lower if isinstance(lower, (int, float)) else lo - pad
+    hi = upper if isinstance(upper, (int, float)) else hi + pad
+    return lo, hi
+
+
+def temperature_series(data):
+    """
+    Lines and filled areas of the temperature plot
+    :param data: prepared daily series
+    :type data: PlotData
+    :return: dict of lines (x, y) and dict of filled areas (x, y1, y2)
+    """
+    climate = data["climate"]
+    observed = data["observed"]
+    x_short = observed["DATE"]
+    lines = dict(
+        cm=(climate["DATE"], climate["mean"]),
+        cm_hi=(climate["DATE"], climate["std_hi"]),
+        cm_low=(climate["DATE"], climate["std_lo"]),
+        obs=(x_short, observed["TMEAN"]),
+    )
+    fills = dict(
+        fill_r=(x_short, observed["t_above"], observed["clim_mean"]),
+        fill_rr=(x_short, observed["t_above_std"], observed["clim_std_hi"]),
+        fill_b=(x_short, observed["clim_mean"], observed["t_below"]),
+        fill_bb=(x_short, observed["clim_std_lo"], observed["t_below_std"]),
+    )
+    return lines, fills
+
+
+class DailySeriesBatchRenderer(object):
+    """
+    Daily weather series plot (temperature, precipitation and snow accumulation) of a
+    NOAAPlotter. The figure template and its artists are built once, each plot only
+    swaps their data, so that many plots (years, stations) are rendered with a single
+    figure. plot_weather_series renders its plot with a renderer of its own.
+    """
+
+    def __init__(
+        self,
+        plot_tmax="auto",
+        plot_tmin="auto",
+        plot_pmax="auto",
+        plot_snowmax="auto",
+        plot_extrema=True,
+        show_snow_accumulation=True,
+        figsize=(9, 6),
+        legend_fontsize="x-small",
+        dpi=300,
+        downsample=False,
+    ):
+        """
+        :param plot_tmax: maximum of temperature axis, 'auto' to scale to data
+        :param plot_tmin: minimum of temperature axis, 'auto' to scale to data
+        :param plot_pmax: maximum of precipitation axis, 'auto' to scale to data
+        :param plot_snowmax: maximum of snow accumulation axis, 'auto' to scale to data
+        :param plot_extrema: mark record highs/lows
+        :param show_snow_accumulation:
+        :param figsize:
+        :param legend_fontsize:
+        :param dpi:
+        :param downsample: reduce lines and filled areas to the pixel resolution of the plot, for long periods
+        :type downsample: bool
+        """
+        self.plot_tmax = plot_tmax
+        self.plot_tmin = plot_tmin
+        self.plot_pmax = plot_pmax
+        self.plot_snowmax = plot_snowmax
+        self.plot_extrema = plot_extrema
+        self.show_snow_accumulation = show_snow_accumulation
+        self.figsize = figsize
+        self.legend_fontsize = legend_fontsize
+        self.dpi = dpi
+        self.downsample = downsample
+        self.fig = None
+        self.artists = {}
+        self._layout_key = None
+        self._legend_key = None
+
+    def build(self, interactive=False):
+        """
+        create the figure template with empty artists
+        :param interactive: create the figure with pyplot, e.g. to show it
+        :type interactive: bool
+        :return: matplotlib.figure.Figure
+        """
+        fig = new_figure(self.figsize, self.dpi, interactive=interactive)
+        ax_t = fig.add_subplot(211)
+        ax_p = fig.add_subplot(212, sharex=ax_t)
+        a = dict(ax_t=ax_t, ax_p=ax_p)
+
+        # climate series (red line)
+        (a["cm"],) = ax_t.plot([], [], c="k", alpha=0.5, lw=2)
+        (a["cm_hi"],) = ax_t.plot([], [], c="r", ls="--", alpha=0.4, lw=1)
+        (a["cm_low"],) = ax_t.plot([], [], c="r", ls="--", alpha=0.4, lw=1)
+        # observed series (grey line)
+        (a["obs"],) = ax_t.plot([], [], c="k", alpha=0.4, lw=1.2)
+        # difference of observed and climate
+        for name, color, alpha in [
+            ("fill_r", "#d6604d", 0.5),
+            ("fill_rr", "#d6604d", 0.7),
+            ("fill_b", "#4393c3", 0.5),
+            ("fill_bb", "#4393c3", 0.7),
+        ]:
+            a[name] = ax_t.add_collection(
+                PolyCollection([], facecolor=color, alpha=alpha), autolim=False
+            )
+        if self.plot_extrema:
+            a["xtreme_hi"] = ax_t.scatter([], [], c="#d6604d", marker="x")
+            a["xtreme_lo"] = ax_t.scatter([], [], c="#4393c3", marker="x")
+        ax_t.axhline(0, ls="--")
+        ax_t.grid()
+        ax_t.set_ylabel("Temperature in °C")
+        ax_t.set_xlabel("Date")
+
+        # precipitation
+        a["rain"] = ax_p.add_collection(
+            PolyCollection([], facecolor="#4393c3", edgecolor="none", alpha=1),
+            autolim=False,
+        )
+        ax_p.grid()
+        ax_p.set_ylabel("Precipitation in mm")
+        ax_p.set_xlabel("Date")
+        if self.show_snow_accumulation:
+            ax_s = ax_p.twinx()
+            a["ax_s"] = ax_s
+            a["sn_acc"] = ax_s.add_collection(
+                PolyCollection([], facecolor="k", alpha=0.2), autolim=False
+            )
+            (a["sn_line"],) = ax_s.plot([], [], c="k", alpha=0.2, ls="--")
+            ax_s.set_ylabel("Cumulative Snowfall in cm")
+
+        # no data
+        for name, ax in [("nan_t", ax_t), ("nan_p", ax_p)]:
+            a[name] = ax.add_collection(
+                PolyCollection([], facecolor="k", edgecolor="none", alpha=0.2),
+                autolim=False,
+            )
+
+        # dates on the x-axis, monthly ticks or ticks to fit the axis width if downsampled
+        ax_t.xaxis.axis_date()
+        if self.downsample:
+            locator = dates.AutoDateLocator()
+            ax_t.xaxis.set_major_formatter(dates.AutoDateFormatter(locator))
+        else:
+            locator = dates.MonthLocator()
+        ax_t.xaxis.set_major_locator(locator)
+        self.fig = fig
+        self.artists = a
+        # subplot parameters of the template, the starting point of every layout
+        self._subplotpars = {
+            k: getattr(fig.subplotpars, k)
+            for k in ["left", "bottom", "right", "top", "wspace", "hspace"]
+        }
+        self._layout_key = None
+        self._legend_key = None
+        return fig
+
+    def render(self, plotter, start_date, end_date, save_path=None, title=None):
+        """
+        Render daily weather series of a NOAAPlotter into the figure template
+        :param plotter: plotter of the station
+        :type plotter: NOAAPlotter
+        :param start_date: start date of plot
+        :type start_date: datetime, str
+        :param end_date: end date of plot
+        :type end_date: datetime, str
+        :param save_path: file path of the plot, not saved if not given
+        :type save_path: str, optional
+        :param title: plot title
+        :type title: str, optional
+        :return: matplotlib.figure.Figure
+        """
+        if self.fig is None:
+            self.build()
+        a = self.artists
+        ax_t, ax_p = a["ax_t"], a["ax_p"]
+        start_date = parse_dates(start_date)
+        end_date = parse_dates(end_date)
+        data = plotter.prepare_daily_series(
+            start_date, end_date, self.show_snow_accumulation, self.plot_extrema
+        )
+        observed = data["observed"]
+        records = data["records"]
+        show_snow_accumulation = data.meta["show_snow_accumulation"]
+        last_snow_date = np.datetime64(data.meta["last_snow_date"], "ns")
+        x_snow, snow_acc = observed["DATE"], observed["SNOW_ACC"]
+
+        lines, fills = temperature_series(data)
+        if self.downsample:
+            # about one point per pixel, records and the last snowfall stay exact
+            n_pixels = int(ax_t.bbox.width)
+            keep = dict(obs=np.isin(observed["DATE"], records["DATE"]))
+            lines, fills = downsample_plot_series(lines, fills, n_pixels, keep)
+            if show_snow_accumulation:
+                idx = lttb_indices(
+                    snow_acc, 2 * n_pixels, keep=x_snow == last_snow_date
+                )
+                x_snow, snow_acc = x_snow[idx], snow_acc[idx]
+
+        # temperature
+        for name, (x, y) in lines.items():
+            a[name].set_data(dates.date2num(x), y)
+        for name, (x, y1, y2) in fills.items():
+            a[name].set_verts(fill_verts(dates.date2num(x), y1, y2))
+        legend_handle_t = [a["obs"], a["cm"], a["cm_hi"], a["fill_r"], a["fill_b"]]
+        legend_text_t = [
+            "Observed Temperatures",
+            "Climatological Mean",
+            "Std of Climatological Mean",
+            "Above average Temperature",
+            "Below average Temperature",
+        ]
+        if self.plot_extrema:
+            for name, record in [("xtreme_hi", "high"), ("xtreme_lo", "low")]:
+                r = records[records["record"] == record]
+                a[name].set_offsets(
+                    np.column_stack([dates.date2num(r["DATE"]), r["TMEAN"]])
+                )
+            legend_handle_t.extend([a["xtreme_hi"], a["xtreme_lo"]])
+            legend_text_t.extend(["Record High on Date", "Record Low on Date"])
+        ax_t.set_xlim(start_date, end_date)
+        # limits of the plotted data including the zero line
+        lo, hi = _auto_limits(
+            [y for _, y in lines.values()]
+            + [y for _, y1, y2 in fills.values() for y in (y1, y2)]
+            + [records["TMEAN"], [0]],
+            self.plot_tmin,
+            self.plot_tmax,
+        )
+        ax_t.set_ylim(lo, hi)
+        nan_t = self._nodata_verts(data, "TMEAN", lo, hi)
+        a["nan_t"].set_verts(nan_t)
+        if len(nan_t) > 0:
+            legend_handle_t.append(a["nan_t"])
+            legend_text_t.append("No Data")
+        ax_t.set_title(title if title else "")
+
+        # precipitation, binned to weekly/monthly totals if days exceed the axis pixels
+        p_start, p_end, p_totals, p_label = precipitation_bins(
+            observed["DATE"], observed["PRCP"], ax_p.bbox.width
+        )
+        a["rain"].set_verts(precipitation_verts(p_start, p_end, p_totals))
+        legend_handle_p = [a["rain"]]
+        legend_text_p = [p_label]
+        lo, hi = _auto_limits([p_totals, [0]], 0, self.plot_pmax)
+        ax_p.set_ylim(lo, hi)
+
+        # snow, the twin axis is hidden for stations without snowfall
+        if self.show_snow_accumulation:
+            x_snow = dates.date2num(x_snow)
+            snow_acc = snow_acc / 10
+            before = x_snow <= dates.date2num(last_snow_date)
+            after = x_snow >= dates.date2num(last_snow_date)
+            if not show_snow_accumulation:
+                before = after = np.zeros(len(x_snow), dtype=bool)
+            a["sn_acc"].set_verts(fill_verts(x_snow[before], snow_acc[before], 0))
+            a["sn_line"].set_data(x_snow[after], snow_acc[after])
+            a["ax_s"].set_ylim(*_auto_limits([snow_acc, [0]], 0, self.plot_snowmax))
+            a["ax_s"].set_visible(show_snow_accumulation)
+        if show_snow_accumulation:
+            legend_handle_p.append(a["sn_acc"])
+            legend_text_p.append("Cumulative Snowfall")
+        nan_p = self._nodata_verts(data, "PRCP", lo, hi)
+        a["nan_p"].set_verts(nan_p)
+        if len(nan_p) > 0:
+            legend_handle_p.append(a["nan_p"])
+            legend_text_p.append("No Data")
+
+        # legends only need to be rebuilt if their entries change
+        legend_key = (tuple(legend_text_t), tuple(legend_text_p))
+        if self._legend_key != legend_key:
+            ax_t.legend(
+                legend_handle_t,
+                legend_text_t,
+                loc="lower center",
+                fontsize=self.legend_fontsize,
+                ncol=4,
+                bbox_to_anchor=(0.5, 1.02),
+            )
+            ax_p.legend(
+                legend_handle_p,
+                legend_text_p,
+                loc="upper left",
+                fontsize=self.legend_fontsize,
+            )
+            self._legend_key = legend_key
+        for ax in [ax_t, ax_p]:
+            for label in ax.get_xticklabels():
+                label.set(rotation=45, ha="right", rotation_mode="anchor")
+
+        # the layout depends on the texts around the axes: tick labels of the current
+        # limits, legends, title and the visible axes
+        layout_key = (
+            title or "",
+            legend_key,
+            tuple(
+                (ax.get_visible(),)
+                + tuple(label.get_text() for label in ax.get_xticklabels())
+                + tuple(label.get_text() for label in ax.get_yticklabels())
+                for ax in self.fig.axes
+            ),
+        )
+        if self._layout_key != layout_key:
+            # tight_layout depends on the positions it starts from (legend above the
+            # axes), the template positions make it independent of previous plots
+            self.fig.subplots_adjust(**self._subplotpars)
+            self.fig.tight_layout()
+            self._layout_key = layout_key
+
+        if save_path:
+            self.fig.savefig(save_path)
+        return self.fig
+
+    @staticmethod
+    def _nodata_verts(data, variable, bottom, top):
+        """
+        rectangles of the spans of missing days of a variable
+        """
+        spans = data["nodata"][data["nodata"]["variable"] == variable]
+        return span_verts(
+            dates.date2num(spans["start"]) - 0.5,
+            dates.date2num(spans["end"]) + 0.5,
+            bottom,
+            top,
+        )
+
+    def close(self):
+        """
+        release the figure template
+        """
+        self.fig = None
+        self.artists = {}
+        self._layout_key = None
+        self._legend_key = None
@@ -7,19 +7,22 @@
 # contact: ingmar.nitze@awi.de
 # version: 2021-09-06
 
+import io
+import threading
+
 import numpy as np
-from matplotlib import dates
 
 ########################
-from matplotlib import pyplot as plt
-
 from noaaplotter.utils.dataset import NOAAPlotterDailyClimateDataset as DS_daily
 from noaaplotter.utils.dataset import NOAAPlotterDailySummariesDataset as Dataset
 from noaaplotter.utils.dataset import NOAAPlotterMonthlyClimateDataset as DS_monthly
+from noaaplotter.utils.cache import ClimateNormalsCache
+from noaaplotter.utils.dataset import PLOT_COLUMNS
+from noaaplotter.utils.plot_data import PlotData, make_table
 from noaaplotter.utils.plot_utils import *
+from noaaplotter.utils.render_cache import RENDER_FORMATS
 from noaaplotter.utils.utils import *
 
-pd.plotting.register_matplotlib_converters()
 numeric_only = True
 
 
@@ -36,6 +39,10 @@ class NOAAPlotter(object):
         climate_start=dt.datetime(1981, 1, 1),
         climate_end=dt.datetime(2010, 12, 31),
         climate_filtersize=7,
+        data_start=None,
+        data_end=None,
+        cache_dir=None,
+        render_cache=None,
     ):
         """
 
@@ -49,19 +56,121 @@ class NOAAPlotter(object):
         :type climate_start: datetime, optional
         :param climate_end: start date of climate period, defaults to 31-12-2010
         :type climate_end: datetime, optional
+        :param data_start: first date to load from input file, defaults to start of file.
+            The climate period is always loaded.
+        :type data_start: datetime, str, optional
+        :param data_end: last date to load from input file, defaults to end of file. The
+            climate period is always loaded.
+        :type data_end: datetime, str, optional
+        :param cache_dir: directory to cache climate normals, defaults to no caching
+        :type cache_dir: str, optional
+        :param render_cache: cache of plots rendered to bytes, may be shared by plotters
+        :type render_cache: RenderCache, optional
         """
         self.input_filepath = input_filepath
         self.location = location
         self.climate_start = climate_start
         self.climate_end = climate_end
+        self.climate_filtersize = climate_filtersize
         self.remove_feb29 = remove_feb29
+        self.cache = ClimateNormalsCache(cache_dir) if cache_dir else None
+        self.render_cache = render_cache
+        # climatologies are built from the loaded data, the window includes the climate
+        # period
+        if data_start is not None:
+            data_start = min(
+                pd.Timestamp(parse_dates(data_start)),
+                pd.Timestamp(parse_dates(climate_start)),
+            )
+        if data_end is not None:
+            data_end = max(
+                pd.Timestamp(parse_dates(data_end)),
+                pd.Timestamp(parse_dates(climate_end)),
+            )
         self.dataset = Dataset(
-            input_filepath, location=location, remove_feb29=remove_feb29
+            input_filepath,
+            location=location,
+            remove_feb29=remove_feb29,
+            start_date=data_start,
+            end_date=data_end,
+            columns=PLOT_COLUMNS,
+        )
+        # climatologies and aggregates are calculated on first use
+        self._memo = {}
+        self._memo_lock = threading.RLock()
+
+    def _memoized(self, name, key, factory):
+        """
+        return memoised value, recalculated if its key (e.g. the climate period) changed
+        :param name: name of the memoised value
+        :param key: parameters the value depends on
+        :param factory: function to calculate the value
+        :return:
+        """
+        # concurrent plots wait for the first one instead of calculating it again
+        with self._memo_lock:
+            cached = self._memo.get(name)
+            if cached is None or cached[0] != key:
+                cached = (key, factory())
+                self._memo[name] = cached
+        return cached[1]
+
+    @property
+    def df_clim_(self):
+        """
+        daily climatology of the climate period
+        """
+        return self._memoized(
+            "daily_climate",
+            (self.climate_start, self.climate_end, self.climate_filtersize),
+            lambda: DS_daily(
+                self.dataset,
+                start=self.climate_start,
+                end=self.climate_end,
+                filtersize=self.climate_filtersize,
+                cache=self.cache,
+            ),
         )
 
-        # TODO: move to respective functions?
-        self.df_clim_ = DS_daily(self.dataset, filtersize=climate_filtersize)
-        #
+    @property
+    def df_clim_monthly_(self):
+        """
+        monthly climatology of the climate period
+        """
+
+        def factory():
+            data_clim = DS_monthly(
+                self.dataset,
+                start=self.climate_start,
+                end=self.climate_end,
+                cache=self.cache,
+            )
+            data_clim.calculate_monthly_climate()
+            return data_clim
+
+        return self._memoized(
+            "monthly_climate", (self.climate_start, self.climate_end), factory
+        )
+
+    def get_monthly_aggregate(self, end_date, min_valid_days=1):
+        """
+        monthly aggregates from the start of the dataset until end_date
+        :param end_date:
+        :param min_valid_days: minimum number of valid days per month
+        :return:
+        """
+
+        def factory():
+            data_monthly = DS_monthly(
+                self.dataset,
+                start=self.dataset.data["DATE"].min(),
+                end=end_date,
+                min_valid_days=min_valid_days,
+            )
+            data_monthly.calculate_monthly_statistics()
+            return data_monthly
+
+        return self._memoized("monthly_aggregate", (end_date, min_valid_days), factory)
 
     def _make_short_dateseries(self, start_date, end_date):
         x_dates = pd.DataFrame()
@@ -79,53 +188,17 @@ class NOAAPlotter(object):
 
         return x_dates, x_dates_short
 
-    def plot_weather_series(
-        self,
-        start_date,
-        end_date,
-        plot_tmax="auto",
-        plot_tmin="auto",
-        plot_pmax="auto",
-        plot_snowmax="auto",
-        plot_extrema=True,
-        show_plot=True,
-        show_snow_accumulation=True,
-        save_path=False,
-        figsize=(9, 6),
-        legend_fontsize="x-small",
-        dpi=300,
-        title=None,
-        return_plot=False,
-    ):
+    def _prepare_weather_series(self, start_date, end_date, show_snow_accumulation):
         """
-        Plotting Function to show observed vs climate temperatures and snowfall
-        :param dpi:
-        :param legend_fontsize:
-        :param figsize:
+        Prepare observed and climate series of a daily weather plot
         :param start_date: start date of plot
-        :type start_date: datetime, str
+        :type start_date: datetime
         :param end_date: end date of plot
-        :type end_date: datetime, str
-        :param plot_tmax:
-        :type plot_tmax: int, float, str
-        :param plot_tmin:
-        :type plot_tmin: int, float, str
-        :param plot_pmax:
-        :type plot_pmax: int, float, str
-        :param plot_snowmax:
-        :type plot_snowmax: int, float, str
-        :param plot_extrema:
-        :type plot_extrema:
-        :param show_plot:
-        :type show_plot:
+        :type end_date: datetime
         :param show_snow_accumulation:
-        :type show_snow_accumulation:
-        :param save_path:
-        :type save_path:
-        :return:
+        :type show_snow_accumulation: bool
+        :return: dict of series
         """
-        start_date = parse_dates(start_date)
-        end_date = parse_dates(end_date)
         x_dates, x_dates_short = self._make_short_dateseries(start_date, end_date)
 
         df_clim = self.df_clim_.data.loc[x_dates["DATE_MD"]]
@@ -160,284 +233,321 @@ class NOAAPlotter(object):
         ).min(axis=0)
 
         # Calculate the date of last snowfall and cumulative sum of snowfall
+        last_snow_date = None
+        snow_acc = None
         if not show_snow_accumulation:
             None
         elif (show_snow_accumulation) and ("SNOW" in df_obs.columns):
-            last_snow_date = df_obs[df_obs["SNOW"] > 0].iloc[-1]["DATE"]
+            snow_dates = df_obs.loc[df_obs["SNOW"] > 0, "DATE"]
+            # windows without snowfall have a flat accumulation from their first day
+            last_snow_date = (
+                snow_dates.iloc[-1] if len(snow_dates) else df_obs["DATE"].iloc[0]
+            )
             snow_acc = np.cumsum(df_obs["SNOW"])
         elif "SNOW" not in df_obs.columns:
             show_snow_accumulation = False
             raise Warning("No snow information available")
 
-            # PLOT
-        fig = plt.figure(figsize=figsize, dpi=dpi)
-        ax_t = fig.add_subplot(211)
-        ax_p = fig.add_subplot(212, sharex=ax_t)
-
-        # climate series (red line)
-        (cm,) = ax_t.plot(x_dates["DATE"].values, y_clim.values, c="k", alpha=0.5, lw=2)
-        (cm_hi,) = ax_t.plot(
-            x_dates["DATE"].values,
-            y_clim_std_hi.values,
-            c="r",
-            ls="--",
-            alpha=0.4,
-            lw=1,
-        )
-        (cm_low,) = ax_t.plot(
-            x_dates["DATE"].values,
-            y_clim_std_lo.values,
-            c="r",
-            ls="--",
-            alpha=0.4,
-            lw=1,
-        )
-
-        # observed series (grey line)
-        (fb,) = ax_t.plot(
-            x_dates_short["DATE"].values,
-            df_obs["TMEAN"].values,
-            c="k",
-            alpha=0.4,
-            lw=1.2,
+        return dict(
+            x_dates=x_dates,
+            x_dates_short=x_dates_short,
+            df_obs=df_obs,
+            clim_locs_short=clim_locs_short,
+            y_clim=y_clim,
+            y_clim_std_hi=y_clim_std_hi,
+            y_clim_std_lo=y_clim_std_lo,
+            t_above=t_above,
+            t_above_std=t_above_std,
+            t_below=t_below,
+            t_below_std=t_below_std,
+            show_snow_accumulation=show_snow_accumulation,
+            last_snow_date=last_snow_date,
+            snow_acc=snow_acc,
         )
 
-        # difference of observed and climate (grey area)
-        fill_r = ax_t.fill_between(
-            x_dates_short["DATE"].values,
-            y1=t_above,
-            y2=y_clim.loc[clim_locs_short].values,
-            facecolor="#d6604d",
-            alpha=0.5,
+    def prepare_daily_series(
+        self, start_date, end_date, show_snow_accumulation=True, plot_extrema=True
+    ):
+        """
+        Data of a daily weather series plot, independent of rendering
+        :param start_date: start date of plot
+        :type start_date: datetime, str
+        :param end_date: end date of plot
+        :type end_date: datetime, str
+        :param show_snow_accumulation: include cumulative snowfall
+        :type show_snow_accumulation: bool
+        :param plot_extrema: include record highs/lows
+        :type plot_extrema: bool
+        :return: PlotData with the tables
+            climate (whole period): DATE, mean, std_hi, std_lo,
+            observed (until the last date of the dataset): DATE, TMEAN, PRCP, SNOW_ACC,
+            clim_mean, clim_std_hi, clim_std_lo, t_above, t_above_std, t_below, t_below_std,
+            records: DATE, TMEAN, record ('high'/'low'),
+            nodata (spans of missing days): variable, start, end
+        """
+        start_date = parse_dates(start_date)
+        end_date = parse_dates(end_date)
+        series = self._prepare_weather_series(
+            start_date, end_date, show_snow_accumulation
         )
-        fill_rr = ax_t.fill_between(
-            x_dates_short["DATE"].values,
-            y1=t_above_std,
-            y2=y_clim_std_hi.loc[clim_locs_short].values,
-            facecolor="#d6604d",
-            alpha=0.7,
+        x = series["x_dates"]["DATE"].values
+        x_short = series["x_dates_short"]["DATE"].values
+        locs = series["clim_locs_short"]
+        df_obs = series["df_obs"]
+        y_clim = series["y_clim"]
+        y_hi = series["y_clim_std_hi"]
+        y_lo = series["y_clim_std_lo"]
+        snow_acc = series["snow_acc"]
+
+        climate = make_table(
+            DATE=x, mean=y_clim.values, std_hi=y_hi.values, std_lo=y_lo.values
         )
-        fill_b = ax_t.fill_between(
-            x_dates_short["DATE"].values,
-            y1=y_clim.loc[clim_locs_short].values,
-            y2=t_below,
-            facecolor="#4393c3",
-            alpha=0.5,
+        observed = make_table(
+            DATE=x_short,
+            TMEAN=df_obs["TMEAN"].values,
+            PRCP=df_obs["PRCP"].values,
+            SNOW_ACC=(
+                snow_acc.values
+                if snow_acc is not None
+                else np.full(len(x_short), np.nan)
+            ),
+            clim_mean=y_clim.loc[locs].values,
+            clim_std_hi=y_hi.loc[locs].values,
+            clim_std_lo=y_lo.loc[locs].values,
+            t_above=series["t_above"],
+            t_above_std=series["t_above_std"],
+            t_below=series["t_below"],
+            t_below_std=series["t_below_std"],
         )
-        fill_bb = ax_t.fill_between(
-            x_dates_short["DATE"].values,
-            y1=y_clim_std_lo.loc[clim_locs_short].values,
-            y2=t_below_std,
-            facecolor="#4393c3",
-            alpha=0.7,
+        records = make_table(
+            DATE=np.array([], dtype=x.dtype),
+            TMEAN=np.array([], dtype=float),
+            record=np.array([], dtype="U4"),
         )
-
-        # plot extremes
         if plot_extrema:
-            tmax = self.dataset.data.groupby("DATE_MD").max(numeric_only=numeric_only)[
-                "TMEAN"
-            ]
-            tmin = self.dataset.data.groupby("DATE_MD").min(numeric_only=numeric_only)[
-                "TMEAN"
-            ]
-            local_obs = df_obs[["DATE", "DATE_MD", "TMEAN"]].set_index(
-                "DATE_MD", drop=False
-            )
-            idx = local_obs.index
-            local_max = tmax.loc[idx] == local_obs["TMEAN"]
-            local_min = tmin.loc[idx] == local_obs["TMEAN"]
-            # extract x and y values
-            x_max = local_obs[local_max]["DATE"]
-            y_max = local_obs[local_max]["TMEAN"]
-            x_min = local_obs[local_min]["DATE"]
-            y_min = local_obs[local_min]["TMEAN"]
-            xtreme_hi = ax_t.scatter(
-                x_max.values, y_max.values, c="#d6604d", marker="x"
-            )
-            xtreme_lo = ax_t.scatter(
-                x_min.values, y_min.values, c="#4393c3", marker="x"
+            x_max, y_max, x_min, y_min = self._get_extrema(df_obs)
+            records = make_table(
+                DATE=np.concatenate([x_max.values, x_min.values]),
+                TMEAN=np.concatenate([y_max.values, y_min.values]),
+                record=np.repeat(["high", "low"], [len(x_max), len(x_min)]),
             )
+        nodata = []
+        for variable in ["TMEAN", "PRCP"]:
+            starts, ends = find_runs(pd.isna(df_obs[variable]).values)
+            nodata.append((variable, x_short[starts], x_short[ends - 1]))
+        nodata = make_table(
+            variable=np.repeat(
+                [variable for variable, _, _ in nodata],
+                [len(starts) for _, starts, _ in nodata],
+            ).astype("U5"),
+            start=np.concatenate([starts for _, starts, _ in nodata]),
+            end=np.concatenate([ends for _, _, ends in nodata]),
+        )
+        return PlotData(
+            dict(climate=climate, observed=observed, records=records, nodata=nodata),
+            meta=dict(
+                station=self.dataset.get_station(),
+                start_date=start_date,
+                end_date=end_date,
+                show_snow_accumulation=series["show_snow_accumulation"]
+                and snow_acc is not None,
+                last_snow_date=series["last_snow_date"],
+            ),
+        )
 
-        xlim = ax_t.get_xlim()
-        ax_t.hlines(0, *xlim, linestyles="--")
-        # grid
-        ax_t.grid()
+    def _get_extrema(self, df_obs):
+        """
+        Find observations which set or tied the record high/low of their calendar day
+        :param df_obs: observed daily data
+        :type df_obs: pandas.DataFrame
+        :return: x_max, y_max, x_min, y_min
+        """
+        local_obs = df_obs[["DATE", "DATE_DOY", "TMEAN"]]
+        local_max, local_min = self.dataset.get_records().match(
+            local_obs["DATE_DOY"], local_obs["TMEAN"]
+        )
+        x_max = local_obs[local_max]["DATE"]
+        y_max = local_obs[local_max]["TMEAN"]
+        x_min = local_obs[local_min]["DATE"]
+        y_min = local_obs[local_min]["TMEAN"]
+        return x_max, y_max, x_min, y_min
 
-        # labels
-        ax_t.set_xlim(start_date, end_date)
-        if not (plot_tmin == "auto" and plot_tmin == "auto"):
-            ax_t.set_ylim(plot_tmin, plot_tmax)
-        ax_t.set_ylabel("Temperature in °C")
-        ax_t.set_xlabel("Date")
-        if title:
-            ax_t.set_title(title)
+    def plot_weather_series(
+        self,
+        start_date,
+        end_date,
+        plot_tmax="auto",
+        plot_tmin="auto",
+        plot_pmax="auto",
+        plot_snowmax="auto",
+        plot_extrema=True,
+        show_plot=True,
+        show_snow_accumulation=True,
+        save_path=False,
+        figsize=(9, 6),
+        legend_fontsize="x-small",
+        dpi=300,
+        title=None,
+        return_plot=False,
+        downsample=False,
+    ):
+        """
+        Plotting Function to show observed vs climate temperatures and snowfall
+        :param dpi:
+        :param legend_fontsize:
+        :param figsize:
+        :param start_date: start date of plot
+        :type start_date: datetime, str
+        :param end_date: end date of plot
+        :type end_date: datetime, str
+        :param plot_tmax:
+        :type plot_tmax: int, float, str
+        :param plot_tmin:
+        :type plot_tmin: int, float, str
+        :param plot_pmax:
+        :type plot_pmax: int, float, str
+        :param plot_snowmax:
+        :type plot_snowmax: int, float, str
+        :param plot_extrema:
+        :type plot_extrema:
+        :param show_plot:
+        :type show_plot:
+        :param show_snow_accumulation:
+        :type show_snow_accumulation:
+        :param save_path:
+        :type save_path:
+        :param downsample: reduce lines and filled areas to the pixel resolution of the plot, for long periods
+        :type downsample: bool
+        :return:
+        """
+        from noaaplotter.batch import DailySeriesBatchRenderer
+
+        renderer = DailySeriesBatchRenderer(
+            plot_tmax=plot_tmax,
+            plot_tmin=plot_tmin,
+            plot_pmax=plot_pmax,
+            plot_snowmax=plot_snowmax,
+            plot_extrema=plot_extrema,
+            show_snow_accumulation=show_snow_accumulation,
+            figsize=figsize,
+            legend_fontsize=legend_fontsize,
+            dpi=dpi,
+            downsample=downsample,
+        )
+        renderer.build(interactive=show_plot)
+        fig = renderer.render(self, start_date, end_date, title=title)
 
-        # add legend
-        legend_handle_t = [fb, cm, cm_hi, fill_r, fill_b]
-        legend_text_t = [
-            "Observed Temperatures",
-            "Climatological Mean",
-            "Std of Climatological Mean",
-            "Above average Temperature",
-            "Below average Temperature",
-        ]
-        if plot_extrema:
-            legend_handle_t.extend([xtreme_hi, xtreme_lo])
-            legend_text_t.extend(["Record High on Date", "Record Low on Date"])
+        # Save Figure, show plot if chosen
+        return finish_figure(fig, save_path, show_plot, return_plot)
 
-        # PRECIPITATION#
-        # legend handles
-        legend_handle_p = []
-        legend_text_p = []
-
-        # precipitation
-        rain = ax_p.bar(
-            x=x_dates_short["DATE"].values,
-            height=df_obs["PRCP"].values,
-            fc="#4393c3",
-            alpha=1,
+    def render(self, kind, start_date, end_date, format="png", **kwargs):
+        """
+        Render a plot to encoded bytes. With a render cache, plots of the same station,
+        period, options and data version are rendered only once.
+        :param kind: 'daily' (plot_weather_series) or 'monthly' (plot_monthly_barchart)
+        :type kind: str
+        :param start_date: start date of plot
+        :type start_date: datetime, str
+        :param end_date: end date of plot
+        :type end_date: datetime, str
+        :param format: 'png', 'svg' or 'webp'
+        :type format: str
+        :param kwargs: options of the plot function
+        :return: bytes
+        """
+        plot_functions = dict(
+            daily=self.plot_weather_series, monthly=self.plot_monthly_barchart
         )
-        legend_handle_p.append(rain)
-        legend_text_p.append("Precipitation")
-
-        # grid
-        ax_p.grid()
-        # labels
-        ax_p.set_ylabel("Precipitation in mm")
-        ax_p.set_xlabel("Date")
-        # y-axis scaling
-        ax_p.set_ylim(bottom=0)
-        if isinstance(plot_pmax, (int, float)):
-            ax_p.set_ylim(top=plot_pmax)
-
-        # snow
-        # TODO: make snowcheck
-        if (show_snow_accumulation) and ("SNOW" in df_obs.columns):
-            ax2_snow = ax_p.twinx()
-            # plots
-            sn_acc = ax2_snow.fill_between(
-                x=x_dates_short.loc[:last_snow_date, "DATE"].values,
-                y1=snow_acc.loc[:last_snow_date] / 10,
-                facecolor="k",
-                alpha=0.2,
-            )
-            _ = ax2_snow.plot(
-                x_dates_short.loc[last_snow_date:, "DATE"].values,
-                snow_acc.loc[last_snow_date:] / 10,
-                c="k",
-                alpha=0.2,
-                ls="--",
+        if kind not in plot_functions:
+            raise ValueError(f"kind must be one of {list(plot_functions)}")
+        if format not in RENDER_FORMATS:
+            raise ValueError(f"format must be one of {list(RENDER_FORMATS)}")
+
+        def render():
+            fig = plot_functions[kind](
+                start_date,
+                end_date,
+                show_plot=False,
+                save_path=False,
+                return_plot=True,
+                **kwargs,
             )
-            # y-axis label
-            ax2_snow.set_ylabel("Cumulative Snowfall in cm")
-            # legend
-            legend_handle_p.append(sn_acc)
-            legend_text_p.append("Cumulative Snowfall")
-            # y-axis scaling
-            ax2_snow.set_ylim(bottom=0)
-            if isinstance(plot_snowmax, (int, float)):
-                ax2_snow.set_ylim(top=plot_snowmax)
-
-        # Show nodata - make function
-        lo, hi = ax_t.get_ylim()
-        nanvals_t = x_dates_short["DATE"].loc[pd.isna(df_obs["TMEAN"])]
-        nan_bar_t = ax_t.bar(
-            x=nanvals_t,
-            height=hi - lo,
-            bottom=lo,
-            width=1,
-            edgecolor=None,
-            facecolor="k",
-            alpha=0.2,
-        )
-        if len(nan_bar_t) > 0:
-            legend_handle_t.append(nan_bar_t)
-            legend_text_t.append("No Data")
-
-        lo, hi = ax_p.get_ylim()
-        nanvals_p = x_dates_short["DATE"].loc[pd.isna(df_obs["PRCP"])]
-        nan_bar_p = ax_p.bar(
-            x=nanvals_p,
-            height=hi - lo,
-            bottom=lo,
-            width=1,
-            edgecolor=None,
-            facecolor="k",
-            alpha=0.2,
-        )
-        if len(nan_bar_p) > 0:
-            legend_handle_p.append(nan_bar_p)
-            legend_text_p.append("No Data")
-
-        # add Legends
-        ax_t.legend(
-            legend_handle_t,
-            legend_text_t,
-            loc="lower center",
-            fontsize=legend_fontsize,
-            ncol=4,
-            bbox_to_anchor=(0.5, 1.02),
-        )  # -0.35))
-        ax_p.legend(
-            legend_handle_p, legend_text_p, loc="upper left", fontsize=legend_fontsize
+            if fig is None:
+                raise ValueError("No plot available for the requested information")
+            buffer = io.BytesIO()
+            # no creation date in svg files, equal plots are equal bytes
+            metadata = {"Date": None} if format == "svg" else None
+            fig.savefig(buffer, format=format, metadata=metadata)
+            return buffer.getvalue()
+
+        if self.render_cache is None:
+            return render()
+        spec = dict(
+            kind=kind,
+            station=self.dataset.get_station(),
+            location=self.location,
+            start=parse_dates(start_date),
+            end=parse_dates(end_date),
+            format=format,
+            options=kwargs,
+            climate=[self.climate_start, self.climate_end, self.climate_filtersize],
+            remove_feb29=self.remove_feb29,
+            data_version=self.dataset.data_version(),
         )
+        return self.render_cache.get_or_render(spec, render)
 
-        # set locator to monthly
-        locator = dates.MonthLocator()
-        ax_t.xaxis.set_major_locator(locator)
-        ax_p.xaxis.set_major_locator(locator)
-        plt.setp(
-            ax_t.get_xticklabels(), rotation=45, ha="right", rotation_mode="anchor"
-        )
-        plt.setp(
-            ax_p.get_xticklabels(), rotation=45, ha="right", rotation_mode="anchor"
-        )
-        fig.tight_layout()
+    def plot_weather_series_batch(self, periods, renderer=None, **kwargs):
+        """
+        Render daily weather series of many periods, reusing one figure and its artists
+        :param periods: list of (start_date, end_date, save_path) or (start_date, end_date, save_path, title)
+        :type periods: list
+        :param renderer: renderer to reuse, e.g. across stations. Created from kwargs if not given
+        :type renderer: DailySeriesBatchRenderer, optional
+        :param kwargs: options of DailySeriesBatchRenderer
+        :return: renderer
+        """
+        from noaaplotter.batch import DailySeriesBatchRenderer
 
-        # Save Figure
-        if save_path:
-            fig.savefig(save_path)  # , figsize=figsize, dpi=dpi)
-        # Show plot if chosen, destroy figure object at the end
-        if show_plot:
-            plt.show()
-        if return_plot:
-            return fig
-        else:
-            plt.close(fig)
+        if renderer is None:
+            renderer = DailySeriesBatchRenderer(**kwargs)
+        for period in periods:
+            renderer.render(self, *period)
+        return renderer
 
-    def plot_monthly_barchart(
+    def prepare_monthly_series(
         self,
         start_date,
         end_date,
         information="Temperature",
-        show_plot=True,
         anomaly=False,
-        anomaly_type="absolute",
         trailing_mean=None,
-        save_path=False,
-        figsize=(9, 4),
-        dpi=100,
-        legend_fontsize="x-small",
-        return_plot=False,
+        min_valid_days=1,
     ):
-        # legend handles
-        legend_handle = []
-        legend_text = []
-
-        # setup plot arguments
+        """
+        Data of a monthly bar chart, independent of rendering
+        :param start_date: start date of plot
+        :type start_date: datetime, str
+        :param end_date: end date of plot, limited to the last date of the dataset
+        :type end_date: datetime, str
+        :param information: 'Temperature' or 'Precipitation'
+        :type information: str
+        :param anomaly: departure from the monthly climatology instead of absolute values
+        :type anomaly: bool
+        :param trailing_mean: length of the trailing mean in months
+        :type trailing_mean: int, optional
+        :param min_valid_days: minimum number of valid days per month
+        :type min_valid_days: int
+        :return: PlotData with the table months (DATE, Year, Month, value, climate,
+            trailing_mean) from the start of the dataset, plot properties (labels, colours)
+            and the plot period as metadata. None if the information is not available.
+        """
         plot_kwargs = setup_monthly_plot_props(information, anomaly)
-
-        # Data Preprocessing
-        if parse_dates(end_date) > self.dataset.data["DATE"].max():
+        start_date = parse_dates(start_date)
+        end_date = parse_dates(end_date)
+        if end_date > self.dataset.data["DATE"].max():
             end_date = self.dataset.data["DATE"].max()
-        data_monthly = DS_monthly(
-            self.dataset, start=self.dataset.data["DATE"].min(), end=end_date
-        )
-        data_monthly.calculate_monthly_statistics()
-        data_clim = DS_monthly(
-            self.dataset, start=self.climate_start, end=self.climate_end
-        )
-        data_clim.calculate_monthly_climate()
+        data_monthly = self.get_monthly_aggregate(end_date, min_valid_days)
+        data_clim = self.df_clim_monthly_
 
         data = data_monthly.monthly_aggregate.reset_index(drop=False)
         df_clim = data_clim.monthly_climate.reset_index(drop=False)
@@ -449,9 +559,6 @@ class NOAAPlotter(object):
             print("Invalid precipitation values, information not available!")
             return None
 
-        data["DATE"] = data.apply(lambda x: parse_dates_YM(x["DATE_YM"]), axis=1)
-        data["Month"] = data.apply(lambda x: parse_dates_YM(x["DATE_YM"]).month, axis=1)
-        data["Year"] = data.apply(lambda x: parse_dates_YM(x["DATE_YM"]).year, axis=1)
         data = (
             data.set_index("Month", drop=False)
             .join(df_clim.set_index("Month", drop=False), rsuffix="_clim")
@@ -462,20 +569,72 @@ class NOAAPlotter(object):
         data = data.set_index("DATE", drop=False)
 
         # trailing mean calculation
-        if trailing_mean:
-            data = calc_trailing_mean(
-                data, trailing_mean, plot_kwargs["value_column"], "trailing_values"
-            )
+        values = data[plot_kwargs["value_column"]]
+        trailing = values.rolling(trailing_mean).mean() if trailing_mean else np.nan
+        climate_column = (
+            "prcp_sum_clim"
+            if information.lower() == "precipitation"
+            else "tmean_doy_mean_clim"
+        )
+        months = make_table(
+            DATE=data["DATE"].values,
+            Year=data["Year"].values,
+            Month=data["Month"].values,
+            value=values.values,
+            climate=data[climate_column].values,
+            trailing_mean=np.broadcast_to(trailing, len(data)).astype(float),
+        )
+        return PlotData(
+            dict(months=months),
+            meta=dict(
+                plot_kwargs,
+                station=self.dataset.get_station(),
+                start_date=start_date,
+                end_date=end_date,
+                trailing_mean=trailing_mean,
+            ),
+        )
+
+    def plot_monthly_barchart(
+        self,
+        start_date,
+        end_date,
+        information="Temperature",
+        show_plot=True,
+        anomaly=False,
+        anomaly_type="absolute",
+        trailing_mean=None,
+        save_path=False,
+        figsize=(9, 4),
+        dpi=100,
+        legend_fontsize="x-small",
+        return_plot=False,
+        min_valid_days=1,
+    ):
+        from matplotlib import dates
+
+        # legend handles
+        legend_handle = []
+        legend_text = []
+
+        # Data Preprocessing
+        data = self.prepare_monthly_series(
+            start_date, end_date, information, anomaly, trailing_mean, min_valid_days
+        )
+        if data is None:
+            return None
+        plot_kwargs = data.meta
+        months = data["months"]
 
         # PLOT part
-        fig = plt.figure(figsize=figsize, dpi=dpi)
+        fig = new_figure(figsize, dpi, interactive=show_plot)
         ax = fig.add_subplot(111)
-        data_low = data[data[plot_kwargs["value_column"]] < 0]
-        data_high = data[data[plot_kwargs["value_column"]] >= 0]
+        data_low = months[months["value"] < 0]
+        data_high = months[months["value"] >= 0]
         bar_low = ax.bar(
             x=data_low["DATE"],
-            height=data_low[plot_kwargs["value_column"]],
-            width=30,
+            height=data_low["value"],
+            width=np.timedelta64(30, "D"),
             align="edge",
             color=plot_kwargs["fc_low"],
         )
@@ -485,15 +644,15 @@ class NOAAPlotter(object):
             legend_text.append(plot_kwargs["legend_label_below"])
         bar_high = ax.bar(
             x=data_high["DATE"],
-            height=data_high[plot_kwargs["value_column"]],
-            width=30,
+            height=data_high["value"],
+            width=np.timedelta64(30, "D"),
             align="edge",
             color=plot_kwargs["fc_high"],
         )
         legend_handle.append(bar_high)
         legend_text.append(plot_kwargs["legend_label_above"])
         if trailing_mean:
-            line_tr_mean = ax.plot(data["DATE"], data["trailing_values"], c="k")
+            line_tr_mean = ax.plot(months["DATE"], months["trailing_mean"], c="k")
             legend_handle.append(line_tr_mean[0])
             legend_text.append("Trailing mean: {} months".format(trailing_mean))
         ax.xaxis.set_major_locator(dates.YearLocator())
@@ -501,7 +660,7 @@ class NOAAPlotter(object):
         ax.grid(True)
 
         # x-limit
-        ax.set_xlim(start_date, end_date)
+        ax.set_xlim(plot_kwargs["start_date"], plot_kwargs["end_date"])
 
         # labels
         ax.set_ylabel(plot_kwargs["y_label"])
@@ -511,13 +670,5 @@ class NOAAPlotter(object):
         ax.legend(legend_handle, legend_text, loc="best", fontsize=legend_fontsize)
 
         fig.tight_layout()
-        # Save Figure
-        if save_path:
-            fig.savefig(save_path)  # , figsize=figsize, dpi=dpi)
-        # Show plot if chosen, destroy figure object at the end
-        if show_plot:
-            plt.show()
-        if return_plot:
-            return fig
-        else:
-            plt.close(fig)
+        # Save Figure, show plot if chosen
+        return finish_figure(fig, save_path, show_plot, return_plot)
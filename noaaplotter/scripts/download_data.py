@@ -3,8 +3,6 @@
 # Imports
 import argparse
 
-from noaaplotter.utils.download_utils import download_from_noaa
-
 
 def main():
     """
@@ -20,7 +18,7 @@ def main():
         type=str,
         required=True,
         default="data/parquet.csv",
-        help="parquet file to save results",
+        help="parquet file to save results, output directory with -stations or -store",
     )
 
     parser.add_argument(
@@ -48,7 +46,8 @@ def main():
     parser.add_argument(
         "-dt",
         dest="datatypes",
-        type=list,
+        type=str,
+        nargs="+",
         required=False,
         default=["TMIN", "TMAX", "PRCP", "SNOW"],
     )
@@ -75,11 +74,116 @@ def main():
         type=int,
         required=False,
         default=1,
-        help="number of parallel processes",
+        help="number of concurrent requests",
+    )
+
+    parser.add_argument(
+        "-rate",
+        dest="rate_limit",
+        type=float,
+        required=False,
+        default=5,
+        help="maximum number of requests per second",
+    )
+
+    parser.add_argument(
+        "-stations",
+        dest="station_list",
+        type=str,
+        required=False,
+        default=None,
+        help='file with one station per line and an optional location name, e.g. "USW00026616,Kotzebue". '
+        "Backfills all stations into the output directory and resumes interrupted backfills",
+    )
+
+    parser.add_argument(
+        "-max_requests",
+        dest="max_requests",
+        type=int,
+        required=False,
+        default=None,
+        help="maximum number of network requests of a -stations backfill (retries included), remaining requests are left for the next run",
+    )
+
+    parser.add_argument(
+        "-store",
+        dest="store",
+        required=False,
+        default=False,
+        action="store_true",
+        help="save to a store partitioned by station and year in the output directory, "
+        "updates only write new partition files",
+    )
+
+    parser.add_argument(
+        "-plan",
+        dest="dry_run",
+        required=False,
+        default=False,
+        action="store_true",
+        help="print the planned requests (per station) without downloading",
+    )
+
+    parser.add_argument(
+        "-cache_dir",
+        dest="cache_dir",
+        type=str,
+        required=False,
+        default=None,
+        help="directory to cache responses of the NOAA API, re-runs are answered from it",
+    )
+
+    parser.add_argument(
+        "-offline",
+        dest="offline",
+        required=False,
+        default=False,
+        action="store_true",
+        help="only use cached responses of -cache_dir, no requests to the NOAA API",
     )
 
     args = parser.parse_args()
 
+    if args.station_list:
+        from noaaplotter.utils.backfill import BulkBackfill, read_station_list
+        from noaaplotter.utils.noaa_client import NOAAClient
+        from noaaplotter.utils.response_cache import ResponseCache
+
+        cache = ResponseCache(args.cache_dir) if args.cache_dir else None
+        with NOAAClient(
+            args.token,
+            concurrency=args.n_jobs,
+            rate_limit=args.rate_limit,
+            cache=cache,
+            offline=args.offline,
+        ) as client:
+            backfill = BulkBackfill(
+                read_station_list(args.station_list),
+                args.output_file,
+                args.start_date,
+                args.end_date,
+                args.datatypes,
+                client,
+                max_requests=args.max_requests,
+                store=args.store,
+            )
+            if args.dry_run:
+                print(backfill.request_plan())
+                return
+            results = backfill.run()
+        failed = [s for s, r in results.items() if r["status"] == "failed"]
+        print(
+            f"{len(results) - len(failed)} stations done, {len(failed)} failed, "
+            f"{client.stats()['requests']} requests"
+        )
+        for station_id in failed:
+            print(f"  {station_id}: {results[station_id]['error']}")
+        if cache is not None:
+            print(f"Response cache: {cache.summary()}")
+        return
+
+    from noaaplotter.utils.download_utils import download_from_noaa
+
     download_from_noaa(
         output_file=args.output_file,
         start_date=args.start_date,
@@ -89,6 +193,11 @@ def main():
         loc_name=args.loc_name,
         station_id=args.station_id,
         n_jobs=args.n_jobs,
+        rate_limit=args.rate_limit,
+        store=args.store,
+        dry_run=args.dry_run,
+        cache_dir=args.cache_dir,
+        offline=args.offline,
     )
 
 
@@ -4,8 +4,6 @@
 import argparse
 import os
 
-from src.download_utils import download_era5_from_gee
-
 
 def main():
     """
@@ -39,6 +37,8 @@ def main():
 
     args = parser.parse_args()
 
+    from noaaplotter.utils.download_utils import download_era5_from_gee
+
     # remove file if exists
     if os.path.exists(args.output_file):
         os.remove(args.output_file)
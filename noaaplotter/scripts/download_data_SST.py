@@ -2,16 +2,7 @@
 # -*- coding: utf-8 -*-
 # Imports
 import argparse
-import csv
-from datetime import datetime
-import numpy as np
 import os
-import pandas as pd
-import tqdm
-from joblib import delayed, Parallel
-from noaaplotter.utils.download_utils import dl_noaa_api
-import ee
-import geemap
 
 def main():
     """
@@ -45,6 +36,10 @@ def main():
 
     args = parser.parse_args()
 
+    import ee
+    import geemap
+    import pandas as pd
+
     # remove file if exists
     if os.path.exists(args.output_file):
         os.remove(args.output_file)
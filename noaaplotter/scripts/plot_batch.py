@@ -0,0 +1,33 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Imports
+import argparse
+
+
+def main():
+    """
+    Main Function
+    :return:
+    """
+    ##### Parse arguments #####
+    parser = argparse.ArgumentParser(description='Parse arguments.')
+
+    parser.add_argument('-manifest', dest='manifest', type=str, required=True,
+                        help='json or yaml file with plot jobs (infile, type, start, end, output, ...)')
+
+    parser.add_argument('-n_jobs', dest='n_jobs', type=int, required=False,
+                        default=1,
+                        help='number of parallel processes')
+
+    args = parser.parse_args()
+
+    from noaaplotter.utils.batch_utils import run_manifest
+
+    ##### Run Plotting jobs #####
+    results = run_manifest(args.manifest, n_jobs=args.n_jobs)
+    if not all(r['ok'] for r in results):
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
-from noaaplotter.noaaplotter import NOAAPlotter
 import argparse
 
 def main():
@@ -74,14 +73,25 @@ def main():
                         default=None,
                         help='Plot title')
 
+    parser.add_argument('-cache_dir', dest='cache_dir', type=str, required=False,
+                        default=None,
+                        help='directory to cache climate normals between runs')
+
+    parser.add_argument('-downsample', dest='downsample', required=False,
+                        default=False, action='store_true',
+                        help='reduce the data to the plot resolution, recommended for periods of several years')
+
     args = parser.parse_args()
 
+    from noaaplotter.noaaplotter import NOAAPlotter
+
     ##### Download from NOAA #####
 
     ##### Run Plotting function #####
     n = NOAAPlotter(args.infile,
                     location=args.location,
-                    climate_filtersize=args.filtersize)
+                    climate_filtersize=args.filtersize,
+                    cache_dir=args.cache_dir)
 
     n.plot_weather_series(start_date=args.start_date,
                           end_date=args.end_date,
@@ -96,7 +106,8 @@ def main():
                           plot_snowmax=args.s_range,
                           dpi=args.dpi,
                           figsize=args.figsize,
-                          title=args.title)
+                          title=args.title,
+                          downsample=args.downsample)
 
 if __name__ == "__main__":
     main()
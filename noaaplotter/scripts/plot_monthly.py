@@ -1,6 +1,5 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
-from noaaplotter.noaaplotter import NOAAPlotter
 import argparse
 
 def main():
@@ -52,11 +51,22 @@ def main():
                         default=[9, 4],
                         help='figure size in inches width x height. 9 4 recommended 30 years')
 
+    parser.add_argument('-min_days', dest='min_valid_days', type=int, required=False,
+                        default=1,
+                        help='minimum number of valid days per month, months with fewer days are left empty')
+
+    parser.add_argument('-cache_dir', dest='cache_dir', type=str, required=False,
+                        default=None,
+                        help='directory to cache climate normals between runs')
+
     args = parser.parse_args()
 
+    from noaaplotter.noaaplotter import NOAAPlotter
+
     ##### Run Plotting function #####
     n = NOAAPlotter(args.infile,
-                    location=args.location)
+                    location=args.location,
+                    cache_dir=args.cache_dir)
 
     n.plot_monthly_barchart(args.start_date,
                             args.end_date,
@@ -66,7 +76,8 @@ def main():
                             show_plot=args.show_plot,
                             dpi=args.dpi,
                             figsize=args.figsize,
-                            save_path=args.save_path)
+                            save_path=args.save_path,
+                            min_valid_days=args.min_valid_days)
 
 if __name__ == "__main__":
     main()
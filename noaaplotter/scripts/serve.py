@@ -0,0 +1,95 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Imports
+import argparse
+
+
+def main():
+    """
+    Main Function
+    :return:
+    """
+    ##### Parse arguments #####
+    parser = argparse.ArgumentParser(description='Parse arguments.')
+
+    parser.add_argument('command', type=str, choices=['serve', 'compact'],
+                        help='serve: run a local http service rendering daily (/daily) and monthly (/monthly) plots, '
+                             'compact: merge the small partition files of a store')
+
+    parser.add_argument('-data_dir', dest='data_dir', type=str, required=False,
+                        default='data',
+                        help='directory of the input files, the infile query parameter is relative to it')
+
+    parser.add_argument('-host', dest='host', type=str, required=False,
+                        default='127.0.0.1',
+                        help='address to listen on, local only by default')
+
+    parser.add_argument('-port', dest='port', type=int, required=False,
+                        default=8050,
+                        help='port to listen on')
+
+    parser.add_argument('-max_idle', dest='max_idle', type=float, required=False,
+                        default=600,
+                        help='seconds after which an unused dataset is removed from memory')
+
+    parser.add_argument('-max_datasets', dest='max_datasets', type=int, required=False,
+                        default=16,
+                        help='maximum number of datasets kept in memory')
+
+    parser.add_argument('-cache_dir', dest='cache_dir', type=str, required=False,
+                        default=None,
+                        help='directory to cache climate normals between runs')
+
+    parser.add_argument('-render_cache_mb', dest='render_cache_mb', type=float, required=False,
+                        default=64,
+                        help='size of the in-memory cache of rendered plots in MB, 0 to disable')
+
+    parser.add_argument('-quiet', dest='quiet', required=False,
+                        default=False, action='store_true',
+                        help='do not log requests')
+
+    parser.add_argument('-store', dest='store', type=str, required=False,
+                        default=None,
+                        help='directory of the partitioned store to compact')
+
+    parser.add_argument('-min_files', dest='min_files', type=int, required=False,
+                        default=2,
+                        help='compact partitions with at least this number of files')
+
+    parser.add_argument('-interval', dest='interval', type=float, required=False,
+                        default=None,
+                        help='keep compacting in the background every interval seconds')
+
+    args = parser.parse_args()
+
+    if args.command == 'compact':
+        if not args.store:
+            parser.error('compact requires -store')
+        import time
+        from noaaplotter.utils.store import PartitionedStore
+
+        ##### Compact store #####
+        while True:
+            result = PartitionedStore(args.store).compact(min_files=args.min_files)
+            print(f"Compacted {result['partitions']} partitions, "
+                  f"merged {result['removed_files']} files")
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+        return
+
+    from noaaplotter.server import serve
+
+    ##### Run service #####
+    serve(args.data_dir,
+          host=args.host,
+          port=args.port,
+          max_idle=args.max_idle,
+          max_datasets=args.max_datasets,
+          cache_dir=args.cache_dir,
+          render_cache_mb=args.render_cache_mb,
+          quiet=args.quiet)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from noaaplotter.noaaplotter import NOAAPlotter
+from noaaplotter.utils.render_cache import RENDER_FORMATS, RenderCache
+from noaaplotter.utils.store import is_store
+
+TRUE_VALUES = ["", "1", "true", "yes"]
+
+
+class DatasetPool(object):
+    """
+    Keeps NOAAPlotter instances (dataset, climatologies, records) of recently used input
+    files warm in memory. Datasets which were not used for max_idle seconds, or the least
+    recently used ones above max_datasets, are evicted.
+    """
+
+    def __init__(
+        self,
+        data_dir,
+        max_idle=600,
+        max_datasets=16,
+        cache_dir=None,
+        render_cache=None,
+    ):
+        """
+        :param data_dir: directory of the input files, requests cannot leave it
+        :type data_dir: str
+        :param max_idle: seconds after which an unused dataset is evicted
+        :type max_idle: int, float
+        :param max_datasets: maximum number of datasets in memory
+        :type max_datasets: int
+        :param cache_dir: directory to cache climate normals
+        :type cache_dir: str, optional
+        :param render_cache: cache of rendered plots, shared by all datasets
+        :type render_cache: RenderCache, optional
+        """
+        self.data_dir = os.path.realpath(data_dir)
+        self.max_idle = max_idle
+        self.max_datasets = max_datasets
+        self.cache_dir = cache_dir
+        self.render_cache = render_cache
+        self.loads = 0
+        self.evictions = 0
+        self._plotters = OrderedDict()
+        self._last_used = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, infile):
+        """
+        path of an input file relative to the data directory
+        """
+        path = os.path.realpath(os.path.join(self.data_dir, infile))
+        if os.path.commonpath([path, self.data_dir]) != self.data_dir:
+            raise PermissionError(f"{infile} is outside of the data directory")
+        if not (os.path.isfile(path) or is_store(path)):
+            raise FileNotFoundError(f"{infile} does not exist")
+        return path
+
+    def get(self, infile, location=None, filtersize=7):
+        """
+        return the warm plotter of an input file, loaded on first use
+        :param infile: input file relative to the data directory
+        :param location: name of location
+        :param filtersize: climate filter size
+        :return: NOAAPlotter
+        """
+        key = (self.resolve(infile), location, filtersize)
+        with self._lock:
+            if key in self._plotters:
+                self._plotters.move_to_end(key)
+                self._last_used[key] = time.time()
+                return self._plotters[key]
+            # concurrent requests of the same dataset wait for a single load
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            with self._lock:
+                if key in self._plotters:
+                    self._last_used[key] = time.time()
+                    return self._plotters[key]
+            try:
+                plotter = NOAAPlotter(
+                    key[0],
+                    location=location,
+                    climate_filtersize=filtersize,
+                    cache_dir=self.cache_dir,
+                    render_cache=self.render_cache,
+                )
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+            with self._lock:
+                self._plotters[key] = plotter
+                self._last_used[key] = time.time()
+                self.loads += 1
+                while len(self._plotters) > self.max_datasets:
+                    self._evict(next(iter(self._plotters)))
+        return plotter
+
+    def evict_idle(self):
+        """
+        evict datasets which were not used for max_idle seconds
+        :return: number of evicted datasets
+        """
+        now = time.time()
+        with self._lock:
+            idle = [k for k, t in self._last_used.items() if now - t > self.max_idle]
+            for key in idle:
+                self._evict(key)
+        return len(idle)
+
+    def stats(self):
+        """
+        loaded datasets and their idle time
+        :return: dict
+        """
+        now = time.time()
+        with self._lock:
+            return dict(
+                loads=self.loads,
+                evictions=self.evictions,
+                datasets=[
+                    dict(
+                        infile=os.path.relpath(key[0], self.data_dir),
+                        location=key[1],
+                        filtersize=key[2],
+                        idle_seconds=round(now - self._last_used[key], 1),
+                    )
+                    for key in self._plotters
+                ],
+            )
+
+    def _evict(self, key):
+        del self._plotters[key]
+        del self._last_used[key]
+        self.evictions += 1
+
+
+class RequestStats(object):
+    """
+    Request counters, throughput and latency percentiles of the recent requests
+    """
+
+    def __init__(self, window=1000):
+        """
+        :param window: number of recent requests used for latency percentiles
+        :type window: int
+        """
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.by_path = {}
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, path, seconds, ok):
+        with self._lock:
+            self.requests += 1
+            self.errors += 0 if ok else 1
+            self.by_path[path] = self.by_path.get(path, 0) + 1
+            self._latencies.append(seconds)
+
+    def stats(self):
+        """
+        :return: dict
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            uptime = time.time() - self.started
+
+            def percentile(p):
+                if not latencies:
+                    return None
+                return round(latencies[int(p * (len(latencies) - 1))] * 1000, 1)
+
+            return dict(
+                uptime_seconds=round(uptime, 1),
+                requests=self.requests,
+                errors=self.errors,
+                requests_per_second=round(self.requests / uptime, 3),
+                by_path=dict(self.by_path),
+                latency_ms=dict(p50=percentile(0.5), p95=percentile(0.95)),
+            )
+
+
+def _first(query, name, default=None):
+    return query[name][0] if name in query else default
+
+
+def _flag(query, name):
+    return name in query and query[name][0].lower() in TRUE_VALUES
+
+
+def _numbers(query, name, n, default):
+    """
+    comma separated numbers, e.g. t_range=-45,25
+    """
+    if name not in query:
+        return default
+    values = [float(v) for v in query[name][0].split(",")]
+    if len(values) != n:
+        raise ValueError(f"{name} needs {n} comma separated values")
+    return values if n > 1 else values[0]
+
+
+def daily_options(query):
+    """
+    options of plot_weather_series from query parameters, named like the plot_daily flags
+    """
+    t_range = _numbers(query, "t_range", 2, [None, None])
+    return dict(
+        show_snow_accumulation=_flag(query, "snow_acc"),
+        plot_extrema=True,
+        plot_tmin=t_range[0],
+        plot_tmax=t_range[1],
+        plot_pmax=_numbers(query, "p_range", 1, None),
+        plot_snowmax=_numbers(query, "s_range", 1, None),
+        dpi=_numbers(query, "dpi", 1, 100),
+        figsize=tuple(_numbers(query, "figsize", 2, [9, 6])),
+        title=_first(query, "title"),
+        downsample=_flag(query, "downsample"),
+    )
+
+
+def monthly_options(query):
+    """
+    options of plot_monthly_barchart from query parameters, named like the plot_monthly flags
+    """
+    trailing_mean = _first(query, "trail")
+    return dict(
+        information=_first(query, "type", "Temperature"),
+        anomaly=_flag(query, "anomaly"),
+        trailing_mean=int(trailing_mean) if trailing_mean else None,
+        dpi=_numbers(query, "dpi", 1, 100),
+        figsize=tuple(_numbers(query, "figsize", 2, [9, 4])),
+        min_valid_days=int(_first(query, "min_days", 1)),
+    )
+
+
+class PlotRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /daily and /monthly render plots (or return their plot data with format=json),
+    /stats returns service statistics
+    """
+
+    pool = None
+    stats = None
+    quiet = False
+
+    def do_GET(self):
+        t0 = time.perf_counter()
+        url = urlparse(self.path)
+        query = parse_qs(url.query, keep_blank_values=True)
+        ok = False
+        try:
+            if url.path in ["/daily", "/monthly"]:
+                self._plot(url.path[1:], query)
+            elif url.path == "/stats":
+                self._send_json(200, self._service_stats())
+            elif url.path == "/health":
+                self._send_json(200, dict(status="ok"))
+            else:
+                self._send_json(404, dict(error=f"unknown path {url.path}"))
+                return
+            ok = True
+        except (KeyError, ValueError, TypeError) as e:
+            self._send_json(400, dict(error=f"{type(e).__name__}: {e}"))
+        except PermissionError as e:
+            self._send_json(403, dict(error=str(e)))
+        except FileNotFoundError as e:
+            self._send_json(404, dict(error=str(e)))
+        except Exception as e:
+            traceback.print_exc()
+            self._send_json(500, dict(error=f"{type(e).__name__}: {e}"))
+        finally:
+            self.stats.add(url.path, time.perf_counter() - t0, ok)
+
+    def _plot(self, kind, query):
+        for name in ["infile", "start", "end"]:
+            if name not in query:
+                raise KeyError(f"missing query parameter '{name}'")
+        image_format = _first(query, "format", "png")
+        if image_format not in list(RENDER_FORMATS) + ["json"]:
+            raise ValueError(f"format must be one of {list(RENDER_FORMATS) + ['json']}")
+        plotter = self.pool.get(
+            _first(query, "infile"),
+            location=_first(query, "loc"),
+            filtersize=int(_first(query, "filtersize", 7)),
+        )
+        options = daily_options(query) if kind == "daily" else monthly_options(query)
+        if image_format == "json":
+            # plot data to render on the client, no rasterisation
+            self._send_json(200, self._plot_data(plotter, kind, query, options))
+            return
+        body = plotter.render(
+            kind,
+            _first(query, "start"),
+            _first(query, "end"),
+            format=image_format,
+            **options,
+        )
+        self._send(200, RENDER_FORMATS[image_format], body)
+
+    @staticmethod
+    def _plot_data(plotter, kind, query, options):
+        if kind == "daily":
+            data = plotter.prepare_daily_series(
+                _first(query, "start"),
+                _first(query, "end"),
+                show_snow_accumulation=options["show_snow_accumulation"],
+            )
+        else:
+            data = plotter.prepare_monthly_series(
+                _first(query, "start"),
+                _first(query, "end"),
+                information=options["information"],
+                anomaly=options["anomaly"],
+                trailing_mean=options["trailing_mean"],
+                min_valid_days=options["min_valid_days"],
+            )
+            if data is None:
+                raise ValueError("No plot available for the requested information")
+        return data.to_dict()
+
+    def _service_stats(self):
+        stats = dict(requests=self.stats.stats(), datasets=self.pool.stats())
+        if self.pool.render_cache is not None:
+            stats["render_cache"] = self.pool.render_cache.stats()
+        return stats
+
+    def _send_json(self, status, data):
+        self._send(status, "application/json", json.dumps(data).encode())
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(host, port, pool, quiet=False):
+    """
+    create a threaded http server rendering plots of a dataset pool
+    :param host:
+    :param port:
+    :param pool:
+    :type pool: DatasetPool
+    :param quiet: do not log requests
+    :return: ThreadingHTTPServer
+    """
+    handler = type(
+        "Handler",
+        (PlotRequestHandler,),
+        dict(pool=pool, stats=RequestStats(), quiet=quiet),
+    )
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(
+    data_dir,
+    host="127.0.0.1",
+    port=8050,
+    max_idle=600,
+    max_datasets=16,
+    cache_dir=None,
+    render_cache_mb=64,
+    quiet=False,
+):
+    """
+    run the plot service until interrupted
+    :param data_dir: directory of the input files
+    :param host: address to bind, local only by default
+    :param port:
+    :param max_idle: seconds after which an unused dataset is evicted
+    :param max_datasets: maximum number of datasets in memory
+    :param cache_dir: directory to cache climate normals
+    :param render_cache_mb: size of the in-memory cache of rendered plots, 0 to disable
+    :param quiet: do not log requests
+    :return:
+    """
+    render_cache = RenderCache(max_size_mb=render_cache_mb) if render_cache_mb else None
+    pool = DatasetPool(
+        data_dir,
+        max_idle=max_idle,
+        max_datasets=max_datasets,
+        cache_dir=cache_dir,
+        render_cache=render_cache,
+    )
+    server = make_server(host, port, pool, quiet=quiet)
+    stop = threading.Event()
+
+    def evict_idle():
+        while not stop.wait(min(max_idle, 60)):
+            pool.evict_idle()
+
+    threading.Thread(target=evict_idle, daemon=True).start()
+    print(f"Serving plots of {pool.data_dir} on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
@@ -0,0 +1,284 @@
+import asyncio
+import json
+import os
+import time
+
+from noaaplotter.utils.download_utils import plan_station, save_staged
+from noaaplotter.utils.request_plan import AdaptiveChunker, RequestPlan
+from noaaplotter.utils.staging import ChunkStaging
+from noaaplotter.utils.store import PartitionedStore
+
+
+def read_station_list(path):
+    """
+    stations of a list file, one station per line with an optional location name after
+    a comma, e.g. "USW00026616,Kotzebue". Empty lines and lines starting with # are
+    skipped.
+    :param path:
+    :return: list of (station_id, location name)
+    """
+    stations = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            station_id, _, name = line.partition(",")
+            stations.append((station_id.strip(), name.strip()))
+    return stations
+
+
+def station_file(output_dir, station_id):
+    """
+    parquet file of a station in the output directory
+    """
+    name = "".join(c if c.isalnum() or c in "-_" else "_" for c in station_id)
+    return os.path.join(output_dir, f"{name}.parquet")
+
+
+class BackfillManifest(object):
+    """
+    Progress of a backfill (status, rows and requests per station) in a json file, so
+    that an interrupted backfill resumes with the stations which are not done. The
+    progress is only used if the period and datatypes did not change.
+    """
+
+    def __init__(self, path, start_date, end_date, datatypes):
+        """
+        :param path: json file, created if it does not exist
+        :param start_date: "yyyy-mm-dd"
+        :param end_date: "yyyy-mm-dd"
+        :param datatypes: list of datatypes
+        """
+        self.path = path
+        self.settings = dict(
+            start_date=start_date, end_date=end_date, datatypes=list(datatypes)
+        )
+        self.stations = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            if manifest.get("settings") == self.settings:
+                self.stations = manifest["stations"]
+            else:
+                print(f"Backfill settings changed, starting over ({path})")
+
+    def status(self, station_id):
+        return self.stations.get(station_id, {}).get("status", "pending")
+
+    def update(self, station_id, **entry):
+        """
+        set the progress of a station and write the manifest
+        """
+        self.stations[station_id] = dict(entry, updated=time.time())
+        self.write()
+
+    def write(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(dict(settings=self.settings, stations=self.stations), f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+class BulkBackfill(object):
+    """
+    Backfill of many stations with one client: the requests of all stations are planned
+    up front and fetched by one pool of workers in station order, sharing the
+    connections and the rate limit of the client. Responses are staged as they arrive
+    (ChunkStaging), the file of a station (or its partitions of a PartitionedStore) is
+    written from its staged chunks as soon as all its requests are done. Progress is
+    kept in a BackfillManifest, an interrupted station resumes with its requests which
+    were not staged.
+    """
+
+    MANIFEST_FILE = "backfill_manifest.json"
+
+    def __init__(
+        self,
+        stations,
+        output_dir,
+        start_date,
+        end_date,
+        datatypes,
+        client,
+        manifest_file=None,
+        max_requests=None,
+        store=False,
+    ):
+        """
+        :param stations: list of (station_id, location name)
+        :type stations: list
+        :param output_dir: directory of the station files
+        :type output_dir: str
+        :param start_date: "yyyy-mm-dd"
+        :param end_date: "yyyy-mm-dd"
+        :param datatypes: list of datatypes
+        :param client: client of the data service
+        :type client: NOAAClient
+        :param manifest_file: progress manifest, defaults to backfill_manifest.json in output_dir
+        :type manifest_file: str, optional
+        :param max_requests: budget of network requests of this run, including split,
+            continued and retried requests. Stations which do not fit stay pending, a
+            station which is not complete when the budget is spent continues from its
+            staged requests in the next run. The first pending station is always
+            planned, even if it needs more requests than the budget.
+        :type max_requests: int, optional
+        :param store: write all stations to a PartitionedStore in output_dir
+        :type store: bool
+        """
+        self.stations = stations
+        self.output_dir = output_dir
+        self.start_date = start_date
+        self.end_date = end_date
+        self.datatypes = datatypes
+        self.client = client
+        self.max_requests = max_requests
+        os.makedirs(output_dir, exist_ok=True)
+        self.store = PartitionedStore(output_dir, create=True) if store else None
+        self.manifest = BackfillManifest(
+            manifest_file or os.path.join(output_dir, self.MANIFEST_FILE),
+            start_date,
+            end_date,
+            datatypes,
+        )
+        self.staging = ChunkStaging(
+            os.path.join(output_dir, ChunkStaging.STAGING_DIR), datatypes
+        )
+
+    def output_file(self, station_id):
+        """
+        file of a station, the store directory if stations are written to a store
+        """
+        if self.store is not None:
+            return self.output_dir
+        return station_file(self.output_dir, station_id)
+
+    def request_plan(self):
+        """
+        requests of all stations which are not done, within the request budget
+        :return: RequestPlan
+        """
+        plan = RequestPlan()
+        for station_id, _ in self.stations:
+            if self.manifest.status(station_id) == "done":
+                continue
+            station_plan = plan_station(
+                RequestPlan(),
+                self.output_file(station_id),
+                station_id,
+                self.datatypes,
+                self.start_date,
+                self.end_date,
+                store=self.store,
+                staged=self.staging.completed(station_id),
+            )
+            if self.max_requests is not None and len(plan.stations()):
+                if len(plan) + len(station_plan) > self.max_requests:
+                    break
+            plan.extend(station_plan)
+        return plan
+
+    def plan(self):
+        """
+        requests of all stations which are not done, within the request budget
+        :return: list of (station_id, location name, output file, date ranges, chunks)
+        """
+        request_plan = self.request_plan()
+        names = dict(self.stations)
+        return [
+            (
+                station_id,
+                names[station_id],
+                self.output_file(station_id),
+                request_plan.date_ranges(station_id),
+                request_plan.chunks(station_id),
+            )
+            for station_id in request_plan.stations()
+        ]
+
+    def run(self, progress=True):
+        """
+        download all planned stations
+        :param progress: show a progress bar of the downloaded days
+        :return: dict of station_id -> manifest entry of this run
+        """
+        plan = self.request_plan()
+        print(
+            f"{len(plan.stations())} of {len(self.stations)} stations to backfill, "
+            f"{len(plan)} requests"
+        )
+        return asyncio.run(self._run(plan, progress))
+
+    async def _run(self, plan, progress):
+        loop = asyncio.get_running_loop()
+        names = dict(self.stations)
+        writes = []
+        done = {}
+        chunker = AdaptiveChunker(plan)
+
+        async def write(station_id):
+            output_file = self.output_file(station_id)
+            try:
+                rows = await loop.run_in_executor(
+                    None,
+                    save_staged,
+                    self.staging,
+                    station_id,
+                    output_file,
+                    names[station_id],
+                    self.start_date,
+                    self.end_date,
+                    plan.date_ranges(station_id),
+                    self.store,
+                )
+            except Exception as e:
+                return fail(station_id, e)
+            done[station_id] = dict(
+                status="done",
+                rows=rows,
+                requests=chunker.requests(station_id),
+                file=os.path.basename(output_file),
+            )
+            self.manifest.update(station_id, **done[station_id])
+
+        def fail(station_id, error):
+            done[station_id] = dict(
+                status="failed", error=f"{type(error).__name__}: {error}"
+            )
+            self.manifest.update(station_id, **done[station_id])
+
+        def on_station(station_id, results, error):
+            if error is not None:
+                fail(station_id, error)
+            elif not plan.requests(station_id) and not self.staging.completed(
+                station_id
+            ):
+                # stations without missing dates are done right away
+                done[station_id] = dict(
+                    status="done",
+                    rows=0,
+                    requests=0,
+                    file=os.path.basename(self.output_file(station_id)),
+                )
+                self.manifest.update(station_id, **done[station_id])
+            else:
+                writes.append(asyncio.ensure_future(write(station_id)))
+
+        await self.client.fetch_plan(
+            chunker,
+            on_station,
+            progress,
+            on_result=self.staging.append,
+            max_requests=self.max_requests,
+        )
+        await asyncio.gather(*writes)
+        for station_id in plan.stations():
+            if station_id not in done and not chunker.complete(station_id):
+                # the budget was spent, the staged requests are kept for the next run
+                done[station_id] = dict(
+                    status="partial",
+                    requests=chunker.requests(station_id),
+                    staged=len(self.staging.completed(station_id)),
+                )
+                self.manifest.update(station_id, **done[station_id])
+        return done
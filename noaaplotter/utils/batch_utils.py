@@ -0,0 +1,206 @@
+import json
+import os
+import time
+import traceback
+
+# job keys which define the dataset/plotter, jobs sharing them are rendered by one task
+DATASET_KEYS = ["infile", "location", "filtersize", "cache_dir"]
+PLOT_TYPES = ["daily", "monthly"]
+
+
+def load_manifest(manifest_file):
+    """
+    load plot jobs from a json or yaml manifest. The manifest is either a list of jobs
+    or a dict with "jobs" and optional "defaults" which are merged into every job.
+    A job has the keys infile, type (daily/monthly), start, end, output and optionally
+    location, title, filtersize, cache_dir and options (keyword arguments of the plot).
+    Default options are only merged into jobs whose plot type accepts them.
+    :param manifest_file:
+    :return: list of job dicts
+    """
+    with open(manifest_file) as f:
+        if manifest_file.lower().endswith((".yml", ".yaml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Please install pyyaml to read yaml manifests")
+            manifest = yaml.safe_load(f)
+        else:
+            manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = dict(jobs=manifest)
+    defaults = manifest.get("defaults", {})
+    parameters = {}
+    jobs = []
+    for i, job in enumerate(manifest["jobs"]):
+        merged = {**defaults, **job}
+        merged.setdefault("id", i)
+        merged.setdefault("location", None)
+        merged.setdefault("filtersize", 7)
+        merged.setdefault("cache_dir", None)
+        merged.setdefault("title", None)
+        for key in ["infile", "type", "start", "end", "output"]:
+            if key not in merged:
+                raise ValueError(f"Job {merged['id']} is missing '{key}'")
+        if merged["type"] not in PLOT_TYPES:
+            raise ValueError(f"Job {merged['id']}: type must be one of {PLOT_TYPES}")
+        if merged["type"] not in parameters:
+            parameters[merged["type"]] = plot_parameters(merged["type"])
+        merged["options"] = {
+            **{
+                k: v
+                for k, v in defaults.get("options", {}).items()
+                if k in parameters[merged["type"]]
+            },
+            **job.get("options", {}),
+        }
+        jobs.append(merged)
+    return jobs
+
+
+def plot_parameters(plot_type):
+    """
+    names of the options of a plot type
+    :param plot_type: daily or monthly
+    :return: set of parameter names
+    """
+    import inspect
+
+    if plot_type == "daily":
+        from noaaplotter.batch import DailySeriesBatchRenderer
+
+        func = DailySeriesBatchRenderer.__init__
+    else:
+        from noaaplotter.noaaplotter import NOAAPlotter
+
+        func = NOAAPlotter.plot_monthly_barchart
+    return set(inspect.signature(func).parameters) - {"self"}
+
+
+def group_jobs(jobs, n_jobs=1):
+    """
+    group jobs by input dataset, so that each dataset is loaded once per task. Groups
+    are split into chunks so that about n_jobs tasks share the jobs, e.g. the jobs of a
+    single dataset are rendered by all workers.
+    :param jobs:
+    :param n_jobs: number of workers
+    :return: list of job lists
+    """
+    groups = {}
+    for job in jobs:
+        key = tuple(job[k] for k in DATASET_KEYS)
+        groups.setdefault(key, []).append(job)
+    tasks = []
+    for group in groups.values():
+        # chunks in proportion to the jobs of the group, at least one per group
+        n_chunks = min(len(group), max(1, -(-n_jobs * len(group) // len(jobs))))
+        size = -(-len(group) // n_chunks)
+        tasks.extend(group[i : i + size] for i in range(0, len(group), size))
+    return tasks
+
+
+def _result(job, ok, error, seconds):
+    return dict(id=job["id"], output=job["output"], ok=ok, error=error, seconds=seconds)
+
+
+def run_job_group(jobs):
+    """
+    load the dataset of a job group once and render all its plots
+    :param jobs: jobs sharing the same dataset
+    :return: list of result dicts (id, output, ok, error, seconds)
+    """
+    from noaaplotter.batch import DailySeriesBatchRenderer
+    from noaaplotter.noaaplotter import NOAAPlotter
+
+    results = []
+    first = jobs[0]
+    t0 = time.perf_counter()
+    try:
+        plotter = NOAAPlotter(
+            first["infile"],
+            location=first["location"],
+            climate_filtersize=first["filtersize"],
+            cache_dir=first["cache_dir"],
+        )
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        seconds = (time.perf_counter() - t0) / len(jobs)
+        return [_result(job, False, error, seconds) for job in jobs]
+
+    renderers = {}
+    for job in jobs:
+        t0 = time.perf_counter()
+        try:
+            output_dir = os.path.dirname(job["output"])
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+            if job["type"] == "daily":
+                # one figure template per option set
+                key = json.dumps(job["options"], sort_keys=True)
+                if key not in renderers:
+                    renderers[key] = DailySeriesBatchRenderer(**job["options"])
+                renderers[key].render(
+                    plotter, job["start"], job["end"], job["output"], job["title"]
+                )
+            else:
+                plotter.plot_monthly_barchart(
+                    job["start"],
+                    job["end"],
+                    show_plot=False,
+                    save_path=job["output"],
+                    **job["options"],
+                )
+            results.append(_result(job, True, None, time.perf_counter() - t0))
+        except Exception as e:
+            traceback.print_exc()
+            error = f"{type(e).__name__}: {e}"
+            results.append(_result(job, False, error, time.perf_counter() - t0))
+    return results
+
+
+def run_manifest(manifest_file, n_jobs=1):
+    """
+    render all plots of a manifest, chunks of the jobs of each dataset are distributed
+    over a process pool
+    :param manifest_file: json or yaml manifest
+    :param n_jobs: number of worker processes
+    :return: list of result dicts
+    """
+    import tqdm
+    from joblib import Parallel, delayed
+
+    jobs = load_manifest(manifest_file)
+    groups = group_jobs(jobs, n_jobs)
+    n_datasets = len({tuple(job[k] for k in DATASET_KEYS) for job in jobs})
+    print(
+        f"{len(jobs)} plot jobs on {n_datasets} datasets in {len(groups)} tasks, "
+        f"{n_jobs} workers"
+    )
+    t0 = time.perf_counter()
+    results = []
+    # progress of rendered plots, tasks are reported as they complete
+    with tqdm.tqdm(total=len(jobs)) as bar:
+        for group_results in Parallel(n_jobs=n_jobs, return_as="generator_unordered")(
+            delayed(run_job_group)(group) for group in groups
+        ):
+            results.extend(group_results)
+            bar.update(len(group_results))
+    elapsed = time.perf_counter() - t0
+    order = {job["id"]: i for i, job in enumerate(jobs)}
+    results.sort(key=lambda r: order[r["id"]])
+    print_summary(results, elapsed)
+    return results
+
+
+def print_summary(results, elapsed):
+    """
+    print throughput and failed jobs
+    """
+    failed = [r for r in results if not r["ok"]]
+    n_ok = len(results) - len(failed)
+    rate = n_ok / elapsed if elapsed > 0 else float("nan")
+    print(
+        f"Rendered {n_ok}/{len(results)} plots in {elapsed:.1f} s ({rate:.2f} plots/s)"
+    )
+    for r in failed:
+        print(f"Failed job {r['id']} ({r['output']}): {r['error']}")
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from noaaplotter.utils.file_lock import FileLock
+
+
+def hash_dataframe(df, columns=None):
+    """
+    content hash of a DataFrame (values only, row order matters)
+    :param df:
+    :type df: pandas.DataFrame
+    :param columns: columns to include, defaults to all columns
+    :return: hex digest
+    """
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    h = hashlib.sha1()
+    h.update(",".join(df.columns).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+class ClimateNormalsCache(object):
+    """
+    On-disk store of climate normals with one parquet file per entry and a json index.
+    The total size is capped, least recently used entries are evicted first. The index
+    is re-read and updated under a file lock, several processes may share the cache.
+    """
+
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "index.lock"
+
+    def __init__(self, cache_dir, max_size_mb=256):
+        """
+        :param cache_dir: directory of the cache, created if it does not exist
+        :type cache_dir: str
+        :param max_size_mb: maximum size of all cached files in MB
+        :type max_size_mb: int, float
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size_mb * 1e6
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self._read_index()
+        self._lock = FileLock(os.path.join(cache_dir, self.LOCK_FILE))
+
+    @staticmethod
+    def make_key(kind, station, start, end, filtersize, impute_feb29, data_hash):
+        """
+        create cache key from all parameters the climate normals depend on
+        :return: hex digest
+        """
+        parts = [
+            kind,
+            str(station),
+            pd.Timestamp(start).strftime("%Y-%m-%d"),
+            pd.Timestamp(end).strftime("%Y-%m-%d"),
+            str(filtersize),
+            str(bool(impute_feb29)),
+            data_hash,
+        ]
+        return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        load cached normals
+        :param key:
+        :return: pandas.DataFrame or None if not cached
+        """
+        with self._lock:
+            self.index = self._read_index()
+            entry = self.index.get(key)
+            if entry is None:
+                return None
+            path = os.path.join(self.cache_dir, entry["file"])
+            if not os.path.exists(path):
+                del self.index[key]
+                self._write_index()
+                return None
+            df = pd.read_parquet(path)
+            entry["last_access"] = time.time()
+            self._write_index()
+        return df
+
+    def put(self, key, df, station=None):
+        """
+        store normals and evict least recently used entries above the size limit
+        :param key:
+        :param df:
+        :type df: pandas.DataFrame
+        :param station: station name, only used for the file name
+        :return:
+        """
+        prefix = "".join(c if c.isalnum() else "_" for c in str(station or "station"))
+        filename = f"{prefix[:40]}_{key[:16]}.parquet"
+        path = os.path.join(self.cache_dir, filename)
+        with self._lock:
+            self.index = self._read_index()
+            df.to_parquet(path)
+            self.index[key] = dict(
+                file=filename,
+                station=station,
+                size=os.path.getsize(path),
+                last_access=time.time(),
+            )
+            self._evict()
+            self._write_index()
+
+    def clear(self):
+        """
+        remove all cached entries
+        :return:
+        """
+        with self._lock:
+            self.index = self._read_index()
+            for key in list(self.index):
+                self._remove(key)
+            self._write_index()
+
+    def size(self):
+        """
+        total size of cached files in bytes
+        """
+        return sum(entry["size"] for entry in self.index.values())
+
+    def _evict(self):
+        by_access = sorted(self.index, key=lambda k: self.index[k]["last_access"])
+        while self.size() > self.max_size and by_access:
+            self._remove(by_access.pop(0))
+
+    def _remove(self, key):
+        entry = self.index.pop(key)
+        path = os.path.join(self.cache_dir, entry["file"])
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _read_index(self):
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+    def _write_index(self):
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        # unique per writer, several processes/threads may share the cache directory
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, path)
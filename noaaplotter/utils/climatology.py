@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+STATISTICS = ["mean", "std", "min", "max", "count"]
+# first day of year of each month on a leap year calendar, 29 February has its own slot
+_MONTH_OFFSET = np.array([0, 0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335])
+FEB29_DOY = 60
+
+
+def doy_key(dates):
+    """
+    integer day of year on a leap year calendar (1-366), independent of the actual year
+    :param dates:
+    :type dates: pandas.Series
+    :return:
+    """
+    return (_MONTH_OFFSET[dates.dt.month.values] + dates.dt.day.values).astype(np.int16)
+
+
+def doy_labels(doy):
+    """
+    convert leap year day of year keys to "mm-dd" labels
+    :param doy:
+    :return:
+    """
+    return (pd.Timestamp("2000-01-01") + pd.to_timedelta(np.asarray(doy) - 1, unit="D")).strftime("%m-%d")
+
+
+def ym_key(dates):
+    """
+    integer year-month key (yyyymm)
+    :param dates:
+    :type dates: pandas.Series
+    :return:
+    """
+    return (dates.dt.year.values * 100 + dates.dt.month.values).astype(np.int32)
+
+
+def ym_dates(ym):
+    """
+    convert year-month keys (yyyymm) to the first day of the month
+    :param ym:
+    :return: pandas.Series of datetimes
+    """
+    ym = np.asarray(ym)
+    return pd.to_datetime(pd.DataFrame({"year": ym // 100, "month": ym % 100, "day": 1}))
+
+
+def ym_labels(ym):
+    """
+    convert year-month keys (yyyymm) to "yyyy-mm" labels
+    :param ym:
+    :return:
+    """
+    return ym_dates(ym).dt.strftime("%Y-%m").values
+
+
+def month_key(dates):
+    """
+    integer month key (1-12)
+    :param dates:
+    :type dates: pandas.Series
+    :return:
+    """
+    return dates.dt.month.values.astype(np.int8)
+
+
+def doy_climatology(df, variables, key=None):
+    """
+    calculate mean, std, min, max and count of all variables per day of year in a single aggregation
+    :param df: daily data with 'DATE' column
+    :type df: pandas.DataFrame
+    :param variables: columns to aggregate
+    :type variables: list
+    :param key: precomputed day of year key, calculated from 'DATE' if not given
+    :return: DataFrame indexed by day of year with (variable, statistic) columns
+    """
+    if key is None:
+        key = doy_key(df["DATE"])
+    return df[variables].groupby(np.asarray(key)).agg(STATISTICS)
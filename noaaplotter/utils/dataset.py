@@ -9,14 +9,30 @@
 
 ########################
 import os
-import time
 
 import numpy as np
 import polars as pl
 
+from .climatology import (
+    FEB29_DOY,
+    doy_climatology,
+    doy_key,
+    doy_labels,
+    month_key,
+    ym_dates,
+    ym_key,
+    ym_labels,
+)
+from .cache import ClimateNormalsCache, hash_dataframe
+from .records import DailyRecords
+from .store import PartitionedStore, is_store
 from .utils import *
 
 NUMERIC_ONLY = True
+# columns required for plotting, used for projection pushdown when scanning parquet files
+PLOT_COLUMNS = ["STATION", "NAME", "DATE", "PRCP", "SNOW", "TMAX", "TMIN"]
+# columns climate normals depend on, used for the content hash of cached normals
+CLIMATE_COLUMNS = ["DATE", "TMEAN", "TMAX", "TMIN", "SNOW", "PRCP"]
 
 
 class NOAAPlotterDailySummariesDataset(object):
@@ -24,10 +40,37 @@ class NOAAPlotterDailySummariesDataset(object):
     This class/module creates nice plots of observed weather data from NOAA
     """
 
-    def __init__(self, input_filepath=None, location=None, remove_feb29=False):
+    def __init__(
+        self,
+        input_filepath=None,
+        location=None,
+        remove_feb29=False,
+        start_date=None,
+        end_date=None,
+        columns=None,
+    ):
+        """
+        :param input_filepath: path to input parquet file or directory of a PartitionedStore
+        :type input_filepath: str
+        :param location: name of location, pushed down to the file scan
+        :type location: str, optional
+        :param remove_feb29:
+        :type remove_feb29: bool, optional
+        :param start_date: first date to load, defaults to start of file
+        :type start_date: datetime, str, optional
+        :param end_date: last date to load, defaults to end of file
+        :type end_date: datetime, str, optional
+        :param columns: columns to load, defaults to all columns. 'NAME' and 'DATE' are always loaded
+        :type columns: list, optional
+        """
         self.input_switch = None
         self.input_filepath = input_filepath
         self.location = location
+        self.start_date = start_date
+        self.end_date = end_date
+        self.columns = columns
+        self.records = None
+        self._version = None
         self.noaa_token = None
         self.noaa_location = None
         self.remove_feb29 = remove_feb29
@@ -44,6 +87,74 @@ class NOAAPlotterDailySummariesDataset(object):
         self._remove_feb29()
         self._filter_to_location()
 
+    def get_station(self):
+        """
+        Return station id of the dataset, falls back to location name
+        """
+        for col in ["STATION", "NAME"]:
+            if col in self.data.columns and self.data[col].notna().any():
+                return self.data[col].dropna().iloc[0]
+        return self.location
+
+    def data_version(self):
+        """
+        Return content hash of the loaded data, e.g. to version rendered plots
+        :return: hex digest
+        """
+        if self._version is None:
+            self._version = hash_dataframe(self.data, CLIMATE_COLUMNS)
+        return self._version
+
+    def gaps(self, variable="TMEAN", start_date=None, end_date=None):
+        """
+        Return contiguous periods without valid values of a variable, missing days included.
+        Feb 29 is not expected if it is removed from the dataset.
+        :param variable: column to check
+        :type variable: str
+        :param start_date: start of period to check, defaults to first date of dataset
+        :type start_date: datetime, str, optional
+        :param end_date: end of period to check, defaults to last date of dataset
+        :type end_date: datetime, str, optional
+        :return: DataFrame with first day, last day and length in days of each gap
+        """
+        start = parse_dates(start_date) if start_date else self.data["DATE"].min()
+        end = parse_dates(end_date) if end_date else self.data["DATE"].max()
+        days = pd.date_range(start, end)
+        if self.remove_feb29:
+            days = days[~((days.month == 2) & (days.day == 29))]
+        # one value per date, the last row of a duplicated date
+        values = (
+            self.data.drop_duplicates("DATE", keep="last")
+            .set_index("DATE")[variable]
+            .reindex(days)
+        )
+        starts, ends = find_runs(values.isna().values)
+        return pd.DataFrame(
+            {
+                "start": values.index[starts],
+                "end": values.index[ends - 1],
+                "days": ends - starts,
+            }
+        )
+
+    def get_records(self):
+        """
+        Return record high/low table of daily mean temperatures, built on first use.
+        Records are taken from the whole file, also if only a date window is loaded.
+        :return: DailyRecords
+        """
+        if self.records is None:
+            data = self.data
+            if self.start_date is not None or self.end_date is not None:
+                data = NOAAPlotterDailySummariesDataset(
+                    self.input_filepath,
+                    location=self.location,
+                    remove_feb29=self.remove_feb29,
+                    columns=["TMAX", "TMIN"],
+                ).data
+            self.records = DailyRecords(data, variable="TMEAN")
+        return self.records
+
     def print_locations(self):
         """
         Print all locations names
@@ -67,14 +178,91 @@ class NOAAPlotterDailySummariesDataset(object):
 
     def _load_file(self):
         """
-        load csv file into Pandas DataFrame
+        lazily scan parquet file and load the selected location, date window and columns into Pandas DataFrame
         :return:
         """
-        data = pl.read_parquet(self.input_filepath).to_pandas()
+        lf = self._scan()
+        schema = lf.collect_schema()
+        if self.columns is not None:
+            keep = set(self.columns) | {"NAME", "DATE"}
+            lf = lf.select([c for c in schema.names() if c in keep])
+        filters = self._scan_filters(schema)
+        if filters:
+            lf = lf.filter(pl.all_horizontal(filters))
+        data = lf.collect().to_pandas()
         if "__index_level_0__" in data.columns:
             data = data.drop(columns=["__index_level_0__"])
         self.data = data
 
+    def _scan_filters(self, schema):
+        """
+        create location and date predicates which are pushed down to the parquet reader
+        :param schema: schema of the scanned file
+        :type schema: polars.Schema
+        :return: list of polars expressions
+        """
+        filters = []
+        if self.location:
+            filters.append(
+                pl.col("NAME").str.to_lowercase().str.contains(self.location.lower())
+            )
+        date_dtype = schema["DATE"]
+        if self.start_date is not None:
+            start = pd.Timestamp(parse_dates(self.start_date))
+            if date_dtype == pl.String:
+                filters.append(pl.col("DATE") >= start.strftime("%Y-%m-%d"))
+            elif date_dtype == pl.Date:
+                filters.append(pl.col("DATE") >= start.date())
+            else:
+                filters.append(pl.col("DATE") >= start.to_pydatetime())
+        if self.end_date is not None:
+            end = pd.Timestamp(parse_dates(self.end_date))
+            if date_dtype == pl.String:
+                # compare against following day to keep timestamps on the last day
+                end_next = end + pd.Timedelta(days=1)
+                filters.append(pl.col("DATE") < end_next.strftime("%Y-%m-%d"))
+            elif date_dtype == pl.Date:
+                filters.append(pl.col("DATE") <= end.date())
+            else:
+                filters.append(pl.col("DATE") <= end.to_pydatetime())
+        return filters
+
+    def _scan(self):
+        """
+        lazy scan of the input file, a store is scanned as one table of the partitions
+        of the location and the date window
+        :return: polars.LazyFrame
+        """
+        if not is_store(self.input_filepath):
+            return pl.scan_parquet(self.input_filepath)
+        store = PartitionedStore(self.input_filepath)
+        stations = None
+        if self.location:
+            stations = [
+                station_id
+                for station_id, name in store.stations().items()
+                if self.location.lower() in name.lower()
+            ]
+        return store.scan(
+            stations,
+            parse_dates(self.start_date) if self.start_date is not None else None,
+            parse_dates(self.end_date) if self.end_date is not None else None,
+        )
+
+    def _scan_locations(self):
+        """
+        read all location names from the input file
+        :return:
+        """
+        if is_store(self.input_filepath):
+            return list(set(PartitionedStore(self.input_filepath).stations().values()))
+        return (
+            pl.scan_parquet(self.input_filepath)
+            .select(pl.col("NAME").unique())
+            .collect()["NAME"]
+            .to_list()
+        )
+
     def _load_noaa(self):
         """
         load data through NOAA API
@@ -103,7 +291,7 @@ class NOAAPlotterDailySummariesDataset(object):
             if filt.sum() == 0:
                 raise ValueError(
                     "Location Name is not valid! Valid Location identifiers: {0}".format(
-                        self.data["NAME"].unique()
+                        self._scan_locations()
                     )
                 )
 
@@ -116,12 +304,12 @@ class NOAAPlotterDailySummariesDataset(object):
 
     def _get_datestring(self):
         """
-        write specific date formats
+        write integer calendar keys: day of year on a leap year calendar, year-month (yyyymm) and month
         :return:
         """
-        self.data["DATE_MD"] = self.data["DATE"].dt.strftime("%m-%d")
-        self.data["DATE_YM"] = self.data["DATE"].dt.strftime("%Y-%m")
-        self.data["DATE_M"] = self.data["DATE"].dt.strftime("%m")
+        self.data["DATE_DOY"] = doy_key(self.data["DATE"])
+        self.data["DATE_YM"] = ym_key(self.data["DATE"])
+        self.data["DATE_M"] = month_key(self.data["DATE"])
 
     def _get_tmean(self):
         """
@@ -137,7 +325,7 @@ class NOAAPlotterDailySummariesDataset(object):
         :return:
         """
         if self.remove_feb29:
-            self.data = self.data[self.data["DATE_MD"] != "02-29"]
+            self.data = self.data[self.data["DATE_DOY"] != FEB29_DOY]
 
     def _filter_to_location(self):
         """
@@ -219,6 +407,7 @@ class NOAAPlotterDailySummariesDataset(object):
             .sum(numeric_only=NUMERIC_ONLY)
             .PRCP
         )
+        df_out.index = pd.Index(ym_labels(df_out.index), name="DATE_YM")
         return df_out
 
     @staticmethod
@@ -229,9 +418,7 @@ class NOAAPlotterDailySummariesDataset(object):
         """
         df_out = pd.DataFrame()
         df = df.data
-        df["Month"] = (
-            df.reset_index().apply(lambda x: int(x["DATE_MD"][:2]), axis=1).values
-        )
+        df["Month"] = df["DATE_M"].astype(int)
         df_out["tmean_mean"] = (
             df[["Month", "TMEAN"]]
             .groupby(df["Month"])
@@ -275,9 +462,7 @@ class NOAAPlotterDailySummariesDataset(object):
                 .mean(numeric_only=NUMERIC_ONLY)
                 .SNOW
             )
-        unique_years = len(
-            np.unique(df.apply(lambda x: parse_dates_YM(x["DATE_YM"]).year, axis=1))
-        )
+        unique_years = len(np.unique(df["DATE_YM"] // 100))
         df_out["prcp_mean"] = (
             df[["Month", "PRCP"]]
             .groupby(df["Month"])
@@ -297,44 +482,106 @@ class NOAAPlotterDailyClimateDataset(object):
         end="2010-12-31",
         filtersize=7,
         impute_feb29=True,
+        cache=None,
     ):
         """
         :param start:
         :param end:
         :param filtersize:
         :param impute_feb29:
+        :param cache: store for climate normals, normals are recalculated if not given
+        :type cache: ClimateNormalsCache, optional
         """
         self.start = parse_dates(start)
         self.end = parse_dates(end)
         self.filtersize = filtersize
         self.impute_feb29 = impute_feb29
         self.daily_dataset = daily_dataset
+        self.cache = cache
         self.data_daily = None
         self.data = None
+        self._statistics = None
         self.date_range_valid = False
 
         # validate date range
         self._validate_date_range()
         # filter daily to date range
         self._filter_to_climate()
+        # load normals from cache if available
+        if self._load_cached():
+            return
         # calculate daily statistics
         self._calculate_climate_statistics()
         # mean imputation for 29 February
         self._impute_feb29()
         # filter if desired
-        start_time = time.time()
         self._run_filter()
         # self._run_filter_polars()
-        end_time = time.time()
-        print(f"_run_filter  took {end_time - start_time:.2f} seconds to run.")
+        self._store_cached()
         # make completeness report
 
+    @property
+    def statistics(self):
+        """
+        Day of year statistics of the climate period, calculated on first use if the
+        normals were loaded from the cache
+        :return: pandas.DataFrame
+        """
+        if self._statistics is None:
+            self._statistics = doy_climatology(
+                self.data_daily, self._variables(), key=self.data_daily["DATE_DOY"]
+            )
+        return self._statistics
+
+    def _variables(self):
+        variables = ["TMEAN", "TMAX", "TMIN"]
+        if "SNOW" in self.data_daily.columns:
+            variables.append("SNOW")
+        return variables
+
+    def _cache_key(self):
+        return ClimateNormalsCache.make_key(
+            "daily",
+            self.daily_dataset.get_station(),
+            self.start,
+            self.end,
+            self.filtersize,
+            self.impute_feb29,
+            hash_dataframe(self.data_daily, CLIMATE_COLUMNS),
+        )
+
+    def _load_cached(self):
+        """
+        load climate normals from cache
+        :return: True if normals were found in cache
+        """
+        if self.cache is None:
+            return False
+        data = self.cache.get(self._cache_key())
+        if data is None:
+            return False
+        self.data = data
+        return True
+
+    def _store_cached(self):
+        """
+        write climate normals to cache
+        :return:
+        """
+        if self.cache is not None:
+            self.cache.put(
+                self._cache_key(), self.data, station=self.daily_dataset.get_station()
+            )
+
     def _validate_date_range(self):
-        if self.daily_dataset.data["DATE"].max() >= self.end:
-            if self.daily_dataset.data["DATE"].min() <= self.end:
-                self.date_range_valid = True
+        dates = self.daily_dataset.data["DATE"]
+        if len(dates) and dates.max() >= self.end and dates.min() <= self.end:
+            self.date_range_valid = True
         else:
-            raise ("Dataset is insufficient to calculate climate normals!")
+            raise ValueError(
+                "Dataset is insufficient to calculate climate normals! Loaded data "
+                f"does not cover the end of the climate period ({self.end:%Y-%m-%d})."
+            )
 
     def _filter_to_climate(self):
         """
@@ -345,72 +592,34 @@ class NOAAPlotterDailyClimateDataset(object):
             (self.daily_dataset.data["DATE"] >= self.start)
             & (self.daily_dataset.data["DATE"] <= self.end)
         ]
-        df_clim = df_clim[(df_clim["DATE_MD"] != "02-29")]
+        df_clim = df_clim[(df_clim["DATE_DOY"] != FEB29_DOY)]
         self.data_daily = df_clim
 
     def _calculate_climate_statistics(self):
         """
-        Function to calculate major statistics
+        Function to calculate major statistics in a single day of year aggregation
         :param self.data_daily:
         :type self.data_daily: pandas.DataFrame
         :return:
         """
-        df_out = pd.DataFrame()
-        df_out["tmean_doy_mean"] = (
-            self.data_daily[["DATE", "TMEAN"]]
-            .groupby(self.data_daily["DATE_MD"])
-            .mean(numeric_only=NUMERIC_ONLY)
-            .TMEAN
-        )
-        df_out["tmean_doy_std"] = (
-            self.data_daily[["DATE", "TMEAN"]]
-            .groupby(self.data_daily["DATE_MD"])
-            .std()
-            .TMEAN
-        )
-        df_out["tmean_doy_max"] = (
-            self.data_daily[["DATE", "TMEAN"]]
-            .groupby(self.data_daily["DATE_MD"])
-            .max(numeric_only=NUMERIC_ONLY)
-            .TMEAN
-        )
-        df_out["tmean_doy_min"] = (
-            self.data_daily[["DATE", "TMEAN"]]
-            .groupby(self.data_daily["DATE_MD"])
-            .min(numeric_only=NUMERIC_ONLY)
-            .TMEAN
-        )
-        df_out["tmax_doy_max"] = (
-            self.data_daily[["DATE", "TMAX"]]
-            .groupby(self.data_daily["DATE_MD"])
-            .max(numeric_only=NUMERIC_ONLY)
-            .TMAX
-        )
-        df_out["tmax_doy_std"] = (
-            self.data_daily[["DATE", "TMAX"]]
-            .groupby(self.data_daily["DATE_MD"])
-            .std()
-            .TMAX
-        )
-        df_out["tmin_doy_min"] = (
-            self.data_daily[["DATE", "TMIN"]]
-            .groupby(self.data_daily["DATE_MD"])
-            .min(numeric_only=NUMERIC_ONLY)
-            .TMIN
-        )
-        df_out["tmin_doy_std"] = (
-            self.data_daily[["DATE", "TMIN"]]
-            .groupby(self.data_daily["DATE_MD"])
-            .std()
-            .TMIN
-        )
-        if "SNOW" in self.data_daily.columns:
-            df_out["snow_doy_mean"] = (
-                self.data_daily[["DATE", "SNOW"]]
-                .groupby(self.data_daily["DATE_MD"])
-                .mean(numeric_only=NUMERIC_ONLY)
-                .SNOW
-            )
+        variables = self._variables()
+        stats = self.statistics
+
+        df_out = pd.DataFrame(index=pd.Index(doy_labels(stats.index), name="DATE_MD"))
+        columns = [
+            ("tmean_doy_mean", "TMEAN", "mean"),
+            ("tmean_doy_std", "TMEAN", "std"),
+            ("tmean_doy_max", "TMEAN", "max"),
+            ("tmean_doy_min", "TMEAN", "min"),
+            ("tmax_doy_max", "TMAX", "max"),
+            ("tmax_doy_std", "TMAX", "std"),
+            ("tmin_doy_min", "TMIN", "min"),
+            ("tmin_doy_std", "TMIN", "std"),
+            ("snow_doy_mean", "SNOW", "mean"),
+        ]
+        for name, variable, statistic in columns:
+            if variable in variables:
+                df_out[name] = stats[(variable, statistic)].values
         self.data = df_out
 
     def _impute_feb29(self):
@@ -481,9 +690,26 @@ class NOAAPlotterDailyClimateDataset(object):
 
 class NOAAPlotterMonthlyClimateDataset(object):
     def __init__(
-        self, daily_dataset, start="1981-01-01", end="2010-12-31", impute_feb29=True
+        self,
+        daily_dataset,
+        start="1981-01-01",
+        end="2010-12-31",
+        impute_feb29=True,
+        cache=None,
+        min_valid_days=1,
     ):
+        """
+        :param start:
+        :param end:
+        :param impute_feb29:
+        :param cache: store for monthly climate normals, normals are recalculated if not given
+        :type cache: ClimateNormalsCache, optional
+        :param min_valid_days: minimum number of valid days per month for monthly statistics
+        :type min_valid_days: int, optional
+        """
         self.daily_dataset = daily_dataset
+        self.cache = cache
+        self.min_valid_days = min_valid_days
         self.monthly_aggregate = None
         self.start = parse_dates(start)
         self.end = parse_dates(end)
@@ -491,11 +717,14 @@ class NOAAPlotterMonthlyClimateDataset(object):
         self._validate_date_range()
 
     def _validate_date_range(self):
-        if self.daily_dataset.data["DATE"].max() >= self.end:
-            if self.daily_dataset.data["DATE"].min() <= self.end:
-                self.date_range_valid = True
+        dates = self.daily_dataset.data["DATE"]
+        if len(dates) and dates.max() >= self.end and dates.min() <= self.end:
+            self.date_range_valid = True
         else:
-            raise ("Dataset is insufficient to calculate climate normals!")
+            raise ValueError(
+                "Dataset is insufficient to calculate climate normals! Loaded data "
+                f"does not cover the end of the climate period ({self.end:%Y-%m-%d})."
+            )
 
     def _filter_to_climate(self):
         """
@@ -506,7 +735,7 @@ class NOAAPlotterMonthlyClimateDataset(object):
             (self.daily_dataset.data["DATE"] >= self.start)
             & (self.daily_dataset.data["DATE"] <= self.end)
         ]
-        df_clim = df_clim[(df_clim["DATE_MD"] != "02-29")]
+        df_clim = df_clim[(df_clim["DATE_DOY"] != FEB29_DOY)]
         self.data_daily = df_clim
 
     def filter_to_date(self):
@@ -518,7 +747,7 @@ class NOAAPlotterMonthlyClimateDataset(object):
             (self.daily_dataset.data["DATE"] >= self.start)
             & (self.daily_dataset.data["DATE"] <= self.end)
         ]
-        df_clim = df_clim[(df_clim["DATE_MD"] != "02-29")]
+        df_clim = df_clim[(df_clim["DATE_DOY"] != FEB29_DOY)]
         return df_clim
 
     def _impute_feb29(self):
@@ -531,60 +760,37 @@ class NOAAPlotterMonthlyClimateDataset(object):
     def calculate_monthly_statistics(self):
         """
         Function to calculate monthly statistics.
+        Months with fewer than min_valid_days valid observations of a variable are set to NaN.
+        Besides the statistics, the month start ('DATE'), 'Year' and 'Month' are added as columns.
         :return:
         """
-
-        df_out = pd.DataFrame()
         data_filtered = self.filter_to_date()
-        df_out["tmean_doy_mean"] = (
-            data_filtered[["TMEAN"]]
-            .groupby(data_filtered["DATE_YM"])
-            .agg(lambda x: x.mean() if x.notna().any() else np.nan)
-            .TMEAN
-        )
-        df_out["tmean_doy_std"] = (
-            data_filtered[["TMEAN"]]
-            .groupby(data_filtered["DATE_YM"])
-            .agg(lambda x: x.std() if x.notna().any() else np.nan)
-            .TMEAN
-        )
-        df_out["tmax_doy_max"] = (
-            data_filtered[["TMAX"]]
-            .groupby(data_filtered["DATE_YM"])
-            .agg(lambda x: x.max() if x.notna().any() else np.nan)
-            .TMAX
-        )
-        df_out["tmax_doy_std"] = (
-            data_filtered[["TMAX"]]
-            .groupby(data_filtered["DATE_YM"])
-            .agg(lambda x: x.std() if x.notna().any() else np.nan)
-            .TMAX
-        )
-        df_out["tmin_doy_min"] = (
-            data_filtered[["TMIN"]]
-            .groupby(data_filtered["DATE_YM"])
-            .agg(lambda x: x.min() if x.notna().any() else np.nan)
-            .TMIN
-        )
-        df_out["tmin_doy_std"] = (
-            data_filtered[["TMIN"]]
-            .groupby(data_filtered["DATE_YM"])
-            .agg(lambda x: x.std() if x.notna().any() else np.nan)
-            .TMIN
-        )
-        if "SNOW" in data_filtered.columns:
-            df_out["snow_doy_mean"] = (
-                data_filtered[["SNOW"]]
-                .groupby(data_filtered["DATE_YM"])
-                .agg(lambda x: x.mean() if x.notna().any() else np.nan)
-                .SNOW
-            )
-        df_out["prcp_sum"] = (
-            data_filtered[["PRCP"]]
-            .groupby(data_filtered["DATE_YM"])
-            .agg(lambda x: x.sum() if x.notna().any() else np.nan)
-            .PRCP
-        )
+        columns = [
+            ("tmean_doy_mean", "TMEAN", "mean"),
+            ("tmean_doy_std", "TMEAN", "std"),
+            ("tmax_doy_max", "TMAX", "max"),
+            ("tmax_doy_std", "TMAX", "std"),
+            ("tmin_doy_min", "TMIN", "min"),
+            ("tmin_doy_std", "TMIN", "std"),
+            ("snow_doy_mean", "SNOW", "mean"),
+            ("prcp_sum", "PRCP", "sum"),
+        ]
+        columns = [c for c in columns if c[1] in data_filtered.columns]
+        aggregations = {}
+        for _, variable, statistic in columns:
+            aggregations.setdefault(variable, ["count"]).append(statistic)
+        stats = data_filtered.groupby("DATE_YM").agg(aggregations)
+
+        # all-NaN months must not become 0 (e.g. precipitation sums)
+        min_valid_days = max(self.min_valid_days, 1)
+        df_out = pd.DataFrame(index=pd.Index(ym_labels(stats.index), name="DATE_YM"))
+        for name, variable, statistic in columns:
+            valid = stats[(variable, "count")].values >= min_valid_days
+            df_out[name] = np.where(valid, stats[(variable, statistic)].values, np.nan)
+        ym = stats.index.values
+        df_out["DATE"] = ym_dates(ym).values
+        df_out["Month"] = ym % 100
+        df_out["Year"] = ym // 100
         self.monthly_aggregate = df_out
 
     def calculate_monthly_climate(self):
@@ -592,17 +798,25 @@ class NOAAPlotterMonthlyClimateDataset(object):
         Function to calculate monthly climate statistics.
         :return:
         """
-        df_out = pd.DataFrame()
         data_filtered = self.filter_to_date()
+        if self.cache is not None:
+            key = ClimateNormalsCache.make_key(
+                "monthly",
+                self.daily_dataset.get_station(),
+                self.start,
+                self.end,
+                None,
+                self.impute_feb29,
+                hash_dataframe(data_filtered, CLIMATE_COLUMNS),
+            )
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.monthly_climate = cached
+                return
 
-        data_filtered["DATE"] = data_filtered.apply(
-            lambda x: parse_dates_YM(x["DATE_YM"]), axis=1
-        )
-        data_filtered["Month"] = data_filtered.apply(
-            lambda x: parse_dates_YM(x["DATE_YM"]).month, axis=1
-        )
-        data_filtered["Year"] = data_filtered.apply(
-            lambda x: parse_dates_YM(x["DATE_YM"]).year, axis=1
+        df_out = pd.DataFrame()
+        data_filtered = data_filtered.assign(
+            Month=data_filtered["DATE_M"].astype(int)
         )
 
         df_out["tmean_doy_mean"] = (
@@ -657,6 +871,8 @@ class NOAAPlotterMonthlyClimateDataset(object):
         )
         # df_out = df_out.set_index('DATE_YM', drop=False)
         self.monthly_climate = df_out
+        if self.cache is not None:
+            self.cache.put(key, df_out, station=self.daily_dataset.get_station())
 
     def _make_report(self):
         """
@@ -1,18 +1,31 @@
 import datetime as dt
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import timedelta
 
-import ee
-import geemap
 import numpy as np
 import pandas as pd
-import polars as pl
-import requests
-import tqdm
-from joblib import Parallel, delayed
 
-from noaaplotter.utils.utils import assign_numeric_datatypes
+from noaaplotter.utils.noaa_client import NOAAClient
+from noaaplotter.utils.response_cache import ResponseCache
+from noaaplotter.utils.request_plan import (
+    RequestPlan,
+    from_days,
+    missing_runs,
+    observed_density,
+    subtract_runs,
+    to_days,
+    union_runs,
+)
+from noaaplotter.utils.staging import (
+    ID_COLUMNS,
+    ChunkStaging,
+    normalize_chunk,
+    staging_dir,
+)
+
+# days of the blocks in which station files are assembled, about ten years
+STATION_BLOCK_DAYS = 3653
 
 
 # move some logic outside
@@ -25,96 +38,370 @@ def download_from_noaa(
     station_id,
     noaa_api_token,
     n_jobs=4,
+    rate_limit=5,
+    client=None,
+    store=False,
+    dry_run=False,
+    cache_dir=None,
+    offline=False,
 ):
-    # Check if file exists and load it
-    if os.path.exists(output_file):
-        existing_df = pl.read_parquet(output_file).drop_nulls(subset='STATION')
-        existing_dates = set(existing_df['DATE'].to_list())
-    else:
-        existing_df = None
-        existing_dates = set()
-
-    # Convert datestrings to datetime
-    dt_start = datetime.strptime(start_date, "%Y-%m-%d")
-    dt_end = datetime.strptime(end_date, "%Y-%m-%d")
-
-    # Calculate date range
-    all_dates = set(pd.date_range(start=dt_start, end=dt_end).strftime("%Y-%m-%d"))
-    missing_dates = sorted(list(all_dates - existing_dates))
+    """
+    download daily summaries of a station through the NCEI data service and add the
+    missing dates to output_file. Responses are staged as they arrive, an interrupted
+    download resumes with the requests which were not staged.
+    :param n_jobs: number of concurrent requests
+    :param rate_limit: maximum requests per second
+    :param client: client to share its connections and rate limit with other downloads,
+        created from noaa_api_token, n_jobs and rate_limit if not given
+    :type client: NOAAClient, optional
+    :param store: output_file is the directory of a PartitionedStore, created if it
+        does not exist. Only new partition files are written.
+    :type store: bool
+    :param dry_run: print the request plan without downloading
+    :type dry_run: bool
+    :param cache_dir: directory of a ResponseCache of the created client
+    :type cache_dir: str, optional
+    :param offline: only answer requests from the cache of the created client
+    :type offline: bool
+    :return: 0
+    """
+    if store:
+        from noaaplotter.utils.store import PartitionedStore
 
-    if not missing_dates:
+        store = PartitionedStore(output_file, create=True)
+    staging = ChunkStaging(staging_dir(output_file, store=bool(store)), datatypes)
+    plan = plan_station(
+        RequestPlan(),
+        output_file,
+        station_id,
+        datatypes,
+        start_date,
+        end_date,
+        store=store or None,
+        staged=staging.completed(station_id),
+    )
+    if dry_run:
+        print(plan)
+        return 0
+    date_ranges = plan.date_ranges(station_id)
+    if not date_ranges and not staging.completed(station_id):
         print("No new data to download.")
         return 0
 
-    # Find contiguous date ranges to download
-    date_ranges = []
-    range_start = missing_dates[0]
-    prev_date = datetime.strptime(missing_dates[0], "%Y-%m-%d")
-
-    for date_str in missing_dates[1:] + [None]:  # Add None to handle the last range
-        if date_str is None or datetime.strptime(date_str, "%Y-%m-%d") - prev_date > timedelta(days=1):
-            date_ranges.append((range_start, prev_date.strftime("%Y-%m-%d")))
-            if date_str is not None:
-                range_start = date_str
-        prev_date = datetime.strptime(date_str, "%Y-%m-%d") if date_str else None
-
     # Data Loading
     print("Downloading missing data through NOAA API")
-    all_new_data = []
-
     for start, end in date_ranges:
         print(f"Downloading data from {start} to {end}")
-        n_days = (datetime.strptime(end, "%Y-%m-%d") - datetime.strptime(start, "%Y-%m-%d")).days + 1
-        split_size = np.floor(1000 / len(datatypes))
-        split_range = np.arange(0, n_days, split_size)
 
-        datasets_list = Parallel(n_jobs=n_jobs)(
-            delayed(dl_noaa_api)(
-                i, datatypes, station_id, noaa_api_token, start, end, split_size
-            )
-            for i in tqdm.tqdm(split_range[:])
-        )
+    if client is None:
+        cache = ResponseCache(cache_dir) if cache_dir else None
+        with NOAAClient(
+            noaa_api_token,
+            concurrency=n_jobs,
+            rate_limit=rate_limit,
+            cache=cache,
+            offline=offline,
+        ) as client:
+            client.download_plan(plan, on_result=staging.append)
+    else:
+        client.download_plan(plan, on_result=staging.append)
+    if client.cache is not None:
+        print(f"Response cache: {client.cache.summary()}")
 
-        # Drop empty/None from datasets_list
-        datasets_list = [i for i in datasets_list if i is not None]
-        all_new_data.extend(datasets_list)
+    save_staged(
+        staging,
+        station_id,
+        output_file,
+        loc_name,
+        start_date,
+        end_date,
+        date_ranges,
+        store=store or None,
+    )
+    return 0
 
-    # Merge subsets and create DataFrame
-    df = pd.concat(all_new_data)
 
-    df_pivot = assign_numeric_datatypes(df)
-    df_pivot["DATE"] = df_pivot.apply(
-        lambda x: datetime.fromisoformat(x["DATE"]).strftime("%Y-%m-%d"), axis=1
+def existing_days(output_file):
+    """
+    days with data in output_file
+    :param output_file: parquet file of a station, may not exist yet
+    :return: numpy.ndarray of day numbers (int32)
+    """
+    import polars as pl
+
+    if not os.path.exists(output_file):
+        return np.empty(0, dtype=np.int32)
+    df = pl.read_parquet(output_file, columns=["DATE", "STATION"])
+    date = pl.col("DATE")
+    if df.schema["DATE"] == pl.String:
+        date = date.str.slice(0, 10).str.to_date()
+    return (
+        df.filter(pl.col("STATION").is_not_null())
+        .select(date.cast(pl.Date).cast(pl.Int32))["DATE"]
+        .to_numpy()
+    )
+
+
+def plan_station(
+    plan,
+    output_file,
+    station_id,
+    datatypes,
+    start_date,
+    end_date,
+    store=None,
+    staged=None,
+):
+    """
+    add the dates between start_date and end_date which are missing in output_file (or
+    in store) to a request plan, requests are sized by the density of existing data
+    :type plan: RequestPlan
+    :param output_file: parquet file of a station, may not exist yet
+    :param store: store of the station instead of output_file
+    :type store: PartitionedStore, optional
+    :param staged: date ranges which are staged already and not planned again
+    :type staged: list, optional
+    :return: plan
+    """
+    if store is not None:
+        missing = store.missing_date_ranges(station_id, start_date, end_date)
+        days = to_days(np.asarray(missing, dtype=str).reshape(-1, 2))
+        starts, ends = days[:, 0], days[:, 1]
+        density = store.density(station_id)
+    else:
+        days = existing_days(output_file)
+        starts, ends = missing_runs(days, start_date, end_date)
+        density = observed_density(days)
+    if staged:
+        staged_days = to_days(np.asarray(staged, dtype=str).reshape(-1, 2))
+        starts, ends = subtract_runs(starts, ends, *staged_days.T)
+    return plan.add(station_id, datatypes, starts, ends, density)
+
+
+FINAL_COLUMNS = ["STATION", "NAME", "DATE", "PRCP", "SNWD", "TAVG", "TMAX", "TMIN"]
+
+
+def station_frame(datasets_list, date_ranges, loc_name, columns=FINAL_COLUMNS):
+    """
+    one row per date of date_ranges from downloaded chunks of a station, dates without
+    data are empty rows
+    :param datasets_list: downloaded chunks (pandas.DataFrame of responses, or
+        polars.DataFrame/LazyFrame of staged chunks), None for chunks without data
+    :param date_ranges: downloaded date ranges, list of (start, end)
+    :param columns: columns of the frame, missing datatypes are empty
+    :return: polars.LazyFrame, None if no data was downloaded
+    """
+    import polars as pl
+
+    # Drop empty/None from datasets_list
+    all_new_data = [
+        (
+            pl.from_pandas(normalize_chunk(i)) if isinstance(i, pd.DataFrame) else i
+        ).lazy()
+        for i in datasets_list
+        if i is not None
+    ]
+    if not all_new_data:
+        return None
+
+    # Merge subsets, later rows of a date replace earlier ones
+    df = (
+        pl.concat(all_new_data, how="diagonal_relaxed")
+        .with_columns(pl.col("DATE").str.to_date("%Y-%m-%d"))
+        .unique(subset="DATE", keep="last", maintain_order=True)
+    )
+
+    # empty rows for the dates of the date ranges without data
+    range_days = to_days(np.asarray(date_ranges, dtype=str).reshape(-1, 2))
+    starts, ends = union_runs(range_days[:, 0], range_days[:, 1])
+    n = ends - starts + 1
+    days = np.repeat(starts, n) + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    empty = (
+        pl.LazyFrame({"DATE": days.astype(np.int32)})
+        .select(pl.col("DATE").cast(pl.Date))
+        .join(df.select("DATE"), on="DATE", how="anti")
     )
+    df_merged = (
+        pl.concat([df, empty], how="diagonal_relaxed")
+        .sort("DATE")
+        .with_columns(pl.col("DATE").dt.to_string("%Y-%m-%d"))
+    )
+    merged_columns = df_merged.collect_schema().names()
+
+    def column(col):
+        if col == "NAME":
+            return pl.lit(loc_name, dtype=pl.String).alias(col)
+        # datatypes which were not requested or not observed are empty
+        expr = pl.col(col) if col in merged_columns else pl.lit(None)
+        dtype = pl.String if col in ID_COLUMNS else pl.Float64
+        return expr.cast(dtype, strict=False).alias(col)
+
+    return df_merged.select([column(col) for col in columns])
 
-    df_pivot = df_pivot.reset_index(drop=False)
-    dr = pd.DataFrame(pd.date_range(start=start_date, end=end_date), columns=["DATE"])
-    dr["DATE"] = dr["DATE"].astype(str)
-    df_merged = pd.concat(
-        [df_pivot.set_index("DATE"), dr.set_index("DATE")],
-        join="outer",
-        axis=1,
-        sort=True,
+
+def save_station_data(output_file, datasets_list, start_date, end_date, loc_name):
+    """
+    merge downloaded chunks of a station with output_file, dates without data between
+    start_date and end_date are added as empty rows
+    :param datasets_list: downloaded chunks, None for chunks without data
+    :return: number of downloaded rows
+    """
+    import polars as pl
+
+    frames = [
+        pl.from_pandas(normalize_chunk(i)) if isinstance(i, pd.DataFrame) else i
+        for i in datasets_list
+        if i is not None
+    ]
+    return write_station_file(
+        output_file, lambda start, end: frames, start_date, end_date, loc_name
     )
-    df_merged["DATE"] = df_merged.index
-    df_merged["NAME"] = loc_name
-    if "TAVG" not in df_merged.columns:
-        df_merged["TAVG"] = None
-    if "SNWD" not in df_merged.columns:
-        df_merged["SNWD"] = None
-    final_cols = ["STATION", "NAME", "DATE", "PRCP", "SNWD", "TAVG", "TMAX", "TMIN"]
-    df_final = df_merged[final_cols]
-    df_final = df_final.replace({np.nan: None})
+
+
+def write_station_file(output_file, chunks, start_date, end_date, loc_name):
+    """
+    merge downloaded rows of a station with output_file, dates without data between
+    start_date and end_date are added as empty rows. The file is assembled in blocks of
+    STATION_BLOCK_DAYS and streamed to disk, only the chunks and existing rows of a few
+    blocks are in memory at a time.
+    :param chunks: function of (block start, block end) ("yyyy-mm-dd") returning the
+        downloaded chunks with rows in the block (polars.DataFrame/LazyFrame, None for
+        chunks without data)
+    :type chunks: callable
+    :return: number of downloaded rows
+    """
+    import polars as pl
+
+    start_day, end_day = to_days([start_date, end_date]).tolist()
+    start_date, end_date = from_days([start_day, end_day]).tolist()
+    if all(i is None for i in chunks(start_date, end_date)):
+        print(f"No data downloaded for {output_file}.")
+        return 0
 
     # Merge with existing data if it exists
-    if existing_df is not None:
-        df_final = pd.concat([existing_df.to_pandas(), df_final]).drop_duplicates(subset=["DATE"], keep="last")
+    existing_df = None
+    first_day, last_day = start_day, end_day
+    if os.path.exists(output_file):
+        existing_df = (
+            pl.scan_parquet(output_file)
+            .drop("__index_level_0__", strict=False)
+            .drop_nulls(subset="STATION")
+            .with_columns(pl.col("DATE").cast(pl.String).str.slice(0, 10))
+        )
+        bounds = existing_df.select(
+            pl.col("DATE").min().alias("first"), pl.col("DATE").max().alias("last")
+        ).collect()
+        if bounds["first"][0] is not None:
+            first_day = min(first_day, int(to_days(bounds["first"][0])))
+            last_day = max(last_day, int(to_days(bounds["last"][0])))
+
+    blocks = []
+    new_blocks = []
+    for block_start in range(first_day, last_day + 1, STATION_BLOCK_DAYS):
+        block_end = min(block_start + STATION_BLOCK_DAYS - 1, last_day)
+        block = from_days([block_start, block_end]).tolist()
+        in_block = pl.col("DATE").is_between(pl.lit(block[0]), pl.lit(block[1]))
+        parts = []
+        if existing_df is not None:
+            parts.append(existing_df.filter(in_block))
+        if block_start <= end_day and block_end >= start_day:
+            new_block = station_frame(
+                chunks(*block),
+                [(max(block[0], start_date), min(block[1], end_date))],
+                loc_name,
+            )
+            if new_block is not None:
+                new_block = new_block.filter(in_block)
+                parts.append(new_block)
+                new_blocks.append(new_block)
+        if not parts:
+            continue
+        df_block = pl.concat(parts, how="diagonal_relaxed")
+        if existing_df is not None:
+            # empty rows do not replace existing data, downloaded rows do
+            has_data = pl.col("STATION").is_not_null()
+            df_block = df_block.sort(["DATE", has_data], maintain_order=True).unique(
+                subset="DATE", keep="last", maintain_order=True
+            )
+        blocks.append(df_block)
+    n_rows = (
+        pl.concat(new_blocks, how="diagonal_relaxed")
+        .select(pl.col("STATION").is_not_null().sum())
+        .collect()
+        .item()
+    )
 
     print(f"Saving data to {output_file}")
-    df_final.to_parquet(output_file)
-    return 0
+    # the existing file is read while the new one is written
+    tmp_path = f"{output_file}.{os.getpid()}.tmp"
+    pl.concat(blocks, how="diagonal_relaxed").sink_parquet(tmp_path)
+    os.replace(tmp_path, output_file)
+    return int(n_rows)
 
 
+def save_to_store(store, station_id, datasets_list, date_ranges, loc_name):
+    """
+    write downloaded chunks of a station as new partition files of store, dates of
+    date_ranges without data are added as empty rows
+    :type store: PartitionedStore
+    :return: number of downloaded rows
+    """
+    from noaaplotter.utils.store import STORE_SCHEMA
+
+    df_final = station_frame(
+        datasets_list, date_ranges, loc_name, columns=list(STORE_SCHEMA)
+    )
+    if df_final is None:
+        print(f"No data downloaded for {station_id}.")
+        return 0
+    # the rows are split into partition files of the store
+    df_final = df_final.collect()
+    store.append(station_id, df_final, date_ranges, name=loc_name)
+    return int(df_final["STATION"].is_not_null().sum())
+
+
+def save_staged(
+    staging,
+    station_id,
+    output_file,
+    loc_name,
+    start_date,
+    end_date,
+    date_ranges,
+    store=None,
+):
+    """
+    write the staged chunks of a station to output_file (or to store) and remove them
+    from the staging area
+    :type staging: ChunkStaging
+    :param date_ranges: planned date ranges of this download, the staged ranges of an
+        interrupted download are added
+    :param store: store of the station instead of output_file
+    :type store: PartitionedStore, optional
+    :return: number of downloaded rows
+    """
+    if store is not None:
+        ranges = to_days(
+            np.asarray(
+                list(date_ranges) + staging.completed(station_id), dtype=str
+            ).reshape(-1, 2)
+        )
+        starts, ends = union_runs(ranges[:, 0], ranges[:, 1])
+        date_ranges = list(zip(from_days(starts).tolist(), from_days(ends).tolist()))
+        rows = save_to_store(
+            store, station_id, [staging.scan(station_id)], date_ranges, loc_name
+        )
+    else:
+        rows = write_station_file(
+            output_file,
+            lambda start, end: [staging.scan(station_id, start, end)],
+            start_date,
+            end_date,
+            loc_name,
+        )
+    staging.clear(station_id)
+    return rows
+
 
 def dl_noaa_api(i, dtypes, station_id, Token, date_start, date_end, split_size):
     """
@@ -143,6 +430,8 @@ def dl_noaa_api(i, dtypes, station_id, Token, date_start, date_end, split_size):
         units="metric",
         format="json",
     )
+    import requests
+
     r = requests.get(request_url, params=request_params, headers={"token": Token})
 
     # workaround to skip empty returns (no data within period)
@@ -159,6 +448,10 @@ def dl_noaa_api(i, dtypes, station_id, Token, date_start, date_end, split_size):
 
 
 def download_era5_from_gee(latitude, longitude, end_date, start_date, output_file):
+    # Earth Engine is only needed (and only installed) for ERA5 downloads
+    import ee
+    import geemap
+
     ee.Initialize()
     EE_LAYER = "ECMWF/ERA5/DAILY"
     location = ee.Geometry.Point([longitude, latitude])
@@ -0,0 +1,115 @@
+import numpy as np
+
+from .utils import find_runs
+
+
+def _bucket_edges(n, n_buckets):
+    """
+    start indices of n_buckets nearly equal buckets of n values, and n
+    """
+    return np.unique(np.linspace(0, n, n_buckets + 1).astype(int))
+
+
+def _lttb_run(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets selection of a series without missing values
+    :return: indices of the selected points
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # first and last point are always kept, the inner points are split into buckets
+    edges = 1 + _bucket_edges(n - 2, n_out - 2)
+    selected = np.empty(len(edges) + 1, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(len(edges) - 1):
+        lo, hi = edges[i], edges[i + 1]
+        # average of the next bucket, or the last point for the last bucket
+        if i + 2 < len(edges):
+            nxt = slice(hi, edges[i + 2])
+            cx, cy = x[nxt].mean(), y[nxt].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def lttb_indices(y, n_out, x=None, keep=None):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a line, points of different runs
+    of valid values are selected separately and the gaps between them are kept
+    :param y:
+    :param n_out: approximate number of points to keep
+    :param x: numeric x values, defaults to equally spaced values (e.g. daily series)
+    :param keep: boolean mask of points which are always kept (e.g. records)
+    :return: sorted indices of the selected points
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+    starts, ends = find_runs(np.isfinite(y))
+    selected = [ends[ends < n]]  # first missing value after each run breaks the line
+    for start, end in zip(starts, ends):
+        run_out = max(int(round(n_out * (end - start) / n)), 3)
+        selected.append(start + _lttb_run(x[start:end], y[start:end], run_out))
+    if keep is not None:
+        selected.append(np.flatnonzero(keep))
+    return np.unique(np.concatenate(selected))
+
+
+def minmax_envelope(x, y1, y2, n_buckets):
+    """
+    Min-max envelope of the area between y1 and y2 per bucket, so that fills keep
+    their extremes. Days where the area has no height are ignored and buckets without
+    any area stay missing.
+    :param x: x values
+    :param y1:
+    :param y2:
+    :param n_buckets: number of buckets, e.g. the axis width in pixels
+    :return: x (first and last x of each bucket), upper and lower bound
+    """
+    x = np.asarray(x)
+    y1 = np.broadcast_to(np.asarray(y1, dtype=float), x.shape)
+    y2 = np.broadcast_to(np.asarray(y2, dtype=float), x.shape)
+    if len(x) <= 2 * n_buckets:
+        return x, y1, y2
+    edges = _bucket_edges(len(x), n_buckets)
+    empty = ~(np.isfinite(y1) & np.isfinite(y2)) | (y1 == y2)
+    # fmax/fmin ignore missing values, buckets which are completely missing stay nan
+    upper = np.fmax.reduceat(np.where(empty, np.nan, np.fmax(y1, y2)), edges[:-1])
+    lower = np.fmin.reduceat(np.where(empty, np.nan, np.fmin(y1, y2)), edges[:-1])
+    # each bucket spans from its first to its last day
+    x_out = np.column_stack([x[edges[:-1]], x[edges[1:] - 1]]).ravel()
+    return x_out, np.repeat(upper, 2), np.repeat(lower, 2)
+
+
+def downsample_plot_series(lines, fills, n_pixels, keep=None):
+    """
+    reduce lines (LTTB) and filled areas (min-max envelope) to about the resolution of
+    an axis
+    :param lines: dict of (x, y) of lines
+    :type lines: dict
+    :param fills: dict of (x, y1, y2) of filled areas
+    :type fills: dict
+    :param n_pixels: width of the axis in pixels
+    :type n_pixels: int
+    :param keep: boolean masks of points which are always kept per line name
+    :type keep: dict, optional
+    :return: downsampled lines and fills
+    """
+    keep = keep or {}
+    lines_out = {}
+    for name, (x, y) in lines.items():
+        idx = lttb_indices(y, 2 * n_pixels, keep=keep.get(name))
+        lines_out[name] = (np.asarray(x)[idx], np.asarray(y)[idx])
+    fills_out = {
+        name: minmax_envelope(x, y1, y2, n_pixels)
+        for name, (x, y1, y2) in fills.items()
+    }
+    return lines_out, fills_out
@@ -0,0 +1,454 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+NCEI_URL = "https://www.ncei.noaa.gov/access/services/data/v1"
+# responses which are retried, everything else >= 400 fails immediately
+RETRY_STATUS = [429, 500, 502, 503, 504]
+
+
+class TokenBucket(object):
+    """
+    Token bucket rate limiter, on average `rate` requests per second with bursts of up
+    to `capacity`. Thread safe and not bound to an event loop, so one bucket can be
+    shared by all stations and chunks of a client.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        :param rate: tokens per second
+        :type rate: int, float
+        :param capacity: maximum burst, defaults to one second of tokens
+        :type capacity: int, float, optional
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def reserve(self):
+        """
+        take a token, in advance if none is left
+        :return: seconds to wait until the token is available
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def block(self, seconds):
+        """
+        hand out no tokens for the next seconds, e.g. after a 429 response
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class NOAAClient(object):
+    """
+    asyncio client of the NCEI data service. Requests go through one pooled HTTP session,
+    at most `concurrency` at a time and throttled by a shared token bucket. 429 and 5xx
+    responses and connection errors are retried with jittered exponential backoff.
+    Responses are answered from and added to an optional ResponseCache, offline clients
+    only answer from the cache.
+    """
+
+    def __init__(
+        self,
+        token="",
+        base_url=NCEI_URL,
+        concurrency=4,
+        rate_limit=5,
+        max_retries=5,
+        backoff=1.0,
+        max_backoff=60,
+        timeout=60,
+        cache=None,
+        offline=False,
+    ):
+        """
+        :param token: NOAA API token
+        :type token: str
+        :param base_url: url of the data service, e.g. of a local mock
+        :type base_url: str
+        :param concurrency: maximum number of requests in flight
+        :type concurrency: int
+        :param rate_limit: requests per second of all requests, None for no limit
+        :type rate_limit: int, float, optional
+        :param max_retries: retries of a request before it fails
+        :type max_retries: int
+        :param backoff: base delay of retries in seconds, doubled per attempt
+        :type backoff: float
+        :param max_backoff: maximum delay of a retry in seconds
+        :type max_backoff: float
+        :param timeout: timeout of a request in seconds
+        :type timeout: float
+        :param cache: cache of responses
+        :type cache: ResponseCache, optional
+        :param offline: answer requests from the cache only, others fail with LookupError
+        :type offline: bool
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.cache = cache
+        self.offline = offline
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if token:
+            self.session.headers["token"] = token
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        # merged, split and truncated requests of adaptive downloads
+        self.adaptive = dict(merged=0, split=0, truncated=0)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        # value of self.requests at which requests fail, set by fetch_plan
+        self._budget_end = None
+        self._loop = None
+        self._semaphore = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    @staticmethod
+    def request_params(station_id, datatypes, start_date, end_date, limit=1000):
+        """
+        query parameters of a daily summaries request
+        :param station_id: station, e.g. "USW00026616"
+        :param datatypes: list of datatypes, e.g. ["TMIN", "TMAX", "PRCP", "SNOW"]
+        :param start_date: first day ("yyyy-mm-dd")
+        :param end_date: last day ("yyyy-mm-dd")
+        :param limit: maximum number of rows of the response
+        :return: dict
+        """
+        return dict(
+            dataset="daily-summaries",
+            dataTypes=",".join(datatypes),
+            stations=station_id,
+            limit=limit,
+            startDate=start_date,
+            endDate=end_date,
+            units="metric",
+            format="json",
+        )
+
+    def _limit(self):
+        # semaphores belong to an event loop, each download runs its own loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    def _retry_delay(self, attempt, retry_after=None):
+        """
+        full jitter backoff, at least as long as the server asks for
+        """
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    async def get(self, params):
+        """
+        send a request, retried on 429/5xx responses and connection errors
+        :param params: query parameters
+        :type params: dict
+        :return: response text
+        """
+        import requests
+
+        if self.cache is not None:
+            text = self.cache.get(params)
+            if text is not None:
+                return text
+        if self.offline:
+            raise LookupError(
+                f"No cached response for {params['stations']} {params['startDate']} "
+                f"to {params['endDate']} (offline)"
+            )
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            async with self._limit():
+                if self.bucket is not None:
+                    await self.bucket.acquire()
+                if self._budget_end is not None and self.requests >= self._budget_end:
+                    # e.g. retries at the end of a budget
+                    self.failures += 1
+                    raise RuntimeError("Request budget of the download is spent")
+                self.requests += 1
+                try:
+                    r = await loop.run_in_executor(
+                        self._executor,
+                        lambda: self.session.get(
+                            self.base_url, params=params, timeout=self.timeout
+                        ),
+                    )
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    r, error = None, e
+            if r is not None:
+                if r.status_code < 400:
+                    if self.cache is not None:
+                        self.cache.put(params, r.text)
+                    return r.text
+                if r.status_code not in RETRY_STATUS:
+                    self.failures += 1
+                    r.raise_for_status()
+                error = requests.HTTPError(f"{r.status_code} {r.reason}", response=r)
+            if attempt == self.max_retries:
+                self.failures += 1
+                raise error
+            retry_after = r.headers.get("Retry-After") if r is not None else None
+            delay = self._retry_delay(attempt, retry_after)
+            if r is not None and r.status_code == 429 and self.bucket is not None:
+                # the server is overloaded for everyone, hold back all requests
+                self.bucket.block(delay)
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def fetch_chunk(self, station_id, datatypes, start_date, end_date):
+        """
+        download daily summaries of one station and period
+        :return: pandas.DataFrame or None if there is no data within the period
+        """
+        text = await self.get(
+            self.request_params(station_id, datatypes, start_date, end_date)
+        )
+        # workaround to skip empty returns (no data within period)
+        try:
+            result = pd.DataFrame(json.loads(text))
+        except json.JSONDecodeError:
+            result = None
+        if result is None or result.empty:
+            print(
+                f"Warning: No data available for period {start_date} to {end_date}. Skipping."
+            )
+            return None
+        return result
+
+    async def _fetch_all(self, chunks, progress):
+        tasks = [asyncio.ensure_future(self.fetch_chunk(*chunk)) for chunk in chunks]
+        try:
+            if progress:
+                import tqdm
+
+                with tqdm.tqdm(total=len(tasks)) as bar:
+                    for task in asyncio.as_completed(tasks):
+                        await task
+                        bar.update()
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    def download(self, chunks, progress=True):
+        """
+        download many chunks concurrently
+        :param chunks: list of (station_id, datatypes, start_date, end_date)
+        :type chunks: list
+        :param progress: show a progress bar
+        :return: list of pandas.DataFrame or None, in the order of chunks
+        """
+        return asyncio.run(self._fetch_all(chunks, progress))
+
+    async def fetch_plan(
+        self, plan, on_station=None, progress=True, on_result=None, max_requests=None
+    ):
+        """
+        download the requests of a plan, adapted to the responses by an AdaptiveChunker,
+        at most `concurrency` requests at a time and in station order
+        :param plan: planned requests, or a chunker of planned requests
+        :type plan: RequestPlan, AdaptiveChunker
+        :param on_station: called with (station_id, results, error) as soon as all
+            requests of a station are done (list of pandas.DataFrame, None) or one of them
+            failed (None, exception), the other requests of a failed station are skipped
+        :type on_station: callable, optional
+        :param progress: show a progress bar of the downloaded days
+        :param on_result: called with (station_id, start_date, end_date, result) for the
+            rows of every done request and the period they cover (None without data),
+            in a thread of the default executor. The rows are then not kept for
+            on_station, which gets an empty list once all calls of the station returned.
+        :type on_result: callable, optional
+        :param max_requests: budget of network requests of this download, including
+            split, continued and retried requests (cache hits are free). No request is
+            started once it is spent, stations which are not complete then are not
+            reported and their pending requests are left.
+        :type max_requests: int, optional
+        :return: AdaptiveChunker of the download
+        """
+        from noaaplotter.utils.request_plan import AdaptiveChunker
+
+        if isinstance(plan, AdaptiveChunker):
+            chunker, plan = plan, plan.plan
+        else:
+            chunker = AdaptiveChunker(plan)
+        loop = asyncio.get_running_loop()
+        results = {station_id: [] for station_id in plan.stations()}
+        # rows of done requests which are passed to on_result and not written yet
+        writing = {station_id: 0 for station_id in plan.stations()}
+        changed = asyncio.Condition()
+        # requests handed out and not done, counted against the budget until they are
+        fetching = 0
+        budget_end = None if max_requests is None else self.requests + max_requests
+
+        def budget_left():
+            return budget_end is None or self.requests + fetching < budget_end
+
+        bar = None
+        if progress:
+            import tqdm
+
+            bar = tqdm.tqdm(total=int((plan._end - plan._start + 1).sum()), unit="day")
+
+        def report(station_id, error=None):
+            station_results = results.pop(station_id)
+            if on_station is not None:
+                on_station(station_id, None if error else station_results, error)
+
+        # stations without missing dates are done right away
+        for station_id in plan.stations():
+            if chunker.complete(station_id):
+                report(station_id)
+
+        async def worker():
+            nonlocal fetching
+            while True:
+                async with changed:
+                    await changed.wait_for(
+                        lambda: (chunker.pending() and budget_left())
+                        or chunker.finished()
+                        or not (budget_left() or fetching)
+                    )
+                    request = chunker.next() if budget_left() else None
+                    if request is not None:
+                        fetching += 1
+                if request is None:
+                    return
+                station_id = request[0]
+                try:
+                    result, error = await self.fetch_chunk(*request), None
+                except Exception as e:
+                    result, error = None, e
+                window = None
+                async with changed:
+                    fetching -= 1
+                    if error is not None:
+                        chunker.fail(request)
+                    else:
+                        result, window = chunker.done(request, result)
+                        if on_result is None:
+                            if station_id in results and result is not None:
+                                results[station_id].append(result)
+                            window = None
+                        elif window is not None:
+                            # also rows of failed stations, a resumed download skips them
+                            writing[station_id] += 1
+                    changed.notify_all()
+                if window is not None:
+                    # rows are written outside of the lock while the other workers go on
+                    try:
+                        await loop.run_in_executor(
+                            None, on_result, station_id, *window, result
+                        )
+                    except Exception as e:
+                        error = e
+                async with changed:
+                    if window is not None:
+                        writing[station_id] -= 1
+                    if station_id in results:
+                        if error is not None:
+                            report(station_id, error)
+                        elif chunker.complete(station_id) and not writing[station_id]:
+                            report(station_id)
+                    changed.notify_all()
+                if bar is not None:
+                    bar.update(max(0, min(chunker.days_done, bar.total) - bar.n))
+
+        self._budget_end = budget_end
+        try:
+            await asyncio.gather(*[worker() for _ in range(self.concurrency)])
+        finally:
+            self._budget_end = None
+            if bar is not None:
+                bar.close()
+            for key, value in chunker.stats().items():
+                self.adaptive[key] += value
+        return chunker
+
+    def download_plan(self, plan, progress=True, on_result=None):
+        """
+        download the requests of a plan, see fetch_plan
+        :param plan: planned requests
+        :type plan: RequestPlan
+        :param progress: show a progress bar
+        :param on_result: called with the rows of every done request, see fetch_plan
+        :type on_result: callable, optional
+        :return: dict of station_id -> list of pandas.DataFrame, empty lists with on_result
+        """
+        results = {}
+        errors = []
+
+        def on_station(station_id, station_results, error):
+            if error is not None:
+                errors.append(error)
+            results[station_id] = station_results
+
+        asyncio.run(self.fetch_plan(plan, on_station, progress, on_result))
+        if errors:
+            raise errors[0]
+        return results
+
+    def stats(self):
+        """
+        request counters
+        :return: dict
+        """
+        stats = dict(
+            requests=self.requests,
+            retries=self.retries,
+            failures=self.failures,
+            **self.adaptive,
+        )
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
@@ -0,0 +1,84 @@
+import datetime as dt
+
+import numpy as np
+
+
+def make_table(**columns):
+    """
+    numpy record array from equally long columns
+    :param columns: column name -> array
+    :return: numpy.recarray
+    """
+    return np.rec.fromarrays(
+        [np.asarray(values) for values in columns.values()], names=list(columns)
+    )
+
+
+def _json_value(value):
+    if isinstance(value, (np.datetime64, dt.date)):
+        return str(np.datetime64(value, "D"))
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+class PlotData(object):
+    """
+    Data of a plot, independent of rendering: named tables (numpy record arrays) with
+    one row per date or item, and metadata. Plot functions render from it, and it can
+    be serialised (to_dict for json, to_arrow for Arrow IPC/parquet) to render elsewhere.
+    """
+
+    def __init__(self, tables, meta=None):
+        """
+        :param tables: table name -> numpy record array
+        :type tables: dict
+        :param meta: scalar metadata, e.g. station and period
+        :type meta: dict, optional
+        """
+        self.tables = tables
+        self.meta = meta or {}
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+    def __repr__(self):
+        tables = ", ".join(f"{name}[{len(t)}]" for name, t in self.tables.items())
+        return f"PlotData({tables})"
+
+    def to_dict(self):
+        """
+        json serialisable dict with columns as lists, dates as ISO strings and missing
+        values as None
+        :return: dict
+        """
+        return dict(
+            meta={key: _json_value(value) for key, value in self.meta.items()},
+            tables={
+                name: {
+                    column: [_json_value(v) for v in table[column]]
+                    for column in table.dtype.names
+                }
+                for name, table in self.tables.items()
+            },
+        )
+
+    def to_arrow(self):
+        """
+        tables as pyarrow Tables, metadata is attached to the schema of each table
+        :return: dict of table name -> pyarrow.Table
+        """
+        import json
+
+        import pyarrow as pa
+
+        metadata = {"noaaplotter": json.dumps(self.to_dict()["meta"])}
+        return {
+            name: pa.table(
+                {column: table[column] for column in table.dtype.names},
+                metadata=metadata,
+            )
+            for name, table in self.tables.items()
+        }
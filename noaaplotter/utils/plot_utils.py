@@ -8,6 +8,11 @@
 # version: 2021-09-11
 
 ########################
+import numpy as np
+import pandas as pd
+
+from noaaplotter.utils.utils import find_runs
+
 
 # TODO: move to external file
 def setup_monthly_plot_props(information, anomaly):
@@ -46,4 +51,140 @@ def setup_monthly_plot_props(information, anomaly):
             plot_kwargs['title'] = 'Monthly Precipitation'
             plot_kwargs['legend_label_below'] = ''
             plot_kwargs['legend_label_above'] = 'Monthly Precipitation'
-    return plot_kwargs
\ No newline at end of file
+    return plot_kwargs
+
+
+def new_figure(figsize, dpi, interactive=False):
+    """
+    create a figure with its own Agg canvas, independent of the global pyplot state so
+    that figures can be rendered concurrently. Only interactive figures are created
+    through pyplot.
+    :param figsize:
+    :param dpi:
+    :param interactive: figure will be shown in a window
+    :type interactive: bool
+    :return: matplotlib.figure.Figure
+    """
+    if interactive:
+        from matplotlib import pyplot as plt
+
+        return plt.figure(figsize=figsize, dpi=dpi)
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def finish_figure(fig, save_path=False, show_plot=False, return_plot=False):
+    """
+    save and/or show a figure created by new_figure
+    :param fig:
+    :param save_path: file path of the plot, not saved if not given
+    :param show_plot: show the figure in a window (pyplot)
+    :param return_plot: return the figure instead of releasing it
+    :return: figure if return_plot
+    """
+    if save_path:
+        fig.savefig(save_path)
+    if show_plot:
+        from matplotlib import pyplot as plt
+
+        plt.show()
+        if not return_plot:
+            plt.close(fig)
+    if return_plot:
+        return fig
+
+
+def fill_verts(x, y1, y2):
+    """
+    polygons between y1 and y2 like fill_between, split at missing values
+    :param x: numeric x values
+    :param y1:
+    :param y2:
+    :return: list of (n, 2) vertex arrays
+    """
+    x = np.asarray(x, dtype=float)
+    y1 = np.broadcast_to(np.asarray(y1, dtype=float), x.shape)
+    y2 = np.broadcast_to(np.asarray(y2, dtype=float), x.shape)
+    starts, ends = find_runs(np.isfinite(y1) & np.isfinite(y2))
+    polygons = []
+    for start, end in zip(starts, ends):
+        xs = x[start:end]
+        polygons.append(
+            np.concatenate(
+                [
+                    np.column_stack([xs, y1[start:end]]),
+                    np.column_stack([xs[::-1], y2[start:end][::-1]]),
+                ]
+            )
+        )
+    return polygons
+
+
+def span_verts(x_start, x_end, bottom, top):
+    """
+    rectangles spanning from x_start to x_end and bottom to top
+    :param x_start: numeric x values
+    :param x_end: numeric x values
+    :param bottom: scalar or per rectangle values
+    :param top: scalar or per rectangle values
+    :return: (n, 4, 2) vertex array
+    """
+    x_start = np.asarray(x_start, dtype=float)
+    x_end = np.asarray(x_end, dtype=float)
+    bottom = np.broadcast_to(np.asarray(bottom, dtype=float), x_start.shape)
+    top = np.broadcast_to(np.asarray(top, dtype=float), x_start.shape)
+    return np.stack(
+        [
+            np.column_stack([x_start, bottom]),
+            np.column_stack([x_start, top]),
+            np.column_stack([x_end, top]),
+            np.column_stack([x_end, bottom]),
+        ],
+        axis=1,
+    )
+
+
+def precipitation_bins(x_dates, prcp, n_pixels):
+    """
+    daily precipitation bars, summed to weekly or monthly totals if the window has more
+    days (or weeks) than the axis has pixels
+    :param x_dates: dates of the daily values
+    :param prcp: daily precipitation
+    :param n_pixels: width of the axis in pixels
+    :return: bar start, bar end (numeric dates), totals and legend label
+    """
+    from matplotlib import dates
+
+    prcp = pd.Series(np.asarray(prcp, dtype=float), index=pd.DatetimeIndex(x_dates))
+    if len(prcp) <= n_pixels:
+        x = dates.date2num(prcp.index)
+        start, end, totals, label = x - 0.5, x + 0.5, prcp, "Precipitation"
+    elif len(prcp) / 7 <= n_pixels:
+        totals = prcp.resample("7D").sum(min_count=1)
+        start = dates.date2num(totals.index)
+        end = start + 7
+        label = "Weekly Precipitation"
+    else:
+        totals = prcp.resample("MS").sum(min_count=1)
+        start = dates.date2num(totals.index)
+        end = dates.date2num(totals.index + pd.offsets.MonthBegin(1))
+        label = "Monthly Precipitation"
+    # bars cover 80 % of their bin like the default width of daily bars
+    pad = (end - start) * 0.1
+    return start + pad, end - pad, totals.values, label
+
+
+def precipitation_verts(x_start, x_end, totals):
+    """
+    bar rectangles of precipitation bins, bins without data are skipped
+    :param x_start: numeric x values
+    :param x_end: numeric x values
+    :param totals:
+    :return: (n, 4, 2) vertex array
+    """
+    valid = np.isfinite(totals)
+    return span_verts(x_start[valid], x_end[valid], 0, totals[valid])
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+from .climatology import doy_key
+
+
+class DailyRecords(object):
+    """
+    Record high and low values per calendar day (leap year day of year) with the year they were set
+    and the runner-up. Ties are credited to the earliest year.
+    """
+
+    def __init__(self, data, variable="TMEAN"):
+        """
+        :param data: daily data with 'DATE' and variable columns
+        :type data: pandas.DataFrame
+        :param variable: variable to track records of
+        :type variable: str
+        """
+        self.variable = variable
+        self.table = None
+        self._highs = None
+        self._lows = None
+        self._build(self._candidates(data))
+
+    def _candidates(self, data):
+        """
+        reduce daily data to day of year, year and value
+        """
+        if "DATE_DOY" in data.columns:
+            doy = data["DATE_DOY"].values
+        else:
+            doy = doy_key(data["DATE"])
+        candidates = pd.DataFrame(
+            {
+                "doy": doy,
+                "year": data["DATE"].dt.year.values,
+                "value": data[self.variable].values,
+            }
+        )
+        return candidates.dropna(subset=["value"])
+
+    @staticmethod
+    def _top2(candidates, ascending):
+        """
+        two highest (or lowest) values per day of year, earliest year first for ties
+        """
+        ranked = candidates.sort_values(
+            ["doy", "value", "year"], ascending=[True, ascending, True], kind="stable"
+        )
+        return ranked.groupby("doy", sort=False).head(2)
+
+    def _build(self, candidates):
+        self._highs = self._top2(candidates, ascending=False)
+        self._lows = self._top2(candidates, ascending=True)
+        table = pd.DataFrame(index=pd.RangeIndex(1, 367, name="DATE_DOY"))
+        for name, top in [("high", self._highs), ("low", self._lows)]:
+            rank = top.groupby("doy", sort=False).cumcount().values
+            first, second = top[rank == 0], top[rank == 1]
+            table[name] = first.set_index("doy")["value"]
+            table[f"{name}_year"] = first.set_index("doy")["year"].astype("Int64")
+            table[f"{name}_2"] = second.set_index("doy")["value"]
+            table[f"{name}_2_year"] = second.set_index("doy")["year"].astype("Int64")
+        self.table = table
+
+    def update(self, data):
+        """
+        update records with newly appended daily data
+        :param data: new daily data with 'DATE' and variable columns
+        :type data: pandas.DataFrame
+        :return:
+        """
+        new = self._candidates(data)
+        self._build(
+            pd.concat([self._highs, self._lows, new], ignore_index=True).drop_duplicates()
+        )
+
+    def match(self, doy, values):
+        """
+        check which values set or tied the record high/low of their day of year
+        :param doy: day of year keys
+        :param values: observed values
+        :return: boolean arrays (is_high, is_low)
+        """
+        doy = np.asarray(doy)
+        values = np.asarray(values, dtype=float)
+        high = self.table["high"].values[doy - 1]
+        low = self.table["low"].values[doy - 1]
+        return values == high, values == low
+
+    def in_window(self, data, start_date, end_date):
+        """
+        days within the window which set or tied a record
+        :param data: daily data with 'DATE' and variable columns
+        :param start_date:
+        :param end_date:
+        :return: DataFrame with DATE, value and record type ('high'/'low')
+        """
+        window = data[(data["DATE"] >= start_date) & (data["DATE"] <= end_date)]
+        is_high, is_low = self.match(doy_key(window["DATE"]), window[self.variable])
+        highs = window.loc[is_high, ["DATE", self.variable]].assign(record="high")
+        lows = window.loc[is_low, ["DATE", self.variable]].assign(record="low")
+        return pd.concat([highs, lows]).sort_values("DATE")
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# supported output formats of rendered plots and their media types
+RENDER_FORMATS = {"png": "image/png", "svg": "image/svg+xml", "webp": "image/webp"}
+
+
+class RenderCache(object):
+    """
+    Content addressed cache of encoded plots. Keys are hashes of the render spec
+    (station, period, options, data version), entries are kept in memory or, if a cache
+    directory is given, on disk. The total size is capped, least recently used entries
+    are evicted first.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir=None, max_size_mb=64):
+        """
+        :param cache_dir: directory of an on-disk cache, defaults to an in-memory cache
+        :type cache_dir: str, optional
+        :param max_size_mb: maximum size of all cached plots in MB
+        :type max_size_mb: int, float
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size_mb * 1e6
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        # key -> size in bytes, in order of last access
+        self._sizes = OrderedDict()
+        self._memory = {}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._read_index()
+
+    @staticmethod
+    def make_key(spec):
+        """
+        create cache key from a render spec
+        :param spec: all parameters the plot depends on
+        :type spec: dict
+        :return: hex digest
+        """
+        return hashlib.sha1(
+            json.dumps(spec, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def get(self, key):
+        """
+        load a cached plot
+        :param key:
+        :return: bytes or None if not cached
+        """
+        with self._lock:
+            data = None
+            if key in self._sizes:
+                data = self._load(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._sizes.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        """
+        store a plot and evict least recently used entries above the size limit
+        :param key:
+        :param data: encoded plot
+        :type data: bytes
+        :return:
+        """
+        with self._lock:
+            if self.cache_dir:
+                path = os.path.join(self.cache_dir, key)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            else:
+                self._memory[key] = data
+            self._sizes[key] = len(data)
+            self._sizes.move_to_end(key)
+            while self.size() > self.max_size and len(self._sizes) > 1:
+                self._remove(next(iter(self._sizes)))
+                self.evictions += 1
+            self._write_index()
+
+    def get_or_render(self, spec, render):
+        """
+        return the cached plot of a render spec, render and store it on a miss
+        :param spec: all parameters the plot depends on
+        :type spec: dict
+        :param render: function returning the encoded plot
+        :return: bytes
+        """
+        key = self.make_key(spec)
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
+
+    def clear(self):
+        """
+        remove all cached plots
+        :return:
+        """
+        with self._lock:
+            for key in list(self._sizes):
+                self._remove(key)
+            self._write_index()
+
+    def size(self):
+        """
+        total size of cached plots in bytes
+        """
+        return sum(self._sizes.values())
+
+    def stats(self):
+        """
+        hit/miss counters and size of the cache
+        :return: dict
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                hit_rate=self.hits / requests if requests else 0.0,
+                evictions=self.evictions,
+                entries=len(self._sizes),
+                size_mb=self.size() / 1e6,
+            )
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return self._memory.get(key)
+        path = os.path.join(self.cache_dir, key)
+        if not os.path.exists(path):
+            del self._sizes[key]
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _remove(self, key):
+        self._sizes.pop(key)
+        self._memory.pop(key, None)
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, key)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _read_index(self):
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                index = json.load(f)
+        except json.JSONDecodeError:
+            return
+        for key, entry in sorted(index.items(), key=lambda e: e[1]["last_access"]):
+            self._sizes[key] = entry["size"]
+
+    def _write_index(self):
+        if not self.cache_dir:
+            return
+        # access order is stored as timestamps so that it survives restarts
+        now = time.time()
+        n = len(self._sizes)
+        index = {
+            key: dict(size=size, last_access=now - (n - i))
+            for i, (key, size) in enumerate(self._sizes.items())
+        }
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, path)
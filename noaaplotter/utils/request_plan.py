@@ -0,0 +1,451 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+from noaaplotter.utils.utils import find_runs
+
+# rows per response of the data service, one row per station and day
+MAX_ROWS = 1000
+# share of MAX_ROWS a request is planned for, headroom for denser periods
+FILL = 0.9
+# lower bound of the density used to size requests, limits the window of sparse stations
+MIN_DENSITY = 0.1
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def to_days(dates):
+    """
+    day numbers (days since 1970-01-01)
+    :param dates: "yyyy-mm-dd" strings, dates or datetime64
+    :return: numpy.ndarray of int32
+    """
+    return (np.asarray(dates, dtype="datetime64[D]") - EPOCH).astype(np.int32)
+
+
+def from_days(days):
+    """
+    "yyyy-mm-dd" strings of day numbers
+    :return: numpy.ndarray of str
+    """
+    return np.datetime_as_string(EPOCH + np.asarray(days, dtype=np.int64), unit="D")
+
+
+def missing_runs(days, start_date, end_date):
+    """
+    contiguous runs of days between start_date and end_date which are not in days
+    :param days: day numbers with data
+    :param start_date: "yyyy-mm-dd"
+    :param end_date: "yyyy-mm-dd"
+    :return: first and last day numbers (inclusive) of the runs
+    """
+    start, end = to_days([start_date, end_date])
+    missing = np.ones(max(end - start + 1, 0), dtype=bool)
+    days = np.asarray(days, dtype=np.int32)
+    missing[days[(days >= start) & (days <= end)] - start] = False
+    starts, ends = find_runs(missing)
+    return (starts + start).astype(np.int32), (ends - 1 + start).astype(np.int32)
+
+
+def _runs_mask(starts, ends, origin, length):
+    """
+    boolean mask of the days of runs within origin to origin + length - 1
+    """
+    starts = np.clip(np.asarray(starts, dtype=np.int64) - origin, 0, length)
+    ends = np.clip(np.asarray(ends, dtype=np.int64) - origin + 1, 0, length)
+    keep = starts < ends
+    delta = np.zeros(length + 1, dtype=np.int32)
+    np.add.at(delta, starts[keep], 1)
+    np.add.at(delta, ends[keep], -1)
+    return np.cumsum(delta[:-1]) > 0
+
+
+def _mask_runs(mask, origin):
+    starts, ends = find_runs(mask)
+    return (starts + origin).astype(np.int32), (ends - 1 + origin).astype(np.int32)
+
+
+def union_runs(starts, ends):
+    """
+    merge overlapping and adjacent runs of days
+    :param starts: first day numbers of the runs
+    :param ends: last day numbers (inclusive) of the runs
+    :return: first and last day numbers of the merged runs, sorted
+    """
+    if not len(starts):
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+    origin = int(np.min(starts))
+    length = int(np.max(ends)) - origin + 1
+    return _mask_runs(_runs_mask(starts, ends, origin, length), origin)
+
+
+def subtract_runs(starts, ends, removed_starts, removed_ends):
+    """
+    days of runs which are not in the removed runs, e.g. missing days which are staged
+    already
+    :return: first and last day numbers of the remaining runs, sorted
+    """
+    if not len(starts):
+        return union_runs(starts, ends)
+    origin = int(np.min(starts))
+    length = int(np.max(ends)) - origin + 1
+    mask = _runs_mask(starts, ends, origin, length)
+    mask &= ~_runs_mask(removed_starts, removed_ends, origin, length)
+    return _mask_runs(mask, origin)
+
+
+def observed_density(days):
+    """
+    share of days with data between the first and the last day with data
+    :param days: day numbers with data
+    :return: density, None without data
+    """
+    days = np.unique(np.asarray(days, dtype=np.int32))
+    if len(days) == 0:
+        return None
+    return len(days) / (days[-1] - days[0] + 1)
+
+
+class RequestPlan(object):
+    """
+    Requests of one or more stations, planned before any download. The missing days of a
+    station are grouped into windows whose expected number of rows (days times the
+    observed density of the station) fills a share of the row limit of the data
+    service, one request per window from its first to its last missing day. Days with
+    data between short gaps are downloaded again instead of sending one request per
+    gap. The plan can be inspected (summary(), to_frame()) and turned into the chunks
+    of NOAAClient.download.
+    """
+
+    def __init__(self, max_rows=MAX_ROWS):
+        """
+        :param max_rows: rows per response of the data service
+        :type max_rows: int
+        """
+        self.max_rows = max_rows
+        self.datatypes = {}
+        self.density = {}
+        self.ranges = {}
+        self._station = np.empty(0, dtype=np.int32)
+        self._start = np.empty(0, dtype=np.int32)
+        self._end = np.empty(0, dtype=np.int32)
+        self._stations = []
+
+    def __len__(self):
+        return len(self._start)
+
+    def __str__(self):
+        summary = self.summary()
+        return (
+            f"{len(self)} requests for {len(summary)} stations, "
+            f"{summary['days'].sum()} days\n{summary.to_string()}"
+        )
+
+    def days_per_request(self, density=None):
+        """
+        length of the requests of a station
+        :param density: observed density of the station, None if unknown
+        :return: days
+        """
+        density = max(density if density is not None else 1.0, MIN_DENSITY)
+        return max(int(self.max_rows * FILL / density), 1)
+
+    def add(self, station_id, datatypes, starts, ends, density=None):
+        """
+        add the missing date runs of a station
+        :param station_id:
+        :param datatypes: list of datatypes
+        :param starts: first day numbers of the runs
+        :param ends: last day numbers (inclusive) of the runs
+        :param density: observed density of the station, None if unknown
+        :return: self
+        """
+        order = np.argsort(starts)
+        starts = np.asarray(starts, dtype=np.int32)[order]
+        ends = np.asarray(ends, dtype=np.int32)[order]
+        # windows of size days from the first missing day, one request per window with
+        # missing days from its first to its last missing day
+        size = self.days_per_request(density)
+        origin = starts[0] if len(starts) else 0
+        first = (starts - origin) // size
+        n = (ends - origin) // size - first + 1
+        offsets = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        windows = np.repeat(first, n) + offsets
+        run_starts = np.maximum(np.repeat(starts, n), origin + windows * size)
+        run_ends = np.minimum(np.repeat(ends, n), origin + (windows + 1) * size - 1)
+        index = np.flatnonzero(np.diff(windows, prepend=-1))
+        request_starts = run_starts[index]
+        request_ends = (
+            np.maximum.reduceat(run_ends, index) if len(index) else run_ends[index]
+        )
+
+        self.datatypes[station_id] = list(datatypes)
+        self.density[station_id] = density
+        self.ranges[station_id] = (starts, ends)
+        self._stations.append(station_id)
+        self._station = np.concatenate(
+            [
+                self._station,
+                np.full(len(request_starts), len(self._stations) - 1, dtype=np.int32),
+            ]
+        )
+        self._start = np.concatenate([self._start, request_starts.astype(np.int32)])
+        self._end = np.concatenate([self._end, request_ends.astype(np.int32)])
+        return self
+
+    def add_date_ranges(self, station_id, datatypes, date_ranges, density=None):
+        """
+        add missing date ranges of a station
+        :param date_ranges: list of (start, end) ("yyyy-mm-dd")
+        """
+        days = to_days(np.asarray(date_ranges, dtype=str).reshape(-1, 2))
+        return self.add(station_id, datatypes, days[:, 0], days[:, 1], density)
+
+    def extend(self, other):
+        """
+        add the stations of another plan
+        """
+        for station_id in other.stations():
+            self.add(
+                station_id,
+                other.datatypes[station_id],
+                *other.ranges[station_id],
+                other.density[station_id],
+            )
+        return self
+
+    def stations(self):
+        """
+        :return: station ids in planning order
+        """
+        return list(self._stations)
+
+    def requests(self, station_id=None):
+        """
+        number of requests, of one station or of all stations
+        """
+        if station_id is None:
+            return len(self)
+        return int((self._station == self._stations.index(station_id)).sum())
+
+    def date_ranges(self, station_id):
+        """
+        missing date ranges of a station
+        :return: list of (start, end) ("yyyy-mm-dd")
+        """
+        starts, ends = self.ranges[station_id]
+        return list(zip(from_days(starts).tolist(), from_days(ends).tolist()))
+
+    def chunks(self, station_id=None):
+        """
+        requests as chunks of NOAAClient.download
+        :param station_id: requests of one station, defaults to all stations
+        :return: list of (station_id, datatypes, start_date, end_date)
+        """
+        mask = slice(None)
+        if station_id is not None:
+            mask = self._station == self._stations.index(station_id)
+        starts = from_days(self._start[mask]).tolist()
+        ends = from_days(self._end[mask]).tolist()
+        stations = [self._stations[i] for i in self._station[mask]]
+        return [
+            (s, self.datatypes[s], start, end)
+            for s, start, end in zip(stations, starts, ends)
+        ]
+
+    def to_frame(self):
+        """
+        one row per request with its dates, days and expected rows
+        :return: pandas.DataFrame
+        """
+        density = np.array(
+            [
+                self.density[s] if self.density[s] is not None else 1.0
+                for s in self._stations
+            ]
+        )
+        days = self._end - self._start + 1
+        return pd.DataFrame(
+            {
+                "station": np.array(self._stations, dtype=object)[self._station],
+                "start": from_days(self._start),
+                "end": from_days(self._end),
+                "days": days,
+                "expected_rows": np.round(days * density[self._station]).astype(int),
+            }
+        )
+
+    def summary(self):
+        """
+        one row per station with its missing date ranges, requests, days and density
+        :return: pandas.DataFrame
+        """
+        df = self.to_frame()
+        summary = (
+            df.groupby("station", sort=False)
+            .agg(requests=("days", "size"), days=("days", "sum"))
+            .reindex(self._stations, fill_value=0)
+        )
+        summary["ranges"] = [len(self.ranges[s][0]) for s in self._stations]
+        summary["density"] = [self.density[s] for s in self._stations]
+        summary["days_per_request"] = [
+            self.days_per_request(self.density[s]) for s in self._stations
+        ]
+        return summary[["ranges", "requests", "days", "density", "days_per_request"]]
+
+
+class AdaptiveChunker(object):
+    """
+    Hands out the requests of a RequestPlan while downloading and adapts them to the
+    responses. The density of a station is updated from every response: consecutive
+    windows are merged into one request while the responses of a station stay below the
+    row limit, and windows are split when they would exceed it. A response with as many
+    rows as the limit may be truncated; its rows before the last returned day are kept
+    and the rest of the window is requested again (pagination by date).
+    """
+
+    def __init__(self, plan):
+        """
+        :param plan: planned requests
+        :type plan: RequestPlan
+        """
+        self.plan = plan
+        self.max_rows = plan.max_rows
+        self._stations = plan.stations()
+        # pending windows of each station, sorted by their first day
+        self._pending = {
+            station_id: list(
+                zip(
+                    plan._start[plan._station == i].tolist(),
+                    plan._end[plan._station == i].tolist(),
+                )
+            )
+            for i, station_id in enumerate(self._stations)
+        }
+        self._in_flight = {station_id: 0 for station_id in self._stations}
+        self._requests = {station_id: 0 for station_id in self._stations}
+        self._rows = {station_id: 0 for station_id in self._stations}
+        self._days = {station_id: 0 for station_id in self._stations}
+        self._first = 0
+        self.days_done = 0
+        self.merged = 0
+        self.split = 0
+        self.truncated = 0
+
+    def density(self, station_id):
+        """
+        density of a station observed in its responses, the planned density before
+        """
+        if self._days[station_id]:
+            return self._rows[station_id] / self._days[station_id]
+        return self.plan.density[station_id]
+
+    def next(self):
+        """
+        next request, of the first station with pending windows
+        :return: (station_id, datatypes, start_date, end_date), None if nothing is pending
+        """
+        while self._first < len(self._stations):
+            if self._pending[self._stations[self._first]]:
+                break
+            self._first += 1
+        else:
+            return None
+        station_id = self._stations[self._first]
+        pending = self._pending[station_id]
+        size = self.plan.days_per_request(self.density(station_id))
+        start, end = pending.pop(0)
+        while pending and pending[0][1] - start + 1 <= size:
+            end = pending.pop(0)[1]
+            self.merged += 1
+        if end - start + 1 > size:
+            pending.insert(0, (start + size, end))
+            end = start + size - 1
+            self.split += 1
+        self._in_flight[station_id] += 1
+        self._requests[station_id] += 1
+        return (
+            station_id,
+            self.plan.datatypes[station_id],
+            str(from_days(start)),
+            str(from_days(end)),
+        )
+
+    def done(self, request, result):
+        """
+        record the response of a request from next()
+        :param request: (station_id, datatypes, start_date, end_date)
+        :param result: rows of the response, None without data
+        :type result: pandas.DataFrame
+        :return: rows to keep (None without data) and the period they cover as
+            (start_date, end_date), None if the window is requested again
+        """
+        station_id, _, start_date, end_date = request
+        start, end = to_days([start_date, end_date])
+        self._in_flight[station_id] -= 1
+        rows = 0 if result is None else len(result)
+        if rows >= self.max_rows:
+            days = to_days(result["DATE"].str.slice(0, 10).values)
+            last = days.max()
+            if last > start and (np.diff(days) >= 0).all():
+                # rows of the last day may be incomplete, request it again
+                self.truncated += 1
+                self._push(station_id, last, end)
+                result = result[days < last]
+                end = last - 1
+                rows = len(result)
+            elif last > start:
+                # unordered rows, the missing ones are unknown: halve the window
+                self.truncated += 1
+                middle = start + (end - start) // 2
+                self._push(station_id, middle + 1, end)
+                self._push(station_id, start, middle)
+                return None, None
+        self._rows[station_id] += rows
+        self._days[station_id] += int(end - start + 1)
+        self.days_done += int(end - start + 1)
+        return result, (start_date, str(from_days(end)))
+
+    def _push(self, station_id, start, end):
+        bisect.insort(self._pending[station_id], (int(start), int(end)))
+        self._first = min(self._first, self._stations.index(station_id))
+
+    def fail(self, request):
+        """
+        record a failed request from next(), the pending requests of its station are
+        skipped
+        """
+        station_id = request[0]
+        self._in_flight[station_id] -= 1
+        self._pending[station_id].clear()
+
+    def pending(self):
+        """
+        True if there are requests to hand out
+        """
+        return any(self._pending[s] for s in self._stations[self._first :])
+
+    def complete(self, station_id):
+        """
+        True if all requests of a station are done
+        """
+        return not self._pending[station_id] and not self._in_flight[station_id]
+
+    def finished(self):
+        """
+        True if all requests are done
+        """
+        return not self.pending() and not any(self._in_flight.values())
+
+    def requests(self, station_id):
+        """
+        number of requests handed out for a station
+        """
+        return self._requests[station_id]
+
+    def stats(self):
+        """
+        counters of merged, split and truncated requests
+        :return: dict
+        """
+        return dict(merged=self.merged, split=self.split, truncated=self.truncated)
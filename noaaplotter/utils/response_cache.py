@@ -0,0 +1,294 @@
+import datetime as dt
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+# responses of periods ending within RECENT_DAYS may still change, they expire after
+# RECENT_TTL seconds. Older responses do not expire.
+RECENT_DAYS = 90
+RECENT_TTL = 24 * 3600
+
+
+def _day(date):
+    return dt.date.fromisoformat(str(date)[:10])
+
+
+class ResponseCache(object):
+    """
+    On-disk cache of responses of the NCEI data service, content addressed by the
+    normalised request parameters (station, datatypes, period, units) and stored gzip
+    compressed. Responses of recent periods expire, historical ones do not. Each series
+    (station, datatypes, units) keeps an index of its cached periods, so that a request
+    for a period covered by several cached responses, e.g. of differently sized download
+    windows, is answered from the cache as well.
+    """
+
+    INDEX_DIR = "series"
+
+    def __init__(self, cache_dir, recent_days=RECENT_DAYS, recent_ttl=RECENT_TTL):
+        """
+        :param cache_dir: directory of the cache, created if it does not exist
+        :type cache_dir: str
+        :param recent_days: responses of periods ending within this number of days expire
+        :type recent_days: int
+        :param recent_ttl: seconds until a recent response expires
+        :type recent_ttl: float
+        """
+        self.cache_dir = cache_dir
+        self.recent_days = recent_days
+        self.recent_ttl = recent_ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._lock = threading.RLock()
+        os.makedirs(os.path.join(cache_dir, self.INDEX_DIR), exist_ok=True)
+
+    @staticmethod
+    def normalize(params):
+        """
+        request parameters which the response depends on, in a canonical form
+        :param params: query parameters of the data service
+        :type params: dict
+        :return: dict
+        """
+
+        def names(value):
+            if isinstance(value, str):
+                value = value.split(",")
+            return ",".join(sorted({v.strip().upper() for v in value if v.strip()}))
+
+        return dict(
+            dataset=params.get("dataset", "daily-summaries"),
+            stations=names(params["stations"]),
+            dataTypes=names(params.get("dataTypes", "")),
+            startDate=_day(params["startDate"]).isoformat(),
+            endDate=_day(params["endDate"]).isoformat(),
+            units=str(params.get("units", "metric")).lower(),
+            format=str(params.get("format", "json")).lower(),
+            limit=int(params.get("limit", 1000)),
+        )
+
+    @classmethod
+    def make_key(cls, params):
+        """
+        create cache key of a request
+        :return: hex digest
+        """
+        normalized = cls.normalize(params)
+        return hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+    @classmethod
+    def series_key(cls, params):
+        """
+        key of the series of a request, all parameters except period and limit
+        :return: hex digest
+        """
+        normalized = cls.normalize(params)
+        for name in ["startDate", "endDate", "limit"]:
+            del normalized[name]
+        return hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+    def get(self, params):
+        """
+        cached response of a request, assembled from the cached responses of its series if
+        the request itself was not cached
+        :param params: query parameters of the data service
+        :return: response text or None if not cached
+        """
+        normalized = self.normalize(params)
+        with self._lock:
+            entry = self._load(self.make_key(params))
+            if entry is None:
+                text = self._assemble(normalized)
+            else:
+                text = entry["text"]
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return text
+
+    def put(self, params, text):
+        """
+        store the response of a request, only json responses (rows or empty) are stored,
+        e.g. not error pages of a proxy
+        :param params: query parameters of the data service
+        :param text: response text
+        """
+        rows = self._rows(text)
+        if rows is None:
+            return
+        normalized = self.normalize(params)
+        key = self.make_key(params)
+        expires = None
+        recent = dt.date.today() - dt.timedelta(days=self.recent_days)
+        if _day(normalized["endDate"]) >= recent:
+            expires = time.time() + self.recent_ttl
+        # rows of a response at the limit are complete up to the day before its last day
+        complete_end = normalized["endDate"]
+        if len(rows) >= normalized["limit"]:
+            days = [str(row.get("DATE", ""))[:10] for row in rows]
+            if days != sorted(days) or days[-1] <= normalized["startDate"]:
+                complete_end = None
+            else:
+                complete_end = (_day(days[-1]) - dt.timedelta(days=1)).isoformat()
+        with self._lock:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._write(
+                path,
+                gzip.compress(
+                    json.dumps(
+                        dict(params=normalized, expires=expires, text=text)
+                    ).encode()
+                ),
+            )
+            if complete_end is not None:
+                index = self._read_index(normalized)
+                index[key] = [normalized["startDate"], complete_end, expires]
+                self._write_index(normalized, index)
+
+    def stats(self):
+        """
+        hit/miss counters
+        :return: dict
+        """
+        requests = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            expired=self.expired,
+            hit_ratio=self.hits / requests if requests else None,
+        )
+
+    def summary(self):
+        """
+        hit ratio as text, e.g. for the end of a download
+        """
+        stats = self.stats()
+        if stats["hit_ratio"] is None:
+            return "no requests"
+        return (
+            f"{stats['hits']} hits, {stats['misses']} misses, {stats['expired']} expired "
+            f"(hit ratio {stats['hit_ratio']:.0%})"
+        )
+
+    def _assemble(self, normalized):
+        """
+        response of a period from the cached, complete responses of its series
+        """
+        if normalized["format"] != "json":
+            return None
+        start, end = normalized["startDate"], normalized["endDate"]
+        now = time.time()
+        index = self._read_index(normalized)
+        expired = [
+            key
+            for key, (_, _, expires) in index.items()
+            if expires is not None and expires <= now
+        ]
+        if expired:
+            self._remove(normalized, expired)
+            index = {key: window for key, window in index.items() if key not in expired}
+        windows = sorted(
+            (window_start, window_end, key)
+            for key, (window_start, window_end, expires) in index.items()
+            if window_end >= start and window_start <= end
+        )
+        # the windows have to cover the period without gaps
+        covered = _day(start) - dt.timedelta(days=1)
+        used = []
+        for window_start, window_end, key in windows:
+            if _day(window_start) > covered + dt.timedelta(days=1):
+                break
+            if _day(window_end) > covered:
+                covered = _day(window_end)
+                used.append(key)
+            if covered >= _day(end):
+                break
+        if covered < _day(end):
+            return None
+        rows = {}
+        for key in used:
+            entry = self._load(key)
+            entry_rows = self._rows(entry["text"]) if entry is not None else None
+            if entry_rows is None:
+                return None
+            for row in entry_rows:
+                day = str(row.get("DATE", ""))[:10]
+                if start <= day <= end:
+                    rows[day] = row
+        return json.dumps([rows[day] for day in sorted(rows)][: normalized["limit"]])
+
+    @staticmethod
+    def _rows(text):
+        """
+        rows of a json response, [] for empty responses, None for other responses
+        """
+        if not text or not text.strip():
+            return []
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return rows if isinstance(rows, list) else None
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def _load(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                entry = json.loads(gzip.decompress(f.read()))
+        except (OSError, EOFError, json.JSONDecodeError):
+            return None
+        if entry["expires"] is not None and entry["expires"] <= time.time():
+            self.expired += 1
+            self._remove(entry["params"], [key])
+            return None
+        return entry
+
+    def _remove(self, normalized, keys):
+        """
+        delete cached responses of a series and their windows in its index
+        """
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                # removed by another process
+                pass
+        index = self._read_index(normalized)
+        if any([index.pop(key, None) is not None for key in keys]):
+            self._write_index(normalized, index)
+
+    def _index_path(self, normalized):
+        key = self.series_key(normalized)
+        return os.path.join(self.cache_dir, self.INDEX_DIR, f"{key}.json")
+
+    def _read_index(self, normalized):
+        path = self._index_path(normalized)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+    def _write_index(self, normalized, index):
+        self._write(self._index_path(normalized), json.dumps(index).encode())
+
+    @staticmethod
+    def _write(path, data):
+        # unique per writer, several processes/threads may share the cache directory
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
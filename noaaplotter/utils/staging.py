@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from urllib.parse import quote
+
+import pandas as pd
+
+# columns which are not datatypes
+ID_COLUMNS = ["STATION", "NAME", "DATE"]
+
+
+def normalize_chunk(df):
+    """
+    downloaded rows in the column types of the station files: DATE as "yyyy-mm-dd" and
+    numeric datatypes as float
+    :param df: rows of a response
+    :type df: pandas.DataFrame
+    :return: pandas.DataFrame
+    """
+    df = df.copy()
+    df["DATE"] = df["DATE"].astype(str).str.slice(0, 10)
+    for col in df.columns:
+        if col in ID_COLUMNS:
+            continue
+        try:
+            df[col] = pd.to_numeric(df[col]).astype(float)
+        except (ValueError, TypeError):
+            pass
+    return df
+
+
+def staging_dir(output_file, store=False):
+    """
+    staging directory of the downloads to a station file
+    :param store: output_file is the directory of a PartitionedStore
+    """
+    if store:
+        return os.path.join(output_file, ChunkStaging.STAGING_DIR)
+    return f"{output_file}.staging"
+
+
+class ChunkStaging(object):
+    """
+    Staging area of downloads: the rows of every response are normalised and written
+    to an Arrow IPC file of their station as soon as they arrive, and a checkpoint of
+    the station records the completed download windows. The station file is built from
+    the staged chunks once all requests of the station are done, an interrupted
+    download resumes with the windows which are not in the checkpoint. Chunks are only
+    used if the datatypes did not change.
+    """
+
+    STAGING_DIR = ".staging"
+    CHECKPOINT_FILE = "checkpoint.json"
+
+    def __init__(self, path, datatypes):
+        """
+        :param path: staging directory, created when the first chunk is staged
+        :type path: str
+        :param datatypes: list of datatypes of the download
+        """
+        self.path = path
+        self.datatypes = list(datatypes)
+        self._checkpoints = {}
+        # chunks are staged and stations are written from several threads
+        self._lock = threading.Lock()
+
+    def completed(self, station_id):
+        """
+        download windows of a station which are staged
+        :return: list of (start, end) ("yyyy-mm-dd")
+        """
+        return [
+            (start, end) for start, end, _ in self._checkpoint(station_id)["chunks"]
+        ]
+
+    def append(self, station_id, start_date, end_date, df):
+        """
+        stage the rows of a download window
+        :param start_date: first day of the window ("yyyy-mm-dd")
+        :param end_date: last day of the window ("yyyy-mm-dd")
+        :param df: rows of the window, None without data
+        :type df: pandas.DataFrame
+        :return: number of staged rows
+        """
+        import polars as pl
+
+        station_dir = self._station_dir(station_id)
+        with self._lock:
+            checkpoint = self._checkpoint(station_id)
+            os.makedirs(station_dir, exist_ok=True)
+        name = None
+        if df is not None and len(df):
+            name = f"chunk-{start_date}-{end_date}-{uuid.uuid4().hex[:8]}.arrow"
+            tmp_path = os.path.join(station_dir, f"{name}.tmp")
+            pl.from_pandas(normalize_chunk(df)).write_ipc(tmp_path, compression="zstd")
+            os.replace(tmp_path, os.path.join(station_dir, name))
+        # the chunk file is complete before the checkpoint refers to it
+        with self._lock:
+            checkpoint["chunks"].append([start_date, end_date, name])
+            self._write_checkpoint(station_id)
+        return 0 if name is None else len(df)
+
+    def scan(self, station_id, start_date=None, end_date=None):
+        """
+        staged rows of a station, read from the chunk files when the frame is collected
+        :param start_date: only chunks of windows which end on or after start_date
+        :param end_date: only chunks of windows which start on or before end_date
+        :return: polars.LazyFrame in the order of staging, None without data
+        """
+        import polars as pl
+
+        station_dir = self._station_dir(station_id)
+        frames = [
+            pl.scan_ipc(os.path.join(station_dir, name))
+            for start, end, name in self._checkpoint(station_id)["chunks"]
+            if name is not None
+            and (start_date is None or end >= start_date)
+            and (end_date is None or start <= end_date)
+        ]
+        if not frames:
+            return None
+        return pl.concat(frames, how="diagonal_relaxed")
+
+    def clear(self, station_id):
+        """
+        remove the staged chunks of a station, e.g. after its file was written
+        """
+        shutil.rmtree(self._station_dir(station_id), ignore_errors=True)
+        self._checkpoints.pop(station_id, None)
+        with self._lock:
+            try:
+                os.rmdir(self.path)
+            except OSError:
+                # other stations are staged
+                pass
+
+    def _station_dir(self, station_id):
+        return os.path.join(self.path, quote(station_id, safe=""))
+
+    def _checkpoint(self, station_id):
+        if station_id not in self._checkpoints:
+            checkpoint = dict(datatypes=self.datatypes, chunks=[])
+            path = os.path.join(self._station_dir(station_id), self.CHECKPOINT_FILE)
+            if os.path.exists(path):
+                with open(path) as f:
+                    staged = json.load(f)
+                if staged.get("datatypes") == self.datatypes:
+                    checkpoint = staged
+                    print(
+                        f"Resuming {station_id} with {len(staged['chunks'])} staged chunks"
+                    )
+                else:
+                    print(
+                        f"Datatypes changed, discarding staged chunks of {station_id}"
+                    )
+                    shutil.rmtree(self._station_dir(station_id), ignore_errors=True)
+            self._checkpoints[station_id] = checkpoint
+        return self._checkpoints[station_id]
+
+    def _write_checkpoint(self, station_id):
+        checkpoint = dict(self._checkpoints[station_id], updated=time.time())
+        path = os.path.join(self._station_dir(station_id), self.CHECKPOINT_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
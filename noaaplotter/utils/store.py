@@ -0,0 +1,299 @@
+import datetime as dt
+import json
+import os
+import threading
+import time
+import uuid
+from urllib.parse import quote
+
+import pandas as pd
+import polars as pl
+
+from noaaplotter.utils.file_lock import FileLock
+
+# columns and types of all partition files
+STORE_SCHEMA = {
+    "STATION": pl.String,
+    "NAME": pl.String,
+    "DATE": pl.String,
+    "PRCP": pl.Float64,
+    "SNOW": pl.Float64,
+    "SNWD": pl.Float64,
+    "TAVG": pl.Float64,
+    "TMAX": pl.Float64,
+    "TMIN": pl.Float64,
+}
+# recent days may still be added or corrected by NCEI, they are not marked as covered
+# unless they have data
+SETTLE_DAYS = 30
+
+
+def is_store(path):
+    """
+    True if path is the root directory of a PartitionedStore
+    """
+    return os.path.isfile(os.path.join(path, PartitionedStore.MANIFEST_FILE))
+
+
+def _merge_ranges(ranges):
+    """
+    merge overlapping and adjacent date ranges
+    :param ranges: list of (start, end) ("yyyy-mm-dd")
+    :return: sorted list of [start, end]
+    """
+    merged = []
+    for start, end in sorted(tuple(r) for r in ranges):
+        if merged:
+            last_end = pd.Timestamp(merged[-1][1])
+            if pd.Timestamp(start) <= last_end + pd.Timedelta(days=1):
+                merged[-1][1] = max(merged[-1][1], end)
+                continue
+        merged.append([start, end])
+    return merged
+
+
+class PartitionedStore(object):
+    """
+    Append-only store of daily summaries, hive partitioned by station and year
+    (STATION=<id>/YEAR=<yyyy>/part-<time>-<id>.parquet). Updates write new part files
+    only, compact() merges the files of a partition. A json manifest keeps the station
+    names and the covered date ranges of each station, so that updates are planned
+    without reading data. It is updated under a file lock, processes which append to the
+    same store merge their changes. Rows of later part files replace rows of the same
+    station and date in earlier ones.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+    LOCK_FILE = "manifest.lock"
+
+    def __init__(self, root, create=False):
+        """
+        :param root: root directory of the store
+        :type root: str
+        :param create: create an empty store if root is not a store
+        :type create: bool
+        """
+        self.root = root
+        if not is_store(root):
+            if not create:
+                raise FileNotFoundError(f"{root} is not a partitioned store")
+            os.makedirs(root, exist_ok=True)
+        self._lock = FileLock(os.path.join(root, self.LOCK_FILE))
+        with self._lock:
+            # another process may have created the store meanwhile
+            if is_store(root):
+                self._read_manifest()
+            else:
+                self.manifest = dict(stations={})
+                self._write_manifest()
+
+    def stations(self):
+        """
+        :return: dict of station id -> location name
+        """
+        return {
+            station_id: entry["name"]
+            for station_id, entry in self.manifest["stations"].items()
+        }
+
+    def covered(self, station_id):
+        """
+        date ranges of a station which were downloaded
+        :return: list of [start, end] ("yyyy-mm-dd")
+        """
+        return self.manifest["stations"].get(station_id, {}).get("covered", [])
+
+    def density(self, station_id):
+        """
+        share of downloaded days with data
+        :return: density, None if nothing was downloaded
+        """
+        entry = self.manifest["stations"].get(station_id, {})
+        if not entry.get("days"):
+            return None
+        return entry["data_days"] / entry["days"]
+
+    def missing_date_ranges(self, station_id, start_date, end_date):
+        """
+        date ranges between start_date and end_date which are not covered
+        :return: list of (start, end) ("yyyy-mm-dd")
+        """
+        missing = []
+        start = pd.Timestamp(start_date)
+        end = pd.Timestamp(end_date)
+        for covered_start, covered_end in self.covered(station_id):
+            covered_start = pd.Timestamp(covered_start)
+            covered_end = pd.Timestamp(covered_end)
+            if covered_end < start or covered_start > end:
+                continue
+            if covered_start > start:
+                missing.append((start, covered_start - pd.Timedelta(days=1)))
+            start = max(start, covered_end + pd.Timedelta(days=1))
+        if start <= end:
+            missing.append((start, end))
+        return [(s.strftime("%Y-%m-%d"), e.strftime("%Y-%m-%d")) for s, e in missing]
+
+    def append(self, station_id, df, date_ranges, name=""):
+        """
+        write downloaded rows of a station as new part files, one per year, and mark the
+        downloaded date ranges as covered
+        :param station_id:
+        :param df: rows with the columns of STORE_SCHEMA, DATE as "yyyy-mm-dd"
+        :type df: pandas.DataFrame, polars.DataFrame
+        :param date_ranges: downloaded date ranges, list of (start, end)
+        :param name: location name
+        :return: number of written rows
+        """
+        if isinstance(df, pd.DataFrame):
+            df = pl.from_pandas(df)
+        df = df.with_columns(
+            [
+                pl.lit(None, dtype=dtype).alias(col)
+                for col, dtype in STORE_SCHEMA.items()
+                if col not in df.columns
+            ]
+        )
+        df = df.select(
+            [pl.col(col).cast(dtype) for col, dtype in STORE_SCHEMA.items()]
+        ).with_columns(pl.lit(station_id).alias("STATION"))
+        part_name = f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet"
+        for (year,), part in df.group_by(
+            pl.col("DATE").str.slice(0, 4), maintain_order=True
+        ):
+            part_dir = self._partition_dir(station_id, year)
+            os.makedirs(part_dir, exist_ok=True)
+            self._write_atomic(part.sort("DATE"), os.path.join(part_dir, part_name))
+
+        with_data = df.filter(
+            pl.col("TMAX").is_not_null() | pl.col("TMIN").is_not_null()
+        )
+        last_data = with_data["DATE"].max() if len(with_data) else None
+        settled = (dt.date.today() - dt.timedelta(days=SETTLE_DAYS)).isoformat()
+        covered = []
+        for start, end in date_ranges:
+            # recent days without data are downloaded again by the next update
+            if end > settled:
+                end = max(settled, last_data or settled)
+                end = min(end, date_ranges[-1][1])
+            if start <= end:
+                covered.append((start, end))
+        with self._lock:
+            # changes of other processes since the manifest was read are kept
+            self._read_manifest()
+            entry = self.manifest["stations"].setdefault(
+                station_id, dict(name=name, covered=[])
+            )
+            entry["name"] = name or entry["name"]
+            entry["covered"] = _merge_ranges(entry["covered"] + covered)
+            # downloaded days and days with data, for the density of the station
+            entry["days"] = entry.get("days", 0) + len(df)
+            entry["data_days"] = entry.get("data_days", 0) + len(with_data)
+            self._write_manifest()
+        return len(df)
+
+    def files(self, stations=None, start_date=None, end_date=None):
+        """
+        part files of the selected stations and years, oldest first
+        :param stations: station ids, defaults to all stations
+        :param start_date: first date, prunes earlier years
+        :param end_date: last date, prunes later years
+        :return: list of paths
+        """
+        first_year = pd.Timestamp(start_date).year if start_date is not None else None
+        last_year = pd.Timestamp(end_date).year if end_date is not None else None
+        files = []
+        for station_id in stations if stations is not None else self.stations():
+            station_dir = self._partition_dir(station_id)
+            if not os.path.isdir(station_dir):
+                continue
+            for year_dir in os.listdir(station_dir):
+                year = int(year_dir.split("=")[1])
+                if first_year is not None and year < first_year:
+                    continue
+                if last_year is not None and year > last_year:
+                    continue
+                path = os.path.join(station_dir, year_dir)
+                files.extend(
+                    os.path.join(path, f)
+                    for f in os.listdir(path)
+                    if f.startswith("part-") and f.endswith(".parquet")
+                )
+        return sorted(files, key=os.path.basename)
+
+    def scan(self, stations=None, start_date=None, end_date=None):
+        """
+        lazy scan of the selected stations and years as one table with one row per
+        station and date
+        :return: polars.LazyFrame
+        """
+        files = self.files(stations, start_date, end_date)
+        if not files:
+            return pl.LazyFrame(schema=STORE_SCHEMA)
+        return (
+            pl.scan_parquet(files, schema=STORE_SCHEMA)
+            .unique(subset=["STATION", "DATE"], keep="last", maintain_order=True)
+            .sort(["STATION", "DATE"])
+        )
+
+    def compact(self, min_files=2):
+        """
+        merge the part files of partitions with at least min_files files into one file,
+        files which are appended meanwhile are kept
+        :return: number of compacted partitions and removed files
+        """
+        partitions = 0
+        removed = 0
+        for station_id in self.stations():
+            station_dir = self._partition_dir(station_id)
+            if not os.path.isdir(station_dir):
+                continue
+            for year_dir in sorted(os.listdir(station_dir)):
+                path = os.path.join(station_dir, year_dir)
+                parts = sorted(
+                    f
+                    for f in os.listdir(path)
+                    if f.startswith("part-") and f.endswith(".parquet")
+                )
+                if len(parts) < min_files:
+                    continue
+                files = [os.path.join(path, f) for f in parts]
+                df = (
+                    pl.scan_parquet(files, schema=STORE_SCHEMA)
+                    .unique(
+                        subset=["STATION", "DATE"], keep="last", maintain_order=True
+                    )
+                    .sort("DATE")
+                    .collect()
+                )
+                # named after the newest merged file, so that later appends still win
+                newest = parts[-1].split("-")[1]
+                compacted = f"part-{newest}-{uuid.uuid4().hex[:8]}c.parquet"
+                self._write_atomic(df, os.path.join(path, compacted))
+                for f in files:
+                    os.remove(f)
+                partitions += 1
+                removed += len(files)
+        return dict(partitions=partitions, removed_files=removed)
+
+    def _partition_dir(self, station_id, year=None):
+        path = os.path.join(self.root, f"STATION={quote(station_id, safe='')}")
+        if year is not None:
+            path = os.path.join(path, f"YEAR={year}")
+        return path
+
+    @staticmethod
+    def _write_atomic(df, path):
+        tmp_path = f"{path}.tmp"
+        df.write_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _read_manifest(self):
+        with open(os.path.join(self.root, self.MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+
+    def _write_manifest(self):
+        path = os.path.join(self.root, self.MANIFEST_FILE)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp_path, path)
@@ -10,7 +10,8 @@
 ########################
 import datetime as dt
 from datetime import timedelta
-import requests, json
+import json
+import numpy as np
 import pandas as pd
 
 
@@ -31,6 +32,16 @@ def parse_dates(date):
         raise ('Wrong date format. Either use native datetime format or "YYYY-mm-dd"')
 
 
+def find_runs(mask):
+    """
+    run length encoding of a boolean mask
+    :param mask:
+    :return: start indices and end indices (exclusive) of all runs of True values
+    """
+    edges = np.diff(np.concatenate([[0], np.asarray(mask, dtype=np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
 def calc_trailing_mean(df, length, feature, new_feature):
     """
     :param df:
@@ -84,6 +95,8 @@ def dl_noaa_api(i, dtypes, station_id, Token, date_start, date_end, split_size):
         units='metric',
         format='json'
     )
+    import requests
+
     r = requests.get(
         request_url,
         params=request_params,
@@ -102,7 +115,7 @@ def dl_noaa_api(i, dtypes, station_id, Token, date_start, date_end, split_size):
 
 def assign_numeric_datatypes(df):
     for col in df.columns:
-        if df[col].dtype == 'object':
+        if df[col].dtype == 'object' or pd.api.types.is_string_dtype(df[col].dtype):
             try:
                 df[col] = pd.to_numeric(df[col])
             except: